@@ -0,0 +1,104 @@
+'''
+Fast surrogate of an ALARA run, used to screen schedules before they are run: the activity
+of a single nuclide with no parents, produced at a rate proportional to the flux, at the
+end of a schedule (normalized to its saturation activity at unit flux).
+
+Each entry of a schedule leaves an activity b at its end, starting from no activity, and
+lasts a duration D, so an activity A at its start becomes A exp(-lambda D) + b at its end.
+A pulse of length L leaves b = 1 - exp(-lambda L), a delay d leaves b = 0, and entries in
+sequence combine as (D1 + D2, b1 exp(-lambda D2) + b2). Repeating an entry according to a
+pulse history is a geometric series over the pulses (see ph_reduction.repeat_activity()).
+
+The exact activity is compared with that of the single pulse given by flatten_schedule()
+(of the flattened duration, with the flux scaled to preserve fluence) and by
+compress_schedule() (of the compressed duration, at full flux).
+
+All functions take a compiled schedule (see schedule_transforms.compile_schedule()), so
+that every leaf parameter may be an array of schedule variants. The decay constants are
+placed on a new last axis, so results have the shape of the broadcast parameters followed
+by the number of decay constants. Decay constants are in the inverse time unit of the schedule.
+'''
+import numpy as np
+import ph_reduction
+import schedule_transforms as st
+
+def compiled_activity(compiled, decay_constants, params=None):
+    '''
+    Calculate the exact activity at the end of a compiled schedule.
+    :param compiled: output of schedule_transforms.compile_schedule()
+    :param decay_constants: array of decay constants
+    :param params: dictionary of leaf parameter name: array of values (see
+        schedule_transforms.flatten_compiled())
+    :return: activity array
+    '''
+    decay_constants = np.asarray(decay_constants, dtype=float)
+    values = {key: np.asarray(value)[..., None]
+              for key, value in st.compiled_values(compiled, params).items()}
+    stack = []
+    for kind, arg, ph_keys, delay_key in compiled[0]:
+        pulse_history = [(values[num_key], values[dwell_key]) for num_key, dwell_key in ph_keys]
+        delay_dur = 0 if delay_key is None else values[delay_key]
+        if kind == 'pulse_entry':
+            duration = values[arg]
+            activity = -np.expm1(-decay_constants * duration)
+        else:
+            children = stack[len(stack) - arg:]
+            del stack[len(stack) - arg:]
+            duration, activity, _ = children[0]
+            for prev_child, (child_dur, child_activity, _) in zip(children, children[1:]):
+                gap = prev_child[2] + child_dur
+                activity = activity * np.exp(-decay_constants * gap) + child_activity
+                duration = duration + gap
+        activity, duration = ph_reduction.repeat_activity(decay_constants, activity, duration,
+                                                          pulse_history)
+        stack.append((duration, activity, delay_dur))
+
+    _, activity, _ = stack.pop()
+    return activity
+
+def schedule_activity(child_dicts, decay_constants, pulse_history=[(1, 0)]):
+    '''
+    Calculate the exact activity at the end of a schedule.
+    :param child_dicts: iterable of dictionaries (as described in schedule_transforms.py)
+    :param decay_constants: array of decay constants
+    :param pulse_history: (iterable of (int, float)) pulse history of the whole schedule
+    '''
+    return compiled_activity(st.compile_schedule(child_dicts, pulse_history), decay_constants)
+
+def pulse_activity(decay_constants, duration, fluence):
+    '''
+    Calculate the activity at the end of a single pulse of a given duration and fluence.
+    '''
+    decay_constants = np.asarray(decay_constants, dtype=float)
+    duration = np.asarray(duration)[..., None]
+    fluence = np.asarray(fluence)[..., None]
+    return -np.expm1(-decay_constants * duration) * (fluence / duration)
+
+def compare_approximations(compiled, decay_constants, params=None):
+    '''
+    Compare the exact activity at the end of a compiled schedule with the activity of its
+    flattened and compressed approximations.
+    :param compiled: output of schedule_transforms.compile_schedule()
+    :param decay_constants: array of decay constants
+    :param params: dictionary of leaf parameter name: array of values
+    :return: dictionary with structure:
+    {
+        "exact": exact activity array,
+        "flatten": activity array of the flattened schedule,
+        "compress": activity array of the compressed schedule,
+        "flatten_error": relative error array of the flattened schedule,
+        "compress_error": relative error array of the compressed schedule,
+    }
+    '''
+    exact = compiled_activity(compiled, decay_constants, params)
+    flat_dur, flat_fluence = st.flatten_compiled(compiled, params)
+    comp_dur = st.compress_compiled(compiled, params)
+    flatten = pulse_activity(decay_constants, flat_dur, flat_fluence)
+    compress = pulse_activity(decay_constants, comp_dur, comp_dur)
+    return {
+        "exact": exact,
+        "flatten": flatten,
+        "compress": compress,
+        "flatten_error": flatten / exact - 1,
+        "compress_error": compress / exact - 1,
+    }
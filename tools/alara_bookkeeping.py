@@ -1,3 +1,15 @@
+import itertools
+import time
+
+COLUMNS = ("id", "input_file", "output_file", "flux_file", "git_hash")
+
+# INSERT statement for each policy on UNIQUE(input_file, output_file) or id conflicts
+CONFLICT_INSERTS = {
+    "fail": "INSERT",
+    "ignore": "INSERT OR IGNORE",
+    "replace": "INSERT OR REPLACE",
+}
+
 def create_sqlite_table(cur):
     """
     Creates a sqlite table. The combination of input file and output file
@@ -34,5 +46,149 @@ def populate_table(cur, data_dict):
 
     cur.executemany(
         "INSERT INTO alara_simulations (id, input_file, output_file, flux_file, git_hash) VALUES (?, ?, ?, ?, ?)",
-        list(zip(*data_dict.values())),
+        zip(*(data_dict[column] for column in COLUMNS)),
+    )
+
+def create_digest_table(cur):
+    """
+    Creates a sqlite table mapping the name each input file was generated under to the digest
+    of its contents and the path of its single stored copy (see deck_store.py).
+    :param cur: Cursor object for the SQLite connection
+    """
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS deck_digests (
+        input_file TEXT PRIMARY KEY,
+        digest TEXT NOT NULL,
+        deck_file TEXT NOT NULL
+        )
+    """
     )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_deck_digests_deck_file ON deck_digests (deck_file, digest)")
+
+def record_digests(conn, deck_records, batch_size=10000):
+    """
+    Insert or update the deck_digests row of each input file, committing every batch_size rows.
+    :param conn: SQLite connection
+    :param deck_records: iterable of (input_file, digest, deck_file)
+    :param batch_size: (int) number of rows per transaction
+    :return: (int) number of rows written
+    """
+    deck_records = iter(deck_records)
+    num_rows = 0
+    while True:
+        batch = list(itertools.islice(deck_records, batch_size))
+        if not batch:
+            break
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO deck_digests (input_file, digest, deck_file) VALUES (?, ?, ?)",
+                batch)
+        num_rows += len(batch)
+    return num_rows
+
+def digests_with_output(cur, git_hash=None):
+    """
+    Return the set of digests (str) in deck_digests whose stored input file has a run in
+    alara_simulations.
+    :param cur: Cursor object for the SQLite connection
+    :param git_hash: (str) git commit hash to which the runs are restricted, or None for all runs
+    """
+    query = ("SELECT DISTINCT deck_digests.digest FROM alara_simulations "
+             "JOIN deck_digests ON deck_digests.deck_file = alara_simulations.input_file")
+    if git_hash is None:
+        return {digest for digest, in cur.execute(query)}
+    return {digest for digest, in cur.execute(query + " WHERE alara_simulations.git_hash = ?",
+                                              (git_hash,))}
+
+def deck_records(cur, deck_files):
+    """
+    Return the deck_digests rows of the given stored input files, loaded in a single query.
+    :param cur: Cursor object for the SQLite connection
+    :param deck_files: iterable of stored input file paths (str)
+    :return: list of (input_file, digest, deck_file)
+    """
+    deck_files = set(deck_files)
+    return [record for record in cur.execute("SELECT input_file, digest, deck_file FROM deck_digests")
+            if record[2] in deck_files]
+
+def completed_runs(cur, git_hash=None):
+    """
+    Return the set of (input_file, git_hash) pairs of the runs in alara_simulations, loaded
+    in a single query, e.g. to skip the input files of a sweep that have already been run.
+    :param cur: Cursor object for the SQLite connection
+    :param git_hash: (str) git commit hash to which the runs are restricted, or None for all runs
+    """
+    if git_hash is None:
+        return set(cur.execute("SELECT input_file, git_hash FROM alara_simulations"))
+    return set(cur.execute("SELECT input_file, git_hash FROM alara_simulations WHERE git_hash = ?",
+                           (git_hash,)))
+
+def configure_connection(conn):
+    """
+    Enable write-ahead logging and relax fsync to synchronous=NORMAL, which is safe
+    in WAL mode and lets readers proceed while a bulk load is writing.
+    Must be called outside of a transaction.
+    :param conn: SQLite connection
+    """
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+def bulk_insert(conn, rows, batch_size=10000, on_conflict="fail", report=None):
+    """
+    Insert rows into the alara_simulations table, committing every batch_size rows in
+    an explicit transaction. A batch that fails is rolled back, and the exception is raised;
+    previously committed batches are kept. If the caller already has a transaction open on
+    conn, each batch is instead a savepoint within it: a batch that fails is rolled back to
+    its savepoint, and the caller's transaction stays open, neither committed nor rolled back.
+    :param conn: SQLite connection
+    :param rows: iterable (e.g. a generator) of rows, each either a dictionary with the keys
+        in COLUMNS or a sequence of values in the order of COLUMNS
+    :param batch_size: (int) number of rows per transaction
+    :param on_conflict: (str) "fail", "ignore" or "replace", the policy applied to rows
+        that conflict with an existing row
+    :param report: callable receiving a progress message (str) after each batch
+    :return: dictionary of {"rows": int, "elapsed": float, "rows_per_s": float}, where rows
+        counts the rows submitted (including ignored rows)
+    """
+    if on_conflict not in CONFLICT_INSERTS:
+        raise Exception(f"on_conflict must be one of {', '.join(CONFLICT_INSERTS)}")
+    statement = (f"{CONFLICT_INSERTS[on_conflict]} INTO alara_simulations "
+                 f"({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})")
+
+    nested = conn.in_transaction
+    rows = iter(rows)
+    num_rows = 0
+    start = time.perf_counter()
+    while True:
+        batch = [tuple(row[column] for column in COLUMNS) if isinstance(row, dict) else row
+                 for row in itertools.islice(rows, batch_size)]
+        if not batch:
+            break
+        if nested:
+            conn.execute("SAVEPOINT bulk_insert")
+            try:
+                conn.executemany(statement, batch)
+            except Exception:
+                conn.execute("ROLLBACK TO bulk_insert")
+                raise
+            finally:
+                conn.execute("RELEASE bulk_insert")
+        else:
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(statement, batch)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        num_rows += len(batch)
+        if report is not None:
+            report(f"{num_rows} rows inserted ({num_rows / (time.perf_counter() - start):.0f} rows/s)")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": num_rows,
+        "elapsed": elapsed,
+        "rows_per_s": num_rows / elapsed if elapsed > 0 else float("inf"),
+    }
@@ -0,0 +1,77 @@
+"""
+Query layer over the alara_simulations table created by alara_bookkeeping.create_sqlite_table().
+The most common lookups, by flux_file and by git_hash, are served by covering indexes
+(which contain every column of the table, so a lookup never reads the table itself).
+Each query function runs a constant, parameterized statement, which sqlite3 prepares once
+per connection and caches, and streams the matching rows from the cursor as SimulationRecords.
+"""
+import collections
+from alara_bookkeeping import COLUMNS
+
+SimulationRecord = collections.namedtuple("SimulationRecord", COLUMNS)
+
+INDEXES = {
+    "idx_alara_simulations_flux_git": "flux_file, git_hash, input_file, output_file, id",
+    "idx_alara_simulations_git": "git_hash, input_file, output_file, flux_file, id",
+}
+
+SELECT_RECORDS = f"SELECT {', '.join(COLUMNS)} FROM alara_simulations"
+RUNS_FOR_FLUX = f"{SELECT_RECORDS} WHERE flux_file = ?"
+RUNS_FOR_GIT_HASH = f"{SELECT_RECORDS} WHERE git_hash = ?"
+RUNS_FOR_FLUX_AT_COMMIT = f"{SELECT_RECORDS} WHERE flux_file = ? AND git_hash = ?"
+
+def create_indexes(cur):
+    """
+    Create the covering indexes of the alara_simulations table, if they do not exist.
+    :param cur: Cursor object for the SQLite connection
+    """
+    for name, columns in INDEXES.items():
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON alara_simulations ({columns})")
+
+def drop_indexes(cur):
+    """
+    Drop the indexes created by create_indexes().
+    :param cur: Cursor object for the SQLite connection
+    """
+    for name in INDEXES:
+        cur.execute(f"DROP INDEX IF EXISTS {name}")
+
+def iter_records(cur, statement, params, arraysize=1000):
+    """
+    Execute a statement that selects the columns in COLUMNS, and yield SimulationRecords,
+    fetching arraysize rows from SQLite at a time.
+    :param cur: Cursor object for the SQLite connection
+    :param statement: (str) parameterized SELECT statement
+    :param params: sequence of the statement parameters
+    :param arraysize: (int) number of rows fetched at once
+    """
+    cur.execute(statement, params)
+    while True:
+        rows = cur.fetchmany(arraysize)
+        if not rows:
+            break
+        yield from map(SimulationRecord._make, rows)
+
+def runs_for_flux(cur, flux_file):
+    """
+    Yield the SimulationRecord of each run that used flux_file (str).
+    """
+    return iter_records(cur, RUNS_FOR_FLUX, (flux_file,))
+
+def runs_for_git_hash(cur, git_hash):
+    """
+    Yield the SimulationRecord of each run made at commit git_hash (str).
+    """
+    return iter_records(cur, RUNS_FOR_GIT_HASH, (git_hash,))
+
+def runs_for_flux_at_commit(cur, flux_file, git_hash):
+    """
+    Yield the SimulationRecord of each run that used flux_file (str) at commit git_hash (str).
+    """
+    return iter_records(cur, RUNS_FOR_FLUX_AT_COMMIT, (flux_file, git_hash))
+
+def query_plan(cur, statement, params):
+    """
+    Return the details of each step of SQLite's query plan for a statement, as a list of str.
+    """
+    return [row[-1] for row in cur.execute(f"EXPLAIN QUERY PLAN {statement}", params)]
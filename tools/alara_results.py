@@ -0,0 +1,254 @@
+"""
+Parse the specific activity and number density tables of ALARA output files, and store
+them in a compressed columnar store linked to the id of each run in alara_simulations.
+
+The tables requested in the output zone block of make_input_lines() are written by ALARA
+as a response title line, followed by a header of decay times and one row per isotope:
+
+    Specific Activity [Bq/cm3]
+    ...
+    isotope	 shutdown  	  1 y  	...
+    =========	...
+    h-3	1.2345e+05	...
+    ...
+    =========	...
+    total	...
+
+The store is a directory of chunk files (part_<n>.npz, written with np.savez_compressed),
+each holding one array per column in STORE_COLUMNS. The arrays of an .npz file are read
+independently, so reading a column never decompresses the other columns. A chunk may also
+hold an EMPTY_IDS array of the ids of runs whose output files hold no tables, so that they
+are not parsed again.
+"""
+import glob
+import os
+import re
+import tempfile
+import numpy as np
+
+RESPONSES = {
+    "specific activity": "specific_activity",
+    "number density": "number_density",
+}
+
+STORE_COLUMNS = ("sim_id", "response", "zone", "isotope", "decay_time", "value")
+
+EMPTY_IDS = "empty_sim_id"
+
+DEFAULT_CHUNK_ROWS = 1 << 20
+
+_separator = re.compile(r"^[-=\s]+$")
+_header_split = re.compile(r"\t+|\s{2,}")
+
+def _match_response(line):
+    lowered = line.lower()
+    for title, response in RESPONSES.items():
+        if title in lowered:
+            return response
+    return None
+
+def _split_header(header):
+    '''
+    Split a table header on tabs or runs of spaces, since decay times such as "1 y" contain
+    single spaces. Headers separated only by single spaces are split on every space.
+    '''
+    fields = [field.strip() for field in _header_split.split(header) if field.strip()]
+    if len(fields) == 1:
+        fields = header.split()
+    return fields
+
+def parse_output_tables(output_lines):
+    """
+    Parse the response tables of an ALARA output file.
+    :param output_lines: iterable of lines (str) of an ALARA output file
+    :return: list of dictionaries, one per table, with structure:
+    {
+        "response": (str) a value of RESPONSES,
+        "zone": (int) index of the table among the tables of the same response,
+        "decay_times": list of str,
+        "isotopes": list of str (including "total", if present),
+        "values": numpy array of shape # isotopes x # decay times
+    }
+    """
+    tables = []
+    zones = {}
+    response = None
+    table = None
+    for line in output_lines:
+        stripped = line.strip()
+        if table is not None:
+            if _separator.match(line) and not (stripped == "" and table["values"]):
+                continue
+            fields = stripped.split()
+            try:
+                values = [float(field) for field in fields[1:]]
+            except ValueError:
+                values = None
+            if values is not None and len(values) == len(table["decay_times"]) and fields:
+                table["isotopes"].append(fields[0])
+                table["values"].append(values)
+                continue
+            table["values"] = np.array(table["values"], dtype=float).reshape(
+                len(table["isotopes"]), len(table["decay_times"]))
+            tables.append(table)
+            table = None
+
+        if response is not None and stripped.lower().startswith("isotope"):
+            table = {
+                "response": response,
+                "zone": zones.get(response, 0),
+                "decay_times": _split_header(stripped)[1:],
+                "isotopes": [],
+                "values": [],
+            }
+            zones[response] = table["zone"] + 1
+            response = None
+        elif stripped:
+            response = _match_response(stripped) or response
+
+    if table is not None:
+        table["values"] = np.array(table["values"], dtype=float).reshape(
+            len(table["isotopes"]), len(table["decay_times"]))
+        tables.append(table)
+    return tables
+
+def read_output_tables(output_file):
+    with open(output_file, 'r') as output:
+        return parse_output_tables(output)
+
+def tables_to_columns(sim_id, tables):
+    """
+    Flatten parsed tables into a dictionary of column arrays (STORE_COLUMNS), with one entry
+    per (table, isotope, decay time).
+    """
+    columns = {column: [] for column in STORE_COLUMNS}
+    for table in tables:
+        num_isotopes, num_decay_times = table["values"].shape
+        num_entries = num_isotopes * num_decay_times
+        columns["sim_id"].append(np.full(num_entries, str(sim_id)))
+        columns["response"].append(np.full(num_entries, table["response"]))
+        columns["zone"].append(np.full(num_entries, table["zone"], dtype=np.int64))
+        columns["isotope"].append(np.repeat(np.array(table["isotopes"], dtype=str), num_decay_times))
+        columns["decay_time"].append(np.tile(np.array(table["decay_times"], dtype=str), num_isotopes))
+        columns["value"].append(table["values"].reshape(-1))
+    return {column: _concatenate(arrays, column) for column, arrays in columns.items()}
+
+def _concatenate(arrays, column):
+    if arrays:
+        return np.concatenate(arrays)
+    return np.array([], dtype=np.float64 if column == "value" else
+                    np.int64 if column == "zone" else str)
+
+def write_chunk(store_dir, columns):
+    """
+    Write a dictionary of column arrays as the next chunk file of a store.
+    The chunk is written to a temporary file, then hard-linked to the first free chunk name,
+    which fails if the name exists, so that concurrent writers never overwrite each other's
+    chunks and readers never see a partial chunk.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=store_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            np.savez_compressed(tmp_file, **columns)
+        chunk_num = len(list_chunks(store_dir))
+        while True:
+            chunk_path = os.path.join(store_dir, f"part_{chunk_num:05d}.npz")
+            try:
+                os.link(tmp_path, chunk_path)
+                return chunk_path
+            except FileExistsError:
+                chunk_num += 1
+    finally:
+        os.unlink(tmp_path)
+
+def list_chunks(store_dir):
+    return sorted(glob.glob(os.path.join(store_dir, "part_*.npz")))
+
+def read_columns(store_dir, columns=STORE_COLUMNS, sim_ids=None, response=None):
+    """
+    Read selected columns of a store, optionally filtered by run id and response.
+    Only the requested columns (and the columns needed for filtering) are decompressed.
+    :param store_dir: (str) store directory
+    :param columns: iterable of column names from STORE_COLUMNS
+    :param sim_ids: iterable of alara_simulations ids (str), or None for all runs
+    :param response: (str) a value of RESPONSES, or None for all responses
+    :return: dictionary of column name: numpy array
+    """
+    columns = list(columns)
+    sim_ids = None if sim_ids is None else np.array([str(sim_id) for sim_id in sim_ids])
+    parts = {column: [] for column in columns}
+    for chunk_path in list_chunks(store_dir):
+        with np.load(chunk_path) as chunk:
+            mask = None
+            if sim_ids is not None:
+                mask = np.isin(chunk["sim_id"], sim_ids)
+            if response is not None:
+                response_mask = chunk["response"] == response
+                mask = response_mask if mask is None else mask & response_mask
+            for column in columns:
+                values = chunk[column]
+                parts[column].append(values if mask is None else values[mask])
+    return {column: _concatenate(arrays, column) for column, arrays in parts.items()}
+
+def stored_sim_ids(store_dir):
+    """
+    Return the set of the ids (str) of the runs in a store, including those whose output
+    files hold no tables.
+    """
+    sim_ids = set()
+    for chunk_path in list_chunks(store_dir):
+        with np.load(chunk_path) as chunk:
+            sim_ids.update(chunk["sim_id"].tolist())
+            if EMPTY_IDS in chunk.files:
+                sim_ids.update(chunk[EMPTY_IDS].tolist())
+    return sim_ids
+
+def ingest_outputs(cur, store_dir, chunk_rows=DEFAULT_CHUNK_ROWS, report=print):
+    """
+    Parse the output file of each run in alara_simulations that is not yet in the store,
+    and append its tables to the store, in chunks of at least chunk_rows entries.
+    Runs whose output file is missing are reported and skipped. Runs whose output file holds
+    no tables are recorded in the EMPTY_IDS array of a chunk, and reported.
+    :param cur: Cursor object for the SQLite connection
+    :param store_dir: (str) store directory
+    :param chunk_rows: (int) number of entries buffered before a chunk is written
+    :param report: callable receiving a message (str) for each missing or empty output file
+    :return: list of ingested alara_simulations ids
+    """
+    stored_ids = stored_sim_ids(store_dir)
+    runs = cur.execute("SELECT id, output_file FROM alara_simulations").fetchall()
+    ingested = []
+    pending = []
+    empty_ids = []
+    pending_rows = 0
+    for sim_id, output_file in runs:
+        if str(sim_id) in stored_ids:
+            continue
+        try:
+            tables = read_output_tables(output_file)
+        except FileNotFoundError:
+            report(f"Output file {output_file} of run {sim_id} is missing, skipped.")
+            continue
+        ingested.append(str(sim_id))
+        if not tables:
+            report(f"Output file {output_file} of run {sim_id} holds no tables.")
+            empty_ids.append(str(sim_id))
+            continue
+        columns = tables_to_columns(sim_id, tables)
+        pending.append(columns)
+        pending_rows += len(columns["value"])
+        if pending_rows >= chunk_rows:
+            _flush(store_dir, pending, empty_ids)
+            pending = []
+            empty_ids = []
+            pending_rows = 0
+    if pending or empty_ids:
+        _flush(store_dir, pending, empty_ids)
+    return ingested
+
+def _flush(store_dir, pending, empty_ids):
+    columns = {column: _concatenate([columns[column] for columns in pending], column)
+               for column in STORE_COLUMNS}
+    columns[EMPTY_IDS] = np.array(empty_ids, dtype=str)
+    write_chunk(store_dir, columns)
@@ -0,0 +1,267 @@
+'''
+Run ALARA on generated input files and record each completed run in alara_simulations.
+
+ALARA is run as "<executable> <input file>", and its standard output is captured as the
+output file of the run, named after the input file and the git hash of the ALARA build, so that
+a sweep at a new git hash never overwrites earlier output files. Output files are written next
+to their input files or, if an output directory is given, at the path of the input file
+relative to the input file directory under it, so that input files of the same name in
+different subdirectories never share an output file. At most max_workers runs execute at once.
+A run that exits with a non-zero status or exceeds its timeout is retried, up to retries more
+times. Output is written to a temporary file that is renamed once the run succeeds, so an
+output file always holds a complete run. Completed runs are inserted into alara_simulations in
+batches (see alara_bookkeeping.bulk_insert()), with the absolute path of the input file, the
+flux files referenced by its flux block and the git hash of the ALARA build.
+
+Completed runs are inserted at least every checkpoint_every seconds, and when the runs are
+interrupted. A sweep is resumed by running the same input files again: the (input_file,
+git_hash) pairs already in alara_simulations are loaded in a single query, and those input
+files are skipped. Input files of a deck store (see deck_store.py) recorded in deck_digests are
+also skipped if another input file with the same digest has a run at the same git hash, and
+only one input file of each digest is run.
+
+Any program with the same command line and output convention can stand in for ALARA (e.g. a
+stub script in tests).
+
+Usage:
+    python alara_runner.py <input file directory> --database activation_results.db --git_hash <hash>
+'''
+import argparse
+import glob
+import os
+import sqlite3
+import subprocess
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import alara_bookkeeping
+import deck_store
+
+ALARA_EXECUTABLE = "alara"
+
+OUTPUT_SUFFIX = ".out"
+
+DEFAULT_TIMEOUT = 3600
+
+DEFAULT_RETRIES = 1
+
+DEFAULT_CHECKPOINT_EVERY = 60
+
+def find_decks(decks):
+    '''
+    List the input files to run.
+    :param decks: (str) directory searched recursively for input files, or iterable of
+        input file paths
+    :return: list of absolute input file paths (str), so that the same input file is always
+        recorded in alara_simulations under the same path
+    '''
+    if isinstance(decks, (str, os.PathLike)):
+        decks = glob.glob(os.path.join(os.path.abspath(decks), '**', f"*{deck_store.DECK_SUFFIX}"),
+                          recursive=True)
+        return sorted(decks)
+    return [os.path.abspath(deck) for deck in decks]
+
+def deck_root(decks, input_files):
+    '''
+    Return the directory under which the input files are found: decks itself if it is a
+    directory, or else the deepest directory containing every input file.
+    '''
+    if isinstance(decks, (str, os.PathLike)):
+        return os.path.abspath(decks)
+    if not input_files:
+        return None
+    return os.path.commonpath([os.path.dirname(os.path.abspath(input_file)) for input_file in input_files])
+
+def output_path(input_file, git_hash, output_dir=None, root=None):
+    '''
+    Return the path of the output file of an input file run at git_hash
+    (<input file stem>.<git_hash>.out): next to the input file, or in output_dir if given, at
+    the path of the input file relative to root (or at its file name if root is None).
+    '''
+    output_file = f"{os.path.splitext(input_file)[0]}.{git_hash}{OUTPUT_SUFFIX}"
+    if output_dir is not None:
+        relative = os.path.basename(output_file) if root is None else os.path.relpath(output_file, root)
+        output_file = os.path.join(output_dir, relative)
+    return output_file
+
+def output_paths(input_files, git_hash, output_dir=None, root=None):
+    '''
+    Return the output file path of each input file (see output_path()), and create their
+    directories. Raise an exception if two input files share an output file.
+    '''
+    output_files = [output_path(input_file, git_hash, output_dir, root) for input_file in input_files]
+    seen = {}
+    for input_file, output_file in zip(input_files, output_files):
+        if output_file in seen:
+            raise Exception(f"Input files {seen[output_file]} and {input_file} have the same "
+                            f"output file {output_file}.")
+        seen[output_file] = input_file
+    for directory in {os.path.dirname(output_file) for output_file in output_files}:
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    return output_files
+
+def deck_flux_files(input_file):
+    '''
+    Return the flux file paths referenced by the flux block of an input file (see
+    build_inp_blocks.write_flux_block()), separated by commas.
+    '''
+    flux_files = {}
+    with open(input_file, 'r') as deck:
+        for line in deck:
+            entries = line.split()
+            if len(entries) > 2 and entries[0] == 'flux':
+                flux_files[entries[2]] = None
+    return ','.join(flux_files)
+
+def run_deck(input_file, command, output_file, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES):
+    '''
+    Run ALARA on one input file, retrying a failed or timed out run up to retries times.
+    :param input_file: (str) path to the input file
+    :param command: list of str, the command preceding the input file
+    :param output_file: (str) path to which the standard output of the run is written
+    :param timeout: (float) maximum duration [s] of each attempt
+    :param retries: (int) number of attempts after the first
+    :return: (number of attempts, error message (str), or None if the run completed)
+    '''
+    partial_file = output_file + ".part"
+    for attempt in range(1, retries + 2):
+        try:
+            with open(partial_file, 'w') as output:
+                result = subprocess.run(command + [input_file], stdout=output,
+                                        stderr=subprocess.PIPE, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            error = f"timed out after {timeout} s"
+            continue
+        if result.returncode == 0:
+            os.replace(partial_file, output_file)
+            return attempt, None
+        error = f"exit status {result.returncode}: {result.stderr.strip()[-500:]}"
+    if os.path.exists(partial_file):
+        os.remove(partial_file)
+    return attempt, error
+
+def run_decks(conn, decks, git_hash, executable=ALARA_EXECUTABLE, output_dir=None,
+              timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, max_workers=None,
+              batch_size=1000, checkpoint_every=DEFAULT_CHECKPOINT_EVERY, resume=True,
+              on_conflict="fail", report=print):
+    '''
+    Run ALARA on input files on a pool of max_workers concurrent runs, and insert a row into
+    alara_simulations for each completed run, as runs complete.
+    :param conn: SQLite connection
+    :param decks: (str) directory of input files, or iterable of input file paths
+    :param git_hash: (str) git commit hash of the ALARA build
+    :param executable: (str) ALARA executable, or list of str (e.g. an interpreter and a script)
+    :param output_dir: (str) directory of the output files, at the paths of the input files
+        relative to the deck directory (see deck_root()), or None to write each output file
+        next to its input file
+    :param timeout: (float) maximum duration [s] of each attempt of each run
+    :param retries: (int) number of attempts after the first of each run
+    :param max_workers: (int) maximum number of concurrent runs, defaults to the number of CPUs
+    :param batch_size: (int) maximum number of completed runs inserted per transaction
+    :param checkpoint_every: (float) maximum time [s] between insertions of completed runs
+    :param resume: (bool) if True, skip the input files already run at git_hash, or whose digest
+        already has a run at git_hash (see deck_store.pending_deck_files()); if False,
+        they are run again at the same output files, so on_conflict should be "replace"
+    :param on_conflict: (str) "fail", "ignore" or "replace" (see alara_bookkeeping.bulk_insert())
+    :param report: callable receiving progress messages (str)
+    :return: dictionary of {'completed': int, 'skipped': int, 'failed': list of
+        (input_file, error message), 'elapsed': float}
+    '''
+    command = [executable] if isinstance(executable, str) else list(executable)
+    input_files = find_decks(decks)
+    root = deck_root(decks, input_files)
+    alara_bookkeeping.create_sqlite_table(conn.cursor())
+    alara_bookkeeping.create_digest_table(conn.cursor())
+
+    start = time.perf_counter()
+    num_skipped = 0
+    if resume:
+        completed = alara_bookkeeping.completed_runs(conn.cursor(), git_hash)
+        pending = [input_file for input_file in input_files if (input_file, git_hash) not in completed]
+        records = alara_bookkeeping.deck_records(conn.cursor(), pending)
+        if records:
+            stored = {deck_file for _, _, deck_file in records}
+            selected = set(deck_store.pending_deck_files(conn.cursor(), records, git_hash))
+            pending = [input_file for input_file in pending
+                       if input_file not in stored or input_file in selected]
+        num_skipped = len(input_files) - len(pending)
+        input_files = pending
+        report(f"{num_skipped} input files already run at {git_hash} are skipped")
+
+    failed = []
+    rows = []
+    num_completed = 0
+    last_checkpoint = time.perf_counter()
+
+    def checkpoint():
+        nonlocal rows, num_completed, last_checkpoint
+        last_checkpoint = time.perf_counter()
+        if rows:
+            # the rows are kept until they are inserted, so that a failed insertion is retried
+            # by the next checkpoint
+            alara_bookkeeping.bulk_insert(conn, rows, len(rows), on_conflict)
+            num_completed += len(rows)
+            rows = []
+            report(f"{num_completed} of {len(input_files)} runs recorded")
+
+    with ThreadPoolExecutor(max_workers or os.cpu_count()) as executor:
+        futures = {}
+        for input_file, output_file in zip(input_files, output_paths(input_files, git_hash, output_dir, root)):
+            future = executor.submit(run_deck, input_file, command, output_file, timeout, retries)
+            futures[future] = (input_file, output_file)
+
+        # completed runs are recorded even if the sweep is interrupted, so that it can be resumed
+        try:
+            for future in as_completed(futures):
+                input_file, output_file = futures[future]
+                attempts, error = future.result()
+                if error is not None:
+                    failed.append((input_file, error))
+                    report(f"{input_file} failed after {attempts} attempts: {error}")
+                else:
+                    rows.append((str(uuid.uuid4()), input_file, output_file,
+                                 deck_flux_files(input_file), git_hash))
+                if len(rows) >= batch_size or time.perf_counter() - last_checkpoint >= checkpoint_every:
+                    checkpoint()
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            checkpoint()
+
+    elapsed = time.perf_counter() - start
+    report(f"{num_completed} of {len(input_files)} runs completed in {elapsed:.2f} s "
+           f"({len(failed)} failed, {num_skipped} skipped)")
+    return {'completed': num_completed, 'skipped': num_skipped, 'failed': failed, 'elapsed': elapsed}
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('decks', help="Directory (str) of the input files to run")
+    parser.add_argument('--database', default="activation_results.db", help="Path (str) to the SQLite database")
+    parser.add_argument('--git_hash', required=True, help="Git commit hash (str) of the ALARA build")
+    parser.add_argument('--executable', default=ALARA_EXECUTABLE)
+    parser.add_argument('--output_dir', default=None)
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES)
+    parser.add_argument('--max_workers', type=int, default=None)
+    parser.add_argument('--checkpoint_every', type=float, default=DEFAULT_CHECKPOINT_EVERY)
+    parser.add_argument('--restart', action='store_true',
+                        help="Rerun input files already run at git_hash, replacing their rows")
+    args = parser.parse_args()
+    return args
+
+def main():
+    args = parse_args()
+    conn = sqlite3.connect(args.database)
+    try:
+        alara_bookkeeping.configure_connection(conn)
+        run_decks(conn, args.decks, args.git_hash, args.executable, args.output_dir,
+                  args.timeout, args.retries, args.max_workers,
+                  checkpoint_every=args.checkpoint_every, resume=not args.restart,
+                  on_conflict="replace" if args.restart else "fail")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
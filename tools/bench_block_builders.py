@@ -0,0 +1,104 @@
+'''
+Show how the input block builders in build_inp_blocks.py scale with the number of
+nuclides in the nuclide library and with the depth of the schedule, compared with the
+previous builders that grew strings with += and concatenated child schedule blocks.
+
+Usage:
+    python bench_block_builders.py --nuclides 1000 10000 100000 --depths 10 100 500
+'''
+import argparse
+import os
+import sys
+import time
+from itertools import count
+import build_inp_blocks as bib
+
+def legacy_make_volume_block(nuclib_lines, volume):
+    vol_lines = "volume\n"
+    load_lines = "mat_loading\n"
+    mix_lines = ""
+    for line in nuclib_lines:
+        nuc = line.strip().split()[0]
+        if ':' in nuc:
+            vol_lines += f'\t {volume}\t{nuc}\n'
+            load_lines += f'\t{nuc}\t mix_{nuc}\n'
+            mix_lines += f'mixture mix_{nuc}\n\t element {nuc} 1 1.0 \nend \n'
+    return vol_lines + "end\n", load_lines + "end\n", mix_lines
+
+def legacy_make_schedule_block(child_dicts, ph_dict, flux_dict, sched_counter=None, sched_name="top"):
+    if sched_counter is None:
+        sched_counter = count(1)
+    current_sched_lines = ""
+    child_lines = ""
+    for child_dict in child_dicts:
+        if child_dict['type'] == 'pulse_entry':
+            current_sched_lines += (
+                f"{child_dict['pulse_length']}\t{child_dict['pulse_length_unit']}\t"
+                f"{flux_dict[child_dict['flux_filepath']]}\t"
+                f"{ph_dict[tuple(child_dict['pulse_history'])]}\t"
+                f"{child_dict['delay_dur']}\t{child_dict['delay_dur_unit']}\n")
+        elif child_dict['type'] == 'schedule':
+            child_name = f"sched_{next(sched_counter)}"
+            current_sched_lines += (
+                f"{child_name}\t{ph_dict[tuple(child_dict['pulse_history'])]}\t"
+                f"{child_dict['delay_dur']}\t{child_dict['delay_dur_unit']}\n")
+            child_lines += legacy_make_schedule_block(
+                child_dict['children'], ph_dict, flux_dict, sched_counter, child_name)
+    current_sched_lines = f"schedule {sched_name}\n{current_sched_lines}\nend\n"
+    return current_sched_lines + child_lines
+
+def make_nuclib_lines(num_nuclides):
+    return [f"n{i}:{i % 3}   1.00783E+00   1   8.98933E-05 1\n" for i in range(num_nuclides)]
+
+def make_deep_schedule(depth, pulses_per_level=20):
+    '''
+    A chain of depth nested schedules, each containing pulses_per_level pulse entries.
+    '''
+    pulse = {'type': 'pulse_entry', 'pulse_length': 1.0, 'pulse_length_unit': 's',
+             'flux_filepath': 'flux', 'pulse_history': [(10, 1.0, 's')],
+             'delay_dur': 1.0, 'delay_dur_unit': 's'}
+    child_dicts = [pulse] * pulses_per_level
+    for _ in range(depth):
+        child_dicts = [{'type': 'schedule', 'children': child_dicts, 'pulse_history': [(10, 1.0, 's')],
+                        'delay_dur': 1.0, 'delay_dur_unit': 's'}] + [pulse] * pulses_per_level
+    return child_dicts
+
+def best_time(func, *args, repeats=3):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def write_schedule_to_file(child_dicts, ph_dict, flux_dict):
+    with open(os.devnull, 'w') as out:
+        bib.write_schedule_block(out, child_dicts, ph_dict, flux_dict)
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--nuclides', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--depths', type=int, nargs='+', default=[10, 100, 500])
+    args = parser.parse_args()
+    return args
+
+def main():
+    args = parse_args()
+    print("nuclides\tlegacy [s]\tmake_volume_block [s]")
+    for num_nuclides in args.nuclides:
+        nuclib_lines = make_nuclib_lines(num_nuclides)
+        print(f"{num_nuclides}\t{best_time(legacy_make_volume_block, nuclib_lines, 1.0):.4f}"
+              f"\t{best_time(bib.make_volume_block, nuclib_lines, 1.0):.4f}")
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 4 * max(args.depths) + 100))
+    ph_dict = {((10, 1.0, 's'),): 'pulse_history_1'}
+    flux_dict = {'flux': 'flux_1'}
+    print("depth\tlegacy [s]\tmake_schedule_block [s]\twrite_schedule_block to file [s]")
+    for depth in args.depths:
+        child_dicts = make_deep_schedule(depth)
+        print(f"{depth}\t{best_time(legacy_make_schedule_block, child_dicts, ph_dict, flux_dict):.4f}"
+              f"\t{best_time(bib.make_schedule_block, child_dicts, ph_dict, flux_dict):.4f}"
+              f"\t{best_time(write_schedule_to_file, child_dicts, ph_dict, flux_dict):.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+'''
+Compare the parse time and peak memory (RSS) of the chunked, memory-mapped flux
+reader in flux_io.py against the readlines/join/split path that script_template.py
+used previously. Each reader is run in its own subprocess so that the peak RSS
+reported for one does not include the other.
+
+Usage:
+    python bench_flux_reader.py --num_intervals 200000 --num_groups 175
+'''
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import flux_io
+
+def legacy_read_flux_file(flux_file, num_groups):
+    '''
+    Previous path: open_flux_file() followed by parse_flux_lines().
+    '''
+    with open(flux_file, 'r') as flux_data:
+        flux_lines = flux_data.readlines()
+    all_entries = np.array(' '.join(flux_lines).split(), dtype=float)
+    num_intervals = flux_io.calc_num_intervals(len(all_entries), num_groups)
+    return all_entries.reshape(num_intervals, num_groups)
+
+READERS = {
+    'legacy': legacy_read_flux_file,
+    'mmap': flux_io.read_flux_file,
+}
+
+def write_flux_file(flux_file, num_intervals, num_groups, seed=0):
+    rng = np.random.default_rng(seed)
+    with open(flux_file, 'w') as flux_data:
+        for start in range(0, num_intervals, 10000):
+            block = rng.random((min(10000, num_intervals - start), num_groups)) * 1e14
+            np.savetxt(flux_data, block.reshape(-1, 5), fmt='%.5E')
+
+def run_reader(reader, flux_file, num_groups):
+    start = time.perf_counter()
+    flux_array = READERS[reader](flux_file, num_groups)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is reported in kB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{reader}\t{elapsed:.3f}\t{peak_rss_mb:.1f}\t{flux_array.nbytes / 2**20:.1f}")
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num_intervals', type=int, default=100000)
+    parser.add_argument('--num_groups', type=int, default=175)
+    parser.add_argument('--flux_file', default=None, help="Existing flux file to parse instead of a generated one")
+    parser.add_argument('--reader', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    return args
+
+def main():
+    args = parse_args()
+    if args.reader is not None:
+        run_reader(args.reader, args.flux_file, args.num_groups)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        flux_file = args.flux_file
+        if flux_file is None:
+            flux_file = os.path.join(tmp_dir, 'bench_flux')
+            write_flux_file(flux_file, args.num_intervals, args.num_groups)
+        print(f"flux file: {os.path.getsize(flux_file) / 2**20:.1f} MB")
+        print("reader\ttime [s]\tpeak RSS [MB]\tarray [MB]")
+        for reader in READERS:
+            subprocess.run([sys.executable, __file__, '--reader', reader,
+                            '--flux_file', flux_file,
+                            '--num_groups', str(args.num_groups)], check=True)
+
+if __name__ == "__main__":
+    main()
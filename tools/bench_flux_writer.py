@@ -0,0 +1,55 @@
+'''
+Compare the time to write a flux array as ALARA flux files with flux_io.write_flux_file()
+against a per-value str() loop, and the time to write many scaled copies with
+flux_io.write_flux_files() on a pool of processes.
+
+Usage:
+    python bench_flux_writer.py --num_intervals 20000 --num_groups 175 --num_files 16
+'''
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import flux_io
+
+def legacy_write_flux_file(flux_file, flux_array):
+    '''
+    Per-value str() formatting of each entry.
+    '''
+    with open(flux_file, 'w') as flux_data:
+        for row in flux_array:
+            flux_data.write(' '.join([str(entry) for entry in row]) + '\n')
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num_intervals', type=int, default=20000)
+    parser.add_argument('--num_groups', type=int, default=175)
+    parser.add_argument('--num_files', type=int, default=16)
+    parser.add_argument('--max_workers', type=int, default=None)
+    args = parser.parse_args()
+    return args
+
+def main():
+    args = parse_args()
+    flux_array = np.random.default_rng(0).random((args.num_intervals, args.num_groups)) * 1e14
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        flux_file = os.path.join(tmp_dir, 'bench_flux')
+        print("writer\ttime [s]")
+        for name, writer in [('legacy', legacy_write_flux_file), ('bulk', flux_io.write_flux_file)]:
+            start = time.perf_counter()
+            writer(flux_file, flux_array)
+            print(f"{name}\t{time.perf_counter() - start:.3f}")
+        assert np.array_equal(flux_io.read_flux_file(flux_file, args.num_groups), flux_array)
+
+        flux_files = [os.path.join(tmp_dir, f'bench_flux_{i}') for i in range(args.num_files)]
+        scales = np.linspace(0.5, 2.0, args.num_files)
+        for max_workers in [1, args.max_workers]:
+            start = time.perf_counter()
+            flux_io.write_flux_files(flux_array, flux_files, scales=scales, max_workers=max_workers)
+            print(f"{args.num_files} scaled files, max_workers={max_workers}\t"
+                  f"{time.perf_counter() - start:.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+'''
+Compare the accuracy and speed of the closed form of schedule_transforms.flatten_ph_levels()
+(and of flatten_ph_level_arrays()) with the previous implementation, which multiplied a
+fluence factor by the ratio of fluence to duration at each level. Errors are relative to an
+exact evaluation with fractions.Fraction, over random pulse histories with each number of levels.
+
+Usage:
+    python bench_ph_levels.py --levels 2 5 20 100 1000 --samples 200
+'''
+import argparse
+import time
+from fractions import Fraction
+import numpy as np
+import schedule_transforms as st
+
+def legacy_flatten_ph_levels(pulse_length, pulse_history):
+    tot_ff_flat = 1
+    tot_dur_flat = pulse_length
+    for lvl_hist in pulse_history:
+        tot_dur_flat, fluence_flat = st.flatten_pulse_history(tot_dur_flat, lvl_hist)
+        tot_ff_flat *= fluence_flat / tot_dur_flat
+    return tot_dur_flat, tot_dur_flat * tot_ff_flat
+
+def exact_flatten_ph_levels(pulse_length, pulse_history):
+    tot_dur = Fraction(pulse_length)
+    tot_fluence = Fraction(pulse_length)
+    for num_pulses, dwell_time in pulse_history:
+        tot_dur = num_pulses * tot_dur + (num_pulses - 1) * Fraction(dwell_time)
+        tot_fluence *= num_pulses
+    return tot_dur, tot_fluence
+
+def relative_error(obs, exp):
+    return float(abs(Fraction(float(obs)) - exp) / exp)
+
+def make_pulse_histories(num_levels, num_samples, rng):
+    '''
+    Random pulse histories with up to 3 pulses per level, so products stay finite.
+    '''
+    num_pulses = rng.integers(1, 4, (num_samples, num_levels))
+    dwell_times = rng.uniform(0, 100, (num_samples, num_levels))
+    return [list(zip(num_pulses[i].tolist(), dwell_times[i].tolist())) for i in range(num_samples)]
+
+def time_per_call(func, pulse_length, pulse_histories):
+    start = time.perf_counter()
+    for pulse_history in pulse_histories:
+        func(pulse_length, pulse_history)
+    return (time.perf_counter() - start) / len(pulse_histories)
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--levels', type=int, nargs='+', default=[2, 5, 20, 100, 1000])
+    parser.add_argument('--samples', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    return args
+
+def main():
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+    pulse_length = 0.1
+    print("levels\tlegacy max rel. error (dur, fluence)\tclosed form max rel. error (dur, fluence)"
+          "\tlegacy [us/call]\tclosed form [us/call]\tarrays [us/history]")
+    for num_levels in args.levels:
+        pulse_histories = make_pulse_histories(num_levels, args.samples, rng)
+        legacy_errors = np.zeros(2)
+        errors = np.zeros(2)
+        for pulse_history in pulse_histories:
+            exact = exact_flatten_ph_levels(pulse_length, pulse_history)
+            legacy = legacy_flatten_ph_levels(pulse_length, pulse_history)
+            closed = st.flatten_ph_levels(pulse_length, pulse_history)
+            legacy_errors = np.maximum(legacy_errors, [relative_error(*pair) for pair in zip(legacy, exact)])
+            errors = np.maximum(errors, [relative_error(*pair) for pair in zip(closed, exact)])
+
+        legacy_time = time_per_call(legacy_flatten_ph_levels, pulse_length, pulse_histories)
+        closed_time = time_per_call(st.flatten_ph_levels, pulse_length, pulse_histories)
+        levels = np.array(pulse_histories).transpose(1, 2, 0)
+        start = time.perf_counter()
+        st.flatten_ph_level_arrays(pulse_length, levels[:, 0], levels[:, 1])
+        arrays_time = (time.perf_counter() - start) / args.samples
+        print(f"{num_levels}\t{legacy_errors[0]:.2e}, {legacy_errors[1]:.2e}"
+              f"\t{errors[0]:.2e}, {errors[1]:.2e}"
+              f"\t{legacy_time * 1e6:.2f}\t{closed_time * 1e6:.2f}\t{arrays_time * 1e6:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+'''
+Compare the latency of the alara_queries lookups with and without the covering
+indexes of alara_queries.create_indexes(), on a database of generated rows.
+
+Usage:
+    python bench_queries.py --num_rows 1000000 --num_flux_files 1000 --num_git_hashes 100
+'''
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import alara_bookkeeping as ab
+import alara_queries as aq
+
+def make_rows(num_rows, num_flux_files, num_git_hashes):
+    for i in range(num_rows):
+        yield (str(i), f"inp_{i}", f"out_{i}", f"flux_{i % num_flux_files}",
+               f"{i % num_git_hashes:040x}")
+
+def time_queries(cur, num_flux_files, num_git_hashes, repeats):
+    queries = {
+        'runs_for_flux': lambda i: aq.runs_for_flux(cur, f"flux_{i % num_flux_files}"),
+        'runs_for_git_hash': lambda i: aq.runs_for_git_hash(cur, f"{i % num_git_hashes:040x}"),
+        'runs_for_flux_at_commit': lambda i: aq.runs_for_flux_at_commit(
+            cur, f"flux_{i % num_flux_files}", f"{i % num_git_hashes:040x}"),
+    }
+    latencies = {}
+    for name, query in queries.items():
+        start = time.perf_counter()
+        for i in range(repeats):
+            for _ in query(i):
+                pass
+        latencies[name] = (time.perf_counter() - start) / repeats
+    return latencies
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num_rows', type=int, default=1000000)
+    parser.add_argument('--num_flux_files', type=int, default=1000)
+    parser.add_argument('--num_git_hashes', type=int, default=100)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+    return args
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = sqlite3.connect(os.path.join(tmp_dir, "bench.db"))
+        ab.configure_connection(conn)
+        cur = conn.cursor()
+        ab.create_sqlite_table(cur)
+        conn.commit()
+        stats = ab.bulk_insert(conn, make_rows(args.num_rows, args.num_flux_files, args.num_git_hashes),
+                               batch_size=100000)
+        print(f"inserted {stats['rows']} rows ({stats['rows_per_s']:.0f} rows/s)")
+
+        scan = time_queries(cur, args.num_flux_files, args.num_git_hashes, args.repeats)
+        start = time.perf_counter()
+        aq.create_indexes(cur)
+        conn.commit()
+        print(f"created indexes in {time.perf_counter() - start:.2f} s")
+        indexed = time_queries(cur, args.num_flux_files, args.num_git_hashes, args.repeats)
+
+        print("query\tscan [ms]\tindex [ms]")
+        for name in scan:
+            print(f"{name}\t{scan[name] * 1e3:.2f}\t{indexed[name] * 1e3:.2f}")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+'''
+Stress the schedule traversals on very deep and very wide schedules: a chain of nested
+schedules (beyond Python's recursion limit) and a single schedule with many pulse entries.
+Each traversal is timed separately, from building the ScheduleIR to writing the schedule
+block and evaluating the flattened and compressed schedule.
+
+Usage:
+    python bench_schedule_depth.py --depths 1000 10000 --widths 10000 100000
+'''
+import argparse
+import os
+import time
+import build_inp_blocks as bib
+import schedule_ir
+import schedule_transforms as st
+
+def make_pulse(pulse_length, unit):
+    '''
+    With unit None, the pulse entry has the unitless form of schedule_transforms.py.
+    '''
+    if unit is None:
+        return {'type': 'pulse_entry', 'pulse_length': pulse_length,
+                'pulse_history': [(2, 1.0)], 'delay_dur': 1.0}
+    return {'type': 'pulse_entry', 'pulse_length': pulse_length, 'pulse_length_unit': unit,
+            'flux_filepath': 'flux', 'pulse_history': [(2, 1.0, unit)],
+            'delay_dur': 1.0, 'delay_dur_unit': unit}
+
+def make_schedule(children, unit):
+    if unit is None:
+        return {'type': 'schedule', 'children': children, 'pulse_history': [(1, 0.0)],
+                'delay_dur': 1.0}
+    return {'type': 'schedule', 'children': children, 'pulse_history': [(1, 0.0, unit)],
+            'delay_dur': 1.0, 'delay_dur_unit': unit}
+
+def make_deep_schedule(depth, unit='s'):
+    '''
+    A chain of depth nested schedules with a single pulse entry at the bottom.
+    '''
+    child_dicts = [make_pulse(1.0, unit)]
+    for _ in range(depth):
+        child_dicts = [make_schedule(child_dicts, unit)]
+    return child_dicts
+
+def make_wide_schedule(width, unit='s'):
+    '''
+    A single schedule of width pulse entries.
+    '''
+    return [make_schedule([make_pulse(1.0 + i % 7, unit) for i in range(width)], unit)]
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def write_schedule_to_file(sched, ph_dict, flux_dict):
+    with open(os.devnull, 'w') as out:
+        bib.write_schedule_block(out, sched, ph_dict, flux_dict)
+
+def run(label, size, make_child_dicts):
+    child_dicts = make_child_dicts(size)
+    sched, build_time = timed(schedule_ir.build_schedule_ir, child_dicts)
+    (_, ph_dict, flux_dict), intern_time = timed(bib.intern_schedule, sched)
+    _, write_time = timed(write_schedule_to_file, sched, ph_dict, flux_dict)
+
+    transform_dicts = make_child_dicts(size, None)
+    transform_sched = schedule_ir.build_schedule_ir(transform_dicts)
+    _, flatten_time = timed(st.flatten_schedule, transform_sched)
+    _, compress_time = timed(st.compress_schedule, transform_sched)
+    compiled, compile_time = timed(st.compile_schedule, transform_dicts, [(1, 0)])
+    _, compiled_time = timed(st.flatten_compiled, compiled)
+    print(f"{label}\t{size}\t{build_time:.4f}\t{intern_time:.4f}\t{write_time:.4f}"
+          f"\t{flatten_time:.4f}\t{compress_time:.4f}\t{compile_time:.4f}\t{compiled_time:.4f}")
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--depths', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--widths', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+    return args
+
+def main():
+    args = parse_args()
+    print("shape\tsize\tbuild IR [s]\tintern [s]\twrite schedule block [s]"
+          "\tflatten [s]\tcompress [s]\tcompile [s]\tflatten compiled [s]")
+    for depth in args.depths:
+        run("depth", depth, make_deep_schedule)
+    for width in args.widths:
+        run("width", width, make_wide_schedule)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+'''
+Measure the start-up cost (wall time and peak RSS) of a fresh worker process for
+each of the statements in STATEMENTS, which are each run in their own Python process.
+The openmc import is skipped if openmc is not installed.
+
+Usage:
+    python bench_startup.py --repeats 5
+'''
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+
+STATEMENTS = {
+    'python': "pass",
+    'import numpy': "import numpy",
+    'import script_template': "import script_template",
+    'get_num_groups': "import group_structures; group_structures.get_num_groups('VITAMIN-J-175')",
+    'import openmc': "import openmc; openmc.mgxs.GROUP_STRUCTURES['VITAMIN-J-175']",
+}
+
+TIMED = '''
+import resource, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+'''
+
+def time_statement(statement, repeats):
+    times = []
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, '-c', TIMED.format(statement=statement)],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        elapsed, peak_rss_mb = map(float, result.stdout.split())
+        times.append(elapsed)
+    return min(times), peak_rss_mb
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeats', type=int, default=5, help="Number of processes started per statement")
+    args = parser.parse_args()
+    return args
+
+def main():
+    args = parse_args()
+    print("statement\tbest time [s]\tpeak RSS [MB]")
+    for label, statement in STATEMENTS.items():
+        if label == 'import openmc' and importlib.util.find_spec('openmc') is None:
+            print(f"{label}\tskipped (openmc not installed)")
+            continue
+        elapsed, peak_rss_mb = time_statement(statement, args.repeats)
+        print(f"{label}\t{elapsed:.4f}\t{peak_rss_mb:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+'''
+Time the screening of many variants of a pulsed schedule with activation_surrogate.py:
+the exact activity and the errors of the flattened and compressed approximations, for
+random pulse lengths, dwell times and numbers of pulses, evaluated in chunks.
+
+Usage:
+    python bench_surrogate.py --variants 1000000 --decay_constants 8 --chunk 100000
+'''
+import argparse
+import time
+import numpy as np
+import activation_surrogate as surrogate
+import ph_reduction
+import schedule_transforms as st
+
+child_dicts = [{
+    'type': 'schedule',
+    'pulse_history': [(5, 7200.0)],
+    'delay_dur': 86400.0,
+    'children': [
+        {'type': 'pulse_entry', 'pulse_length': 400.0, 'pulse_history': [(20, 1200.0)],
+         'delay_dur': 3600.0},
+        {'type': 'pulse_entry', 'pulse_length': 100.0, 'pulse_history': [(1, 0)],
+         'delay_dur': 0},
+    ]
+}]
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--variants', type=int, default=1000000)
+    parser.add_argument('--decay_constants', type=int, default=8)
+    parser.add_argument('--chunk', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    return args
+
+def main():
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+    compiled = st.compile_schedule(child_dicts, [(1, 0)])
+    decay_constants = ph_reduction.decay_constant_grid(1e-8, 1e-2, args.decay_constants)
+    worst_flatten = np.zeros(args.decay_constants)
+    worst_compress = np.zeros(args.decay_constants)
+
+    start = time.perf_counter()
+    for first in range(0, args.variants, args.chunk):
+        num_variants = min(args.chunk, args.variants - first)
+        params = {
+            'p1.pulse_length': rng.uniform(10, 1000, num_variants),
+            'p1.pulse_history.0.dwell_time': rng.uniform(0, 3600, num_variants),
+            'p1.pulse_history.0.num_pulses': rng.integers(1, 100, num_variants),
+        }
+        comparison = surrogate.compare_approximations(compiled, decay_constants, params)
+        worst_flatten = np.maximum(worst_flatten, np.abs(comparison['flatten_error']).max(axis=0))
+        worst_compress = np.maximum(worst_compress, np.abs(comparison['compress_error']).max(axis=0))
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.variants} variants x {args.decay_constants} decay constants in {elapsed:.2f} s"
+          f" ({args.variants / elapsed:.0f} variants/s)")
+    print("decay constant\tmax |flatten error|\tmax |compress error|")
+    for decay_constant, flatten_error, compress_error in zip(decay_constants, worst_flatten, worst_compress):
+        print(f"{decay_constant:.2e}\t{flatten_error:.3e}\t{compress_error:.3e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+'''
+Generate the ALARA input files of a parameter sweep on a pool of worker processes.
+
+A sweep is specified as a dictionary (or YAML file) with the structure:
+{
+    'nuclib': (str) path to the ALARA nuclide library,
+    'volume': (float) or iterable of float,
+    'schedules': {schedule name (str): child_dicts (see build_inp_blocks.py)},
+    'flux_files': (optional) iterable of str, each replacing the flux_filepath
+                  of every pulse entry in each schedule,
+    'trunc_tolerances': iterable of float,
+    'output_dir': (str) directory of the generated input files,
+    'time_unit': (optional) (str) ALARA time unit code to which every time of each
+                 schedule is converted (see time_units.normalize_schedule()),
+    'deck_store': (optional) (str) directory of a content-addressed store (see deck_store.py);
+                  if given, each distinct input file is written once to the store under its
+                  digest, instead of to output_dir under its name,
+    'database': (optional) (str) path to the SQLite database in which the digest of each
+                input file is recorded, when deck_store is given
+}
+One input file is written for each combination of schedule, flux file, volume and truncation
+tolerance. The nuclide library is parsed once into volume, loading and mixture block templates
+(see build_inp_blocks.make_volume_templates()), which are sent to each worker process once when
+it starts rather than with every input file. Only the volume value is substituted per input file.
+'''
+import argparse
+import collections
+import itertools
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+import yaml
+import alara_bookkeeping
+import build_inp_blocks as bib
+import deck_store
+import time_units
+
+PENDING_CHUNKS_PER_WORKER = 4
+
+_volume_templates = None
+_deck_store = None
+
+def prepare_schedule(child_dicts, flux_filepath=None):
+    '''
+    Copy a child_dicts structure, converting each pulse history level to a tuple (as
+    required for the keys of make_ph_dict()), and optionally replacing the flux_filepath
+    of every pulse entry.
+    '''
+    prepared = []
+    stack = [(child_dicts, prepared)]
+    while stack:
+        originals, copies = stack.pop()
+        for child_dict in originals:
+            child_dict = dict(child_dict)
+            child_dict['pulse_history'] = [tuple(level) for level in child_dict['pulse_history']]
+            if child_dict['type'] == 'schedule':
+                stack.append((child_dict['children'], []))
+                child_dict['children'] = stack[-1][1]
+            elif flux_filepath is not None:
+                child_dict['flux_filepath'] = flux_filepath
+            copies.append(child_dict)
+    return prepared
+
+def make_deck_specs(sweep):
+    '''
+    Yield (input_filename, child_dicts, trunc_tolerance, volume) for each input file of a sweep.
+    '''
+    flux_files = sweep.get('flux_files') or [None]
+    schedules = sweep['schedules']
+    if sweep.get('time_unit') is not None:
+        schedules = {sched_name: time_units.normalize_schedule(child_dicts, sweep['time_unit'])
+                     for sched_name, child_dicts in schedules.items()}
+    volumes = sweep['volume']
+    vol_label = isinstance(volumes, (list, tuple))
+    if not vol_label:
+        volumes = [volumes]
+    for (sched_name, child_dicts), (flux_idx, flux_file), volume, trunc_tolerance in itertools.product(
+            schedules.items(), enumerate(flux_files), volumes, sweep['trunc_tolerances']):
+        vol_name = f"_vol_{volume:g}" if vol_label else ""
+        input_filename = os.path.join(
+            sweep['output_dir'], f"{sched_name}_flux_{flux_idx}{vol_name}_trunc_{trunc_tolerance:g}.inp")
+        yield input_filename, prepare_schedule(child_dicts, flux_file), trunc_tolerance, volume
+
+def _init_worker(volume_templates, store_dir=None):
+    global _volume_templates, _deck_store
+    _volume_templates = volume_templates
+    _deck_store = store_dir
+
+def write_deck(deck_spec):
+    '''
+    Build and write a single input file, using the volume block templates set by _init_worker().
+    If a deck store was set by _init_worker(), the input file is stored under its digest.
+    :param deck_spec: (input_filename, child_dicts, trunc_tolerance, volume)
+    :return: input_filename, or (input_filename, digest, stored input file path) with a deck store
+    '''
+    input_filename, child_dicts, trunc_tolerance, volume = deck_spec
+    sched, ph_dict, flux_dict = bib.intern_schedule(child_dicts)
+    vol_lines, load_lines, mix_lines = bib.render_volume_block(_volume_templates, volume)
+    if _deck_store is not None:
+        digest, deck_file, _ = deck_store.store_inp_deck(
+            _deck_store, vol_lines, load_lines, mix_lines, sched, ph_dict, flux_dict, trunc_tolerance)
+        return input_filename, digest, deck_file
+    bib.write_inp_deck(input_filename, vol_lines, load_lines, mix_lines, sched, ph_dict,
+                       flux_dict, trunc_tolerance)
+    return input_filename
+
+def write_decks(deck_specs):
+    '''
+    Write a chunk of input files with write_deck().
+    :return: list of the result of write_deck() for each input file
+    '''
+    return [write_deck(deck_spec) for deck_spec in deck_specs]
+
+def _map_bounded(executor, deck_specs, chunksize, max_pending):
+    '''
+    Yield the results of write_deck() over deck_specs in order, submitting chunks of chunksize
+    input files to executor with at most max_pending chunks submitted but not yet consumed,
+    so that only a bounded window of deck_specs is held in memory.
+    '''
+    deck_specs = iter(deck_specs)
+    pending = collections.deque()
+    while True:
+        while len(pending) < max_pending:
+            chunk = list(itertools.islice(deck_specs, chunksize))
+            if not chunk:
+                break
+            pending.append(executor.submit(write_decks, chunk))
+        if not pending:
+            return
+        yield from pending.popleft().result()
+
+def generate_decks(deck_specs, volume_templates, max_workers=None,
+                   chunksize=16, progress_every=1000, report=print, store_dir=None):
+    '''
+    Write the input files of deck_specs on a pool of max_workers processes.
+    :param deck_specs: iterable of (input_filename, child_dicts, trunc_tolerance, volume)
+    :param volume_templates: output of build_inp_blocks.make_volume_templates()
+    :param max_workers: (int) number of worker processes, defaults to the number of CPUs.
+        With max_workers=1 the input files are written serially in this process.
+    :param chunksize: (int) number of input files sent to a worker at once; at most
+        PENDING_CHUNKS_PER_WORKER chunks per worker are held in memory at once
+    :param progress_every: (int) number of input files between progress reports
+    :param report: callable receiving progress messages (str)
+    :param store_dir: (str) directory of a deck store (see deck_store.py), or None to write
+        each input file under its name
+    output : list of the result of write_deck() for each input file, and a dictionary of
+        {'num_decks': int, 'elapsed': float, 'decks_per_s': float}, with 'num_unique': int,
+        the number of distinct input files, when store_dir is given
+    '''
+    start = time.perf_counter()
+    input_filenames = []
+    if max_workers == 1:
+        _init_worker(volume_templates, store_dir)
+        _report_progress(map(write_deck, deck_specs), input_filenames,
+                         start, progress_every, report)
+    else:
+        max_pending = (max_workers or os.cpu_count()) * PENDING_CHUNKS_PER_WORKER
+        with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                                 initargs=(volume_templates, store_dir)) as executor:
+            _report_progress(_map_bounded(executor, deck_specs, chunksize, max_pending),
+                             input_filenames, start, progress_every, report)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'num_decks': len(input_filenames),
+        'elapsed': elapsed,
+        'decks_per_s': len(input_filenames) / elapsed if elapsed > 0 else float('inf'),
+    }
+    if store_dir is not None:
+        stats['num_unique'] = len({digest for _, digest, _ in input_filenames})
+        report(f"{stats['num_unique']} distinct input files stored in {store_dir}")
+    report(f"{stats['num_decks']} input files written in {elapsed:.2f} s "
+           f"({stats['decks_per_s']:.1f} decks/s)")
+    return input_filenames, stats
+
+def _report_progress(results, input_filenames, start, progress_every, report):
+    for input_filename in results:
+        input_filenames.append(input_filename)
+        if len(input_filenames) % progress_every == 0:
+            rate = len(input_filenames) / (time.perf_counter() - start)
+            report(f"{len(input_filenames)} input files written ({rate:.1f} decks/s)")
+
+def generate_sweep(sweep, max_workers=None, report=print):
+    '''
+    Write all input files of a sweep specification (see module docstring).
+    '''
+    volume_templates = bib.make_volume_templates(bib.load_nuclides(sweep['nuclib']))
+    store_dir = sweep.get('deck_store')
+    if store_dir is None:
+        os.makedirs(sweep['output_dir'], exist_ok=True)
+    input_filenames, stats = generate_decks(make_deck_specs(sweep), volume_templates,
+                                            max_workers=max_workers, report=report,
+                                            store_dir=store_dir)
+    if store_dir is not None and sweep.get('database') is not None:
+        with sqlite3.connect(sweep['database']) as conn:
+            alara_bookkeeping.create_digest_table(conn.cursor())
+            alara_bookkeeping.record_digests(conn, input_filenames)
+        conn.close()
+    return input_filenames, stats
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sweep_yaml', required=True, help="Path (str) to YAML containing the sweep specification")
+    parser.add_argument('--max_workers', type=int, default=None, help="Number of worker processes")
+    args = parser.parse_args()
+    return args
+
+def main():
+    args = parse_args()
+    with open(args.sweep_yaml, 'r') as yaml_file:
+        sweep = yaml.safe_load(yaml_file)
+    generate_sweep(sweep, args.max_workers)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,8 @@
+import functools
+import io
+import os
 from itertools import count
+import schedule_ir
 """
 The following data structure (child_dicts) is
 an iterable of dictionaries, where each dictionary contains the details
@@ -30,124 +34,201 @@ def make_ph_dict(child_dicts, ph_counter=None):
     Create a dictionary where the key is an iterable of tuples, with each tuple containing
     the number of pulses (int), pulse dwell time (float), and the unit of the dwell time (str).
     The value is a name assigned to the pulse history.
-    Each unique pulse history tuple maps to a single pulse history name.
+    Each unique pulse history tuple maps to a single pulse history name, numbered densely
+    in the order of first appearance.
+    child_dicts may also be a schedule_ir.ScheduleIR.
     '''
     if ph_counter is None:
         ph_counter = count(1)
 
-    ph_dict = {}
-
-    for child_dict in child_dicts:
-        ph_dict[tuple(
-            child_dict['pulse_history'])] = f'pulse_history_{next(ph_counter)}'
-
-        if child_dict['type'] == 'schedule':
-            ph_dict |= make_ph_dict(child_dict['children'], ph_counter)
-
-    return ph_dict
+    return {pulse_history: f'pulse_history_{next(ph_counter)}'
+            for pulse_history in schedule_ir.as_schedule_ir(child_dicts).pulse_histories}
 
 
 def make_flux_dict(child_dicts, flux_counter=None):
     if flux_counter is None:
         flux_counter = count(1)
-    flux_dict = {}
-    for child_dict in child_dicts:
-        if child_dict['type'] == 'pulse_entry':
-            flux_dict[
-                child_dict['flux_filepath']] = f'flux_{next(flux_counter)}'
-        elif child_dict['type'] == 'schedule':
-            flux_dict |= make_flux_dict(child_dict['children'], flux_counter)
+    return {flux_filepath: f'flux_{next(flux_counter)}'
+            for flux_filepath in schedule_ir.as_schedule_ir(child_dicts).flux_filepaths}
 
-    return flux_dict
 
+def intern_schedule(child_dicts):
+    '''
+    Build the ScheduleIR of a schedule, together with its pulse history and flux dictionaries
+    (see make_ph_dict() and make_flux_dict()), in a single traversal of child_dicts.
+    The output can be passed directly to make_schedule_block() or write_input_lines().
+    :return: (sched, ph_dict, flux_dict)
+    '''
+    sched = schedule_ir.as_schedule_ir(child_dicts)
+    return sched, make_ph_dict(sched), make_flux_dict(sched)
 
-def make_flux_block(flux_dict):
+
+def write_flux_block(out, flux_dict):
     '''
-    Create the flux block of an ALARA input file.
+    Write the flux block of an ALARA input file to out (any object with a write() method).
     '''
-    flux_lines = ""
     for flux_path, name in flux_dict.items():
-        flux_lines += f"flux {name} {flux_path} 0 default\n"
-    return flux_lines + "\n"
+        out.write(f"flux {name} {flux_path} 0 default\n")
+    out.write("\n")
 
 
-def make_pulse_history_block(ph_dict):
+def make_flux_block(flux_dict):
     '''
-    Creates the lines comprising the pulse history block of an ALARA input file.
+    Create the flux block of an ALARA input file.
     '''
+    out = io.StringIO()
+    write_flux_block(out, flux_dict)
+    return out.getvalue()
+
 
-    all_ph_lines = ""
+def write_pulse_history_block(out, ph_dict):
+    '''
+    Write the pulse history block of an ALARA input file to out (any object with a write() method).
+    '''
     for ph_list, ph_name in ph_dict.items():
-        ph_lines = ""
+        out.write(f"pulsehistory {ph_name}\n")
         for level in ph_list:
-            ph_lines += '\t'.join([str(e) for e in level]) + '\n'
-        all_ph_lines += f"pulsehistory {ph_name}\n{ph_lines}\nend\n"
-    return all_ph_lines + "\n"
+            out.write('\t'.join([str(e) for e in level]) + '\n')
+        out.write("\nend\n")
+    out.write("\n")
 
 
-def make_schedule_block(child_dicts, ph_dict, flux_dict, sched_counter=None, sched_name="top"):
+def make_pulse_history_block(ph_dict):
     '''
-    Creates the lines comprising the schedule block of an ALARA input file.
+    Creates the lines comprising the pulse history block of an ALARA input file.
     '''
-    if sched_counter is None:
-        sched_counter = count(1)
-    current_sched_lines = ""
-    child_lines = ""
-
-    for child_dict in child_dicts:
-        if child_dict['type'] == 'pulse_entry':
-            current_sched_lines += (
-                f"{child_dict['pulse_length']}\t"
-                f"{child_dict['pulse_length_unit']}\t"
-                f"{flux_dict[child_dict['flux_filepath']]}\t"
-                f"{ph_dict[tuple(child_dict['pulse_history'])]}\t"
-                f"{child_dict['delay_dur']}\t"
-                f"{child_dict['delay_dur_unit']}\n"
-            )
+    out = io.StringIO()
+    write_pulse_history_block(out, ph_dict)
+    return out.getvalue()
 
-        elif child_dict['type'] == 'schedule':
-            child_name = f"sched_{next(sched_counter)}"
 
-            current_sched_lines += (
-                f"{child_name}\t"
-                f"{ph_dict[tuple(child_dict['pulse_history'])]}\t"
-                f"{child_dict['delay_dur']}\t"
-                f"{child_dict['delay_dur_unit']}\n"
+def _write_schedule(out, sched_name, children, ph_dict, flux_dict, sched_names):
+    out.write(f"schedule {sched_name}\n")
+    for node in children:
+        if node.is_schedule:
+            out.write(
+                f"{sched_names[id(node)]}\t"
+                f"{ph_dict[node.pulse_history]}\t"
+                f"{node.delay_dur}\t"
+                f"{node.delay_dur_unit}\n"
             )
-            child_block = make_schedule_block(
-                child_dict['children'],
-                ph_dict,
-                flux_dict,
-                sched_counter,
-                sched_name=child_name
+        else:
+            out.write(
+                f"{node.pulse_length}\t"
+                f"{node.pulse_length_unit}\t"
+                f"{flux_dict[node.flux_filepath]}\t"
+                f"{ph_dict[node.pulse_history]}\t"
+                f"{node.delay_dur}\t"
+                f"{node.delay_dur_unit}\n"
             )
+    out.write("\nend\n")
 
-            child_lines += child_block
 
-    current_sched_lines = f"schedule {sched_name}\n{current_sched_lines}\nend\n"
-    all_sched_lines = current_sched_lines + child_lines
-    return all_sched_lines
+def write_schedule_block(out, child_dicts, ph_dict, flux_dict, sched_counter=None, sched_name="top"):
+    '''
+    Write the schedule block of an ALARA input file to out (any object with a write() method).
+    Sub-schedules are named in pre-order before any block is written, so that each block
+    can be written in full as soon as it is reached.
+    child_dicts may also be a schedule_ir.ScheduleIR.
+    '''
+    if sched_counter is None:
+        sched_counter = count(1)
+    sched = schedule_ir.as_schedule_ir(child_dicts)
+    sub_scheds = [node for node in sched.preorder if node.is_schedule]
+    sched_names = {id(node): f"sched_{next(sched_counter)}" for node in sub_scheds}
+
+    _write_schedule(out, sched_name, sched.children, ph_dict, flux_dict, sched_names)
+    for node in sub_scheds:
+        _write_schedule(out, sched_names[id(node)], node.children, ph_dict, flux_dict, sched_names)
+
+
+def make_schedule_block(child_dicts, ph_dict, flux_dict, sched_counter=None, sched_name="top"):
+    '''
+    Creates the lines comprising the schedule block of an ALARA input file.
+    '''
+    out = io.StringIO()
+    write_schedule_block(out, child_dicts, ph_dict, flux_dict, sched_counter, sched_name)
+    return out.getvalue()
 
 
 def read_nuclib(nuclib="nuclib.std"):
-    nuclib_lines = open(
-        nuclib, 'r').readlines()
+    with open(nuclib, 'r') as nuclib_file:
+        nuclib_lines = nuclib_file.readlines()
     return nuclib_lines
 
-def make_volume_block(nuclib_lines, volume):
-    vol_lines = "volume\n"
-    load_lines = "mat_loading\n"
-    mix_lines = ""
+
+def filter_nuclides(nuclib_lines):
+    '''
+    Return the names of the nuclides (entries containing ':') in the lines of a nuclide library.
+    '''
+    nuclides = []
     for line in nuclib_lines:
-        line = line.strip().split()
-        nuc = line[0]
-        if ':' in nuc:
-            vol_lines += f'\t {volume}\t{nuc}\n'
-            load_lines += f'\t{nuc}\t mix_{nuc}\n'
-            mix_lines += f'mixture mix_{nuc}\n\t element {nuc} 1 1.0 \nend \n'
-    return vol_lines + "end\n", load_lines + "end\n", mix_lines
+        line = line.split()
+        if line and ':' in line[0]:
+            nuclides.append(line[0])
+    return tuple(nuclides)
 
 
+_nuclide_cache = {}
+
+def load_nuclides(nuclib="nuclib.std"):
+    '''
+    Read and filter a nuclide library once per process. The result is memoized on the
+    path and modification time of the library, so a modified library is read again.
+    '''
+    path = os.path.abspath(nuclib)
+    mtime_ns = os.stat(path).st_mtime_ns
+    cached = _nuclide_cache.get(path)
+    if cached is None or cached[0] != mtime_ns:
+        cached = (mtime_ns, filter_nuclides(read_nuclib(path)))
+        _nuclide_cache[path] = cached
+    return cached[1]
+
+
+@functools.lru_cache(maxsize=8)
+def make_volume_templates(nuclides):
+    '''
+    Build the volume, loading and mixture blocks of a tuple of nuclides, with the volume
+    block split into the parts that surround each volume value.
+    Only the volume block depends on the volume, which render_volume_block() substitutes.
+    '''
+    vol_parts = ["volume\n"]
+    load_lines = ["mat_loading\n"]
+    mix_lines = []
+    for nuc in nuclides:
+        vol_parts[-1] += '\t '
+        vol_parts.append(f'\t{nuc}\n')
+        load_lines.append(f'\t{nuc}\t mix_{nuc}\n')
+        mix_lines.append(f'mixture mix_{nuc}\n\t element {nuc} 1 1.0 \nend \n')
+    vol_parts[-1] += "end\n"
+    load_lines.append("end\n")
+    return tuple(vol_parts), "".join(load_lines), "".join(mix_lines)
+
+
+def render_volume_block(volume_templates, volume):
+    '''
+    Substitute a volume into the output of make_volume_templates().
+    Returns the same blocks as make_volume_block().
+    '''
+    vol_parts, load_lines, mix_lines = volume_templates
+    return str(volume).join(vol_parts), load_lines, mix_lines
+
+
+def make_volume_block(nuclib_lines, volume):
+    return render_volume_block(make_volume_templates(filter_nuclides(nuclib_lines)), volume)
+
+
+# Data and output blocks, shared by every input file
+DATA_OUTPUT_LINES = """material_lib matlib.sample
+element_lib elelib.std
+data_library alaralib fendl2bin
+
+output zone
+    specific_activity
+    number_density
+end
+"""
+
 def make_input_lines(vol_lines, load_lines, mix_lines, flux_lines, all_ph_lines, all_sched_lines,
                      trunc_tolerance, nuclib_lines):
     """
@@ -159,20 +240,45 @@ def make_input_lines(vol_lines, load_lines, mix_lines, flux_lines, all_ph_lines,
     :param: input_filename (str)
     :param: nuclib (str, path to ALARA nuclide library)
     """
-    data_output_lines = """material_lib matlib.sample
-    element_lib elelib.std
-    data_library alaralib fendl2bin
-
-    output zone
-        specific_activity
-        number_density
-    end
-    """
-    assembled_lines = "geometry rectangular\n" + vol_lines + load_lines + mix_lines + data_output_lines \
+    assembled_lines = "geometry rectangular\n" + vol_lines + load_lines + mix_lines + DATA_OUTPUT_LINES \
                     + "\n" + flux_lines + all_sched_lines + "\n" + all_ph_lines + f"truncation {trunc_tolerance}"
     return assembled_lines
 
 
+def write_input_lines(out, vol_lines, load_lines, mix_lines, child_dicts, ph_dict, flux_dict,
+                      trunc_tolerance):
+    """
+    Stream the same lines as make_input_lines() to out (any object with a write() method),
+    building the flux, schedule and pulse history blocks directly into out.
+    :param: vol_lines, load_lines, mix_lines (str, output of make_volume_block())
+    :param: child_dicts (iterable of dictionaries, or a schedule_ir.ScheduleIR)
+    :param: ph_dict (dict, output of make_ph_dict())
+    :param: flux_dict (dict, output of make_flux_dict())
+    :param: trunc_tolerance (float)
+    """
+    out.write("geometry rectangular\n")
+    out.write(vol_lines)
+    out.write(load_lines)
+    out.write(mix_lines)
+    out.write(DATA_OUTPUT_LINES)
+    out.write("\n")
+    write_flux_block(out, flux_dict)
+    write_schedule_block(out, child_dicts, ph_dict, flux_dict)
+    out.write("\n")
+    write_pulse_history_block(out, ph_dict)
+    out.write(f"truncation {trunc_tolerance}")
+
+
+def write_inp_deck(input_filename, vol_lines, load_lines, mix_lines, child_dicts, ph_dict, flux_dict,
+                   trunc_tolerance):
+    """
+    Write an input file with write_input_lines(), without assembling its lines in memory.
+    """
+    with open(input_filename, 'w') as new_inp:
+        write_input_lines(new_inp, vol_lines, load_lines, mix_lines, child_dicts, ph_dict,
+                          flux_dict, trunc_tolerance)
+
+
 def write_inp_file(assembled_lines, input_filename):
     with open(input_filename, 'w') as new_inp:
         new_inp.write(assembled_lines)
@@ -0,0 +1,80 @@
+'''
+Content-addressed store of ALARA input files. Each distinct input file is written once,
+under the sha256 digest of its contents:
+    <store_dir>/<first 2 hex digits of digest>/<digest>.inp
+so that sweeps producing byte-identical input files (e.g. schedules that flatten to the
+same result) write, and run ALARA on, a single copy. The name each input file was generated
+under is mapped to its digest in the deck_digests table (see
+alara_bookkeeping.create_digest_table()), from which alara_runner.run_decks() skips stored input
+files whose digest already has a run at the same git hash (see pending_deck_files()).
+'''
+import hashlib
+import io
+import os
+import tempfile
+import alara_bookkeeping
+import build_inp_blocks as bib
+
+DECK_SUFFIX = ".inp"
+
+def deck_digest(deck_text):
+    '''
+    Return the sha256 digest (hex str) of the text of an input file.
+    '''
+    return hashlib.sha256(deck_text.encode()).hexdigest()
+
+def deck_path(store_dir, digest):
+    return os.path.join(store_dir, digest[:2], f"{digest}{DECK_SUFFIX}")
+
+def store_deck(store_dir, deck_text):
+    '''
+    Write the text of an input file to the store, unless an input file with the same digest
+    is already stored. The file is written to a temporary file and moved into place, so
+    concurrent writers of the same input file never see a partial file.
+    :param store_dir: (str) store directory
+    :param deck_text: (str) text of the input file
+    :return: (digest, absolute path of the stored input file, True if it was written)
+    '''
+    digest = deck_digest(deck_text)
+    # absolute, as the input file paths of alara_runner.find_decks()
+    path = deck_path(os.path.abspath(store_dir), digest)
+    if os.path.exists(path):
+        return digest, path, False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as tmp_file:
+            tmp_file.write(deck_text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return digest, path, True
+
+def store_inp_deck(store_dir, vol_lines, load_lines, mix_lines, child_dicts, ph_dict, flux_dict,
+                   trunc_tolerance):
+    '''
+    Assemble an input file with build_inp_blocks.write_input_lines() and store it.
+    :return: (digest, path of the stored input file, True if it was written)
+    '''
+    deck = io.StringIO()
+    bib.write_input_lines(deck, vol_lines, load_lines, mix_lines, child_dicts, ph_dict,
+                          flux_dict, trunc_tolerance)
+    return store_deck(store_dir, deck.getvalue())
+
+def pending_deck_files(cur, deck_records, git_hash=None):
+    '''
+    Select the stored input files that still need an ALARA run: one per distinct digest,
+    skipping digests whose stored input file already has a run in alara_simulations.
+    :param cur: Cursor object for the SQLite connection
+    :param deck_records: iterable of (input_filename, digest, deck_file)
+    :param git_hash: (str) git commit hash of the ALARA build, so that only runs of that build
+        count, or None to count the runs of any build
+    :return: list of deck_file (str), in the order of first appearance
+    '''
+    done = alara_bookkeeping.digests_with_output(cur, git_hash)
+    pending = {}
+    for _, digest, deck_file in deck_records:
+        if digest not in done:
+            pending.setdefault(digest, deck_file)
+    return list(pending.values())
@@ -0,0 +1,155 @@
+'''
+On-disk cache of parsed ALARA flux files. Each parsed flux array is stored as an
+.npy file in a cache directory, so that repeat runs over the same flux file can
+memory-map the array instead of parsing the text file again. A flux file missing from the
+cache is parsed straight into its .npy file, so that the flux array is never held in memory.
+
+Cache entries are keyed by the SHA-256 hash of the flux file contents and the number
+of energy groups. The size and modification time of each source file are recorded
+alongside its hash, so that an unchanged file is matched to its entry without being
+re-hashed. The cache directory holds an index.json file with the structure:
+{
+    "sources": {absolute path of flux file: {"size": int, "mtime_ns": int, "sha256": str}},
+    "entries": {"<sha256>_<num_groups>": {"nbytes": int, "last_used": float}}
+}
+When the total size of the cached arrays exceeds the size cap, the least recently
+used entries are evicted. Every read-modify-write of the index is made under an exclusive
+lock on index.lock, so that concurrent workers sharing a cache directory never drop each
+other's entries. The lock is not held while a flux file is hashed or parsed.
+'''
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+import numpy as np
+import flux_io
+
+INDEX_NAME = "index.json"
+LOCK_NAME = "index.lock"
+DEFAULT_MAX_BYTES = 8 * 2**30
+
+def default_cache_dir(flux_file):
+    '''
+    Cache directory used when none is given: .flux_cache next to the flux file.
+    '''
+    return os.path.join(os.path.dirname(os.path.abspath(flux_file)), ".flux_cache")
+
+def hash_file(path, chunk_bytes=flux_io.CHUNK_BYTES):
+    '''
+    Calculate the SHA-256 hex digest of a file, reading it in chunks.
+    '''
+    sha = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(chunk_bytes), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def read_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, INDEX_NAME), 'r') as index_file:
+            return json.load(index_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"sources": {}, "entries": {}}
+
+def _replace_atomic(cache_dir, final_path, write):
+    '''
+    Write a temporary file in cache_dir with write(path of the temporary file), then move
+    it into place, so that other processes never see a partially written file.
+    '''
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, final_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+@contextlib.contextmanager
+def index_lock(cache_dir):
+    '''
+    Hold an exclusive lock on the index of cache_dir, shared with other processes.
+    '''
+    with open(os.path.join(cache_dir, LOCK_NAME), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def write_index(cache_dir, index):
+    def write(tmp_path):
+        with open(tmp_path, 'w') as index_file:
+            json.dump(index, index_file)
+    _replace_atomic(cache_dir, os.path.join(cache_dir, INDEX_NAME), write)
+
+def evict(cache_dir, index, max_bytes, keep=None):
+    '''
+    Remove least recently used entries until the cached arrays fit within max_bytes.
+    :param index: cache index, as returned by read_index(); modified in place
+    :param max_bytes: (int) size cap of the cache in bytes
+    :param keep: (str) key of an entry that must not be evicted
+    '''
+    entries = index["entries"]
+    total_bytes = sum(entry["nbytes"] for entry in entries.values())
+    lru_keys = sorted(entries, key=lambda key: entries[key]["last_used"])
+    for key in lru_keys:
+        if total_bytes <= max_bytes:
+            break
+        if key == keep:
+            continue
+        try:
+            os.remove(os.path.join(cache_dir, f"{key}.npy"))
+        except FileNotFoundError:
+            pass
+        total_bytes -= entries.pop(key)["nbytes"]
+
+    cached_hashes = {key.rsplit('_', 1)[0] for key in entries}
+    index["sources"] = {path: source for path, source in index["sources"].items()
+                        if source["sha256"] in cached_hashes}
+
+def load_flux_array(flux_file, num_groups, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+    '''
+    Load the flux array of an ALARA flux file from the cache, parsing the file with
+    flux_io.read_flux_file() and adding it to the cache if no entry exists.
+    :param flux_file: (str) path to the ALARA flux file
+    :param num_groups: (int) number of energy groups in the group structure
+    :param cache_dir: (str) cache directory, defaults to default_cache_dir(flux_file)
+    :param max_bytes: (int) size cap of the cache in bytes
+    output : flux_array (numpy array of shape # intervals x number of energy groups),
+        read-only and memory-mapped from the cache
+    '''
+    if cache_dir is None:
+        cache_dir = default_cache_dir(flux_file)
+    os.makedirs(cache_dir, exist_ok=True)
+    source_path = os.path.abspath(flux_file)
+    stat = os.stat(source_path)
+    with index_lock(cache_dir):
+        source = read_index(cache_dir)["sources"].get(source_path)
+    if source is None or source["size"] != stat.st_size or source["mtime_ns"] != stat.st_mtime_ns:
+        source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": hash_file(source_path)}
+
+    key = f"{source['sha256']}_{num_groups}"
+    npy_path = os.path.join(cache_dir, f"{key}.npy")
+    try:
+        flux_array = np.load(npy_path, mmap_mode='r')
+    except FileNotFoundError:
+        # parse straight into the .npy file, so that the flux array is never held in memory
+        _replace_atomic(cache_dir, npy_path, lambda tmp_path: flux_io.read_flux_file(
+            source_path, num_groups, out_path=tmp_path))
+        flux_array = np.load(npy_path, mmap_mode='r')
+
+    # re-read the index under the lock, since other processes may have updated it meanwhile
+    with index_lock(cache_dir):
+        index = read_index(cache_dir)
+        index["sources"][source_path] = source
+        # the size of the .npy file, from the loaded map, since another process may have
+        # evicted the file since it was loaded
+        index["entries"][key] = {"nbytes": flux_array.offset + flux_array.nbytes,
+                                 "last_used": time.time()}
+        evict(cache_dir, index, max_bytes, keep=key)
+        write_index(cache_dir, index)
+    return flux_array
@@ -0,0 +1,219 @@
+'''
+Collapse the flux intervals of a mesh into a small number of representative spectra, so that
+ALARA is run once per cluster of similar spectra instead of once per interval.
+
+Normalized spectra (see flux_io.normalize_flux()) are compared by their base-10 logarithm,
+so that groups with little flux weigh as much as the peak groups. The log-spectra are computed
+in blocks of intervals as float32, into a temporary memory-mapped file if the normalized
+spectra are memory-mapped, so that clustering never holds a float64 copy of the mesh. The distance between two
+spectra is the root mean square over groups of the difference of their log-spectra (e.g. a
+distance of 0.01 is a typical deviation of about 2.3% per group).
+
+Clusters are found by bisecting k-means: starting from a single cluster, the cluster with the
+largest distance between a member and its centroid is split in two by k-means, until every
+member of every cluster is within a tolerance of its centroid, or a maximum number of clusters
+is reached. The representative spectrum of a cluster is the mean of the normalized spectra of
+its members, weighted by their total flux. Per-cluster sums are calculated with one
+np.bincount() per group.
+
+write_clusters() writes each representative spectrum as a flux file, and the cluster and total
+flux of each interval, from which the flux of an interval is its cluster spectrum scaled by its
+total flux.
+'''
+import os
+import numpy as np
+import flux_io
+
+LOG_FLOOR = 1e-12
+
+LOG_DTYPE = np.float32
+
+DEFAULT_MAX_ITER = 100
+
+CLUSTER_FLUX_NAME = "cluster_{}.flux"
+INTERVAL_CLUSTERS_NAME = "interval_clusters.txt"
+
+def log_spectra(norm_flux, floor=LOG_FLOOR, out=None, block_intervals=flux_io.BLOCK_INTERVALS):
+    '''
+    Return the base-10 logarithm of normalized spectra, with entries below floor raised to floor,
+    calculated in blocks of block_intervals intervals.
+    :param norm_flux: array of shape # intervals x # groups, e.g. memory-mapped from disk
+    :param out: array of the same shape for the log-spectra (e.g. from
+        flux_io.temporary_flux_memmap()), or None for a new array of LOG_DTYPE
+    '''
+    if out is None:
+        out = np.empty(norm_flux.shape, dtype=LOG_DTYPE)
+    for start in range(0, len(norm_flux), block_intervals):
+        block = np.maximum(norm_flux[start:start + block_intervals], floor)
+        out[start:start + block_intervals] = np.log10(block, out=block)
+    return out
+
+def _sq_distances(points, centroids):
+    '''
+    Squared euclidean distances between each point and each centroid, of shape
+    # points x # centroids.
+    '''
+    # in float64, since the expansion cancels most significant digits of float32 log-spectra
+    points = np.asarray(points, dtype=np.float64)
+    sq_dist = (np.einsum('ij,ij->i', points, points)[:, None]
+               - 2 * points @ centroids.T
+               + np.einsum('ij,ij->i', centroids, centroids)[None, :])
+    return np.maximum(sq_dist, 0, out=sq_dist)
+
+def assign_clusters(points, centroids, block_intervals=flux_io.BLOCK_INTERVALS):
+    '''
+    Assign each point to its nearest centroid, in blocks of block_intervals points, so that
+    only one block of points is held in memory as float64.
+    :return: (array of the cluster of each point, array of the rms distance of each point
+        to its centroid)
+    '''
+    labels = np.empty(len(points), dtype=np.intp)
+    distances = np.empty(len(points))
+    num_groups = points.shape[1]
+    for start in range(0, len(points), block_intervals):
+        sq_dist = _sq_distances(points[start:start + block_intervals], centroids)
+        block_labels = np.argmin(sq_dist, axis=1)
+        labels[start:start + block_intervals] = block_labels
+        distances[start:start + block_intervals] = np.sqrt(
+            sq_dist[np.arange(len(block_labels)), block_labels] / num_groups)
+    return labels, distances
+
+def _cluster_sums(labels, values, num_clusters):
+    '''
+    Sum the rows of values over the points of each cluster, of shape # clusters x # columns.
+    '''
+    return np.stack([np.bincount(labels, weights=values[:, col], minlength=num_clusters)
+                     for col in range(values.shape[1])], axis=1)
+
+def _init_centroids(points, num_clusters, rng):
+    '''
+    Choose initial centroids among the points with the k-means++ scheme.
+    '''
+    centroids = [points[rng.integers(len(points))]]
+    # squared rms distances, proportional to the squared distances
+    min_sq_dist = assign_clusters(points, centroids[0][None, :])[1] ** 2
+    for _ in range(1, num_clusters):
+        total = min_sq_dist.sum()
+        if total == 0:
+            break
+        centroids.append(points[rng.choice(len(points), p=min_sq_dist / total)])
+        min_sq_dist = np.minimum(min_sq_dist, assign_clusters(points, centroids[-1][None, :])[1] ** 2)
+    return np.array(centroids)
+
+def kmeans(points, num_clusters, max_iter=DEFAULT_MAX_ITER, seed=0):
+    '''
+    Cluster points with Lloyd's k-means algorithm, from k-means++ initial centroids.
+    Fewer than num_clusters clusters are returned if there are fewer distinct points.
+    :param points: array of shape # points x # dimensions
+    :param num_clusters: (int) number of clusters
+    :param max_iter: (int) maximum number of iterations
+    :param seed: seed of the random number generator used for the initial centroids
+    :return: (centroids array, labels array, distances array), as for assign_clusters()
+    '''
+    rng = np.random.default_rng(seed)
+    centroids = _init_centroids(points, num_clusters, rng)
+    labels, distances = assign_clusters(points, centroids)
+    new_labels = labels
+    for _ in range(max_iter):
+        counts = np.bincount(labels, minlength=len(centroids))
+        sums = _cluster_sums(labels, points, len(centroids))
+        occupied = counts > 0
+        centroids = sums[occupied] / counts[occupied, None]
+        new_labels, distances = assign_clusters(points, centroids)
+        if np.array_equal(new_labels, labels) and occupied.all():
+            break
+        labels = new_labels
+    return centroids, new_labels, distances
+
+def bisecting_kmeans(points, max_clusters, tolerance, max_iter=DEFAULT_MAX_ITER, seed=0):
+    '''
+    Split points into clusters until every point is within tolerance (rms distance) of its
+    cluster centroid, or max_clusters clusters are reached.
+    :return: (centroids array, labels array, distances array), as for assign_clusters()
+    '''
+    labels = np.zeros(len(points), dtype=np.intp)
+    centroids = [points.mean(axis=0, dtype=np.float64)]
+    _, distances = assign_clusters(points, centroids[0][None, :])
+    # largest distance of each cluster, updated only for the clusters of each split;
+    # -1 marks a cluster that cannot be split
+    max_distances = [distances.max()]
+    while len(centroids) < max_clusters:
+        cluster = int(np.argmax(max_distances))
+        if max_distances[cluster] <= tolerance:
+            break
+
+        members = np.flatnonzero(labels == cluster)
+        # the first split clusters every point, which need not be copied
+        split_points = points if len(members) == len(points) else points[members]
+        split_centroids, split_labels, split_distances = kmeans(
+            split_points, 2, max_iter, seed + len(centroids))
+        if len(split_centroids) < 2:
+            max_distances[cluster] = -1.0
+            continue
+        centroids[cluster] = split_centroids[0]
+        centroids.append(split_centroids[1])
+        labels[members[split_labels == 1]] = len(centroids) - 1
+        distances[members] = split_distances
+        max_distances[cluster] = split_distances[split_labels == 0].max()
+        max_distances.append(split_distances[split_labels == 1].max())
+    return np.array(centroids), labels, distances
+
+def representative_spectra(norm_flux, labels, num_clusters, total_flux=None,
+                           block_intervals=flux_io.BLOCK_INTERVALS):
+    '''
+    Calculate the representative normalized spectrum of each cluster, as the mean of the
+    normalized spectra of its members weighted by total_flux (or unweighted if None).
+    :return: array of shape # clusters x # groups
+    '''
+    spectra = np.zeros((num_clusters, norm_flux.shape[1]))
+    for start in range(0, len(norm_flux), block_intervals):
+        block = np.asarray(norm_flux[start:start + block_intervals], dtype=np.float64)
+        if total_flux is not None:
+            block = block * np.asarray(total_flux[start:start + block_intervals])[:, None]
+        spectra += _cluster_sums(labels[start:start + block_intervals], block, num_clusters)
+    totals = spectra.sum(axis=1, keepdims=True)
+    return np.divide(spectra, totals, out=np.zeros_like(spectra), where=totals != 0)
+
+def cluster_flux(norm_flux, max_clusters, tolerance, total_flux=None,
+                 max_iter=DEFAULT_MAX_ITER, seed=0):
+    '''
+    Cluster the normalized spectra of a mesh, and calculate the representative spectrum of
+    each cluster (see module docstring).
+    :param norm_flux: array of shape # intervals x # groups of normalized spectra
+    :param max_clusters: (int) maximum number of clusters
+    :param tolerance: (float) maximum rms distance between the log-spectra of an interval
+        and of its cluster centroid
+    :param total_flux: array of the total flux of each interval, or None
+    :return: (array of shape # clusters x # groups of representative spectra,
+        array of the cluster of each interval, array of the distance of each interval)
+    '''
+    out = None
+    if isinstance(norm_flux, np.memmap):
+        out = flux_io.temporary_flux_memmap(norm_flux.shape, dtype=LOG_DTYPE)
+    _, labels, distances = bisecting_kmeans(log_spectra(norm_flux, out=out), max_clusters,
+                                            tolerance, max_iter, seed)
+    num_clusters = labels.max() + 1
+    return representative_spectra(norm_flux, labels, num_clusters, total_flux), labels, distances
+
+def write_clusters(output_dir, spectra, labels, total_flux, max_workers=1):
+    '''
+    Write the representative spectrum of each cluster as an ALARA flux file of a single
+    interval, and the cluster and total flux of each interval (one interval per line).
+    :param output_dir: (str) directory of the output files
+    :param spectra: array of shape # clusters x # groups
+    :param labels: array of the cluster of each interval
+    :param total_flux: array of the total flux of each interval
+    :param max_workers: (int) number of processes writing the flux files (see
+        flux_io.write_flux_files())
+    :return: (list of the flux file paths, path of the interval to cluster and total flux
+        mapping)
+    '''
+    os.makedirs(output_dir, exist_ok=True)
+    flux_files = [os.path.join(output_dir, CLUSTER_FLUX_NAME.format(cluster))
+                  for cluster in range(len(spectra))]
+    flux_io.write_flux_files(spectra, flux_files, intervals=range(len(spectra)),
+                             max_workers=max_workers)
+    mapping_file = os.path.join(output_dir, INTERVAL_CLUSTERS_NAME)
+    np.savetxt(mapping_file, np.column_stack([labels, total_flux]),
+               fmt=['%d', f'%.{flux_io.FLUX_PRECISION}g'])
+    return flux_files, mapping_file
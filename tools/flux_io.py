@@ -0,0 +1,260 @@
+'''
+Readers for ALARA flux files. An ALARA flux file is a whitespace-separated
+list of flux entries, with the entries for each interval listed one group
+after another. The readers in this script parse the file in fixed-size chunks
+from a memory-mapped view, so that only a single chunk of text is held in memory
+alongside the output flux array, which may itself be memory-mapped from a .npy file.
+
+normalize_flux() processes a flux array, which may be memory-mapped from disk (e.g. by
+flux_cache.load_flux_array()), in blocks of intervals, so that only one block is held in
+memory while the normalized spectra are written to another (possibly memory-mapped) array.
+
+write_flux_file() writes a flux array in the same format, one interval per line, formatting
+each block of intervals with a single string operation. With the default precision of 17
+significant digits, every float64 entry is written exactly, so that reading the file back with
+read_flux_file() (or script_template.parse_flux_lines()) returns the same array.
+write_flux_files() writes many (e.g. per-interval or scaled) flux files of one flux array on a
+pool of processes, sending the flux array to each process once. An array memory-mapped from a
+named file is sent as a reference to the file, which each process maps again, so that its
+data is never copied to the processes, whichever the start method of the pool (e.g. spawn).
+'''
+import mmap
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+CHUNK_BYTES = 1 << 22
+
+BLOCK_INTERVALS = 1 << 12
+
+FLUX_PRECISION = 17
+
+def calc_num_intervals(num_entries, num_groups):
+    '''
+    Determine the number of intervals in a flux file from the total number of flux entries.
+    :param num_entries: (int) total number of flux entries in the file
+    :param num_groups: (int) number of energy groups in the group structure
+    '''
+    if num_entries == 0:
+        raise Exception("The chosen flux file is empty.")
+    if num_entries % num_groups != 0:
+        raise Exception("The number of intervals must be an integer.")
+    return num_entries // num_groups
+
+def iter_flux_chunks(flux_map, chunk_bytes=CHUNK_BYTES):
+    '''
+    Split the contents of a flux file into chunks of roughly chunk_bytes bytes.
+    Each chunk ends on a whitespace character, so that no flux entry is split across chunks.
+    :param flux_map: bytes-like view of the flux file (e.g. an mmap object)
+    :param chunk_bytes: (int) approximate size of each chunk
+    '''
+    size = len(flux_map)
+    start = 0
+    while start < size:
+        end = min(start + chunk_bytes, size)
+        while end < size and not flux_map[end:end + 1].isspace():
+            end += 1
+        yield flux_map[start:end]
+        start = end
+
+def read_flux_file(flux_file, num_groups, chunk_bytes=CHUNK_BYTES, out_path=None):
+    '''
+    Parse an ALARA flux file directly into a preallocated array of flux entries, with:
+    # rows = # of intervals = total # flux entries / # group structure bins
+    # columns = # group structure bins
+    The file is memory-mapped and read twice in chunks: once to count the flux entries,
+    and once to convert them into the preallocated array.
+    :param flux_file: (str) path to the ALARA flux file
+    :param num_groups: (int) number of energy groups in the group structure
+    :param chunk_bytes: (int) approximate size of each chunk of text parsed at once
+    :param out_path: (str) path of a .npy file into which the flux entries are parsed (see
+        open_flux_memmap()), so that the flux array is never held in memory, or None
+    output : flux_array (numpy array of shape # intervals x number of energy groups),
+        memory-mapped if out_path is given
+    '''
+    with open(flux_file, 'rb') as flux_data:
+        # mmap cannot map a zero-length file
+        if os.fstat(flux_data.fileno()).st_size == 0:
+            raise Exception("The chosen flux file is empty.")
+        with mmap.mmap(flux_data.fileno(), 0, access=mmap.ACCESS_READ) as flux_map:
+            num_entries = sum(len(chunk.split())
+                              for chunk in iter_flux_chunks(flux_map, chunk_bytes))
+            num_intervals = calc_num_intervals(num_entries, num_groups)
+
+            if out_path is None:
+                flux_array = np.empty((num_intervals, num_groups), dtype=np.float64)
+            else:
+                flux_array = open_flux_memmap(out_path, (num_intervals, num_groups))
+            flat_flux = flux_array.reshape(-1)
+            pos = 0
+            for chunk in iter_flux_chunks(flux_map, chunk_bytes):
+                entries = chunk.split()
+                flat_flux[pos:pos + len(entries)] = entries
+                pos += len(entries)
+    if out_path is not None:
+        flux_array.flush()
+    return flux_array
+
+def open_flux_memmap(path, shape):
+    '''
+    Create a .npy file of float64 flux entries of the given shape, memory-mapped for writing.
+    '''
+    return np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=shape)
+
+def temporary_flux_memmap(shape, dir=None, dtype=np.float64):
+    '''
+    Create a memory-mapped array of flux entries of the given shape, backed by an unnamed
+    temporary file in dir (or the default temporary directory), which is deleted once the
+    array is no longer referenced.
+    '''
+    with tempfile.TemporaryFile(dir=dir) as tmp_file:
+        return np.memmap(tmp_file, dtype=dtype, mode='w+', shape=shape)
+
+def normalize_flux(flux_array, out=None, fast_mask=None, collapse_indices=None,
+                   block_intervals=BLOCK_INTERVALS):
+    '''
+    Normalize the flux spectrum of each interval by its total flux, and compute per-interval
+    summaries, in a single pass over blocks of block_intervals intervals. The spectrum of an
+    interval with zero total flux is set to zero, and its hardness to zero.
+    :param flux_array: array of shape # intervals x # groups, e.g. memory-mapped from disk
+    :param out: array of the same shape for the normalized spectra (e.g. from
+        open_flux_memmap(), or flux_array itself to normalize in place), or None
+    :param fast_mask: boolean array over groups (see group_structures.fast_group_mask()),
+        or None to skip the spectral hardness
+    :param collapse_indices: increasing indices of the first group of each collapsed group
+        (as for np.add.reduceat), or None to skip the group-collapsed fluxes
+    :param block_intervals: (int) number of intervals processed at once
+    :return: dictionary with structure:
+    {
+        "total_flux": array of the total flux of each interval,
+        "zero_flux": boolean array of the intervals with zero total flux,
+        "hardness": array of the fraction of the flux of each interval in fast groups, or None,
+        "collapsed": array of shape # intervals x # collapsed groups, or None
+    }
+    '''
+    num_intervals = len(flux_array)
+    total_flux = np.empty(num_intervals)
+    hardness = None if fast_mask is None else np.empty(num_intervals)
+    collapsed = None
+    if collapse_indices is not None:
+        collapse_indices = np.asarray(collapse_indices, dtype=np.intp)
+        collapsed = np.empty((num_intervals, len(collapse_indices)))
+
+    for start in range(0, num_intervals, block_intervals):
+        stop = min(start + block_intervals, num_intervals)
+        block = np.asarray(flux_array[start:stop], dtype=np.float64)
+        block_total = block.sum(axis=1)
+        total_flux[start:stop] = block_total
+        inv_total = np.divide(1.0, block_total, out=np.zeros_like(block_total),
+                              where=block_total != 0)
+        if hardness is not None:
+            hardness[start:stop] = block[:, fast_mask].sum(axis=1) * inv_total
+        if collapsed is not None:
+            collapsed[start:stop] = np.add.reduceat(block, collapse_indices, axis=1)
+        if out is not None:
+            np.multiply(block, inv_total[:, None], out=out[start:stop])
+
+    if isinstance(out, np.memmap):
+        out.flush()
+    return {
+        "total_flux": total_flux,
+        "zero_flux": total_flux == 0,
+        "hardness": hardness,
+        "collapsed": collapsed,
+    }
+
+def format_flux_block(block, precision=FLUX_PRECISION):
+    '''
+    Format a 2D array of flux entries as the text of an ALARA flux file, one row per line.
+    :param block: array of shape # intervals x # groups
+    :param precision: (int) number of significant digits of each entry
+    '''
+    num_intervals, num_groups = block.shape
+    line_format = ' '.join([f"%.{precision - 1}E"] * num_groups) + '\n'
+    return (line_format * num_intervals) % tuple(block.ravel().tolist())
+
+def write_flux_file(flux_file, flux_array, scale=1.0, precision=FLUX_PRECISION,
+                    block_intervals=BLOCK_INTERVALS):
+    '''
+    Write a flux array, multiplied by a scaling factor, as an ALARA flux file.
+    :param flux_file: (str) path to the ALARA flux file
+    :param flux_array: array of shape # intervals x # groups (or # groups for a single
+        interval), e.g. memory-mapped from disk
+    :param scale: (float) scaling factor of every entry, or array of the scaling factor of
+        each interval
+    :param precision: (int) number of significant digits of each entry
+    :param block_intervals: (int) number of intervals formatted at once
+    '''
+    flux_array = np.atleast_2d(flux_array)
+    scale = np.asarray(scale, dtype=np.float64)
+    with open(flux_file, 'w') as flux_data:
+        for start in range(0, len(flux_array), block_intervals):
+            stop = min(start + block_intervals, len(flux_array))
+            block = np.asarray(flux_array[start:stop], dtype=np.float64)
+            if scale.ndim:
+                block = block * scale[start:stop, None]
+            elif scale != 1.0:
+                block = block * scale
+            flux_data.write(format_flux_block(block, precision))
+
+_flux_array = None
+
+def _memmap_reference(flux_array):
+    '''
+    Return (filename, dtype, shape, offset) of an array memory-mapped from a whole named file
+    (e.g. by np.load(mmap_mode='r')), or None for any other array, including views of one.
+    '''
+    if (isinstance(flux_array, np.memmap) and isinstance(flux_array.base, mmap.mmap)
+            and flux_array.filename is not None and flux_array.flags.c_contiguous):
+        return flux_array.filename, flux_array.dtype, flux_array.shape, flux_array.offset
+    return None
+
+def _init_writer(flux_array, memmap_reference=None):
+    global _flux_array
+    if memmap_reference is not None:
+        filename, dtype, shape, offset = memmap_reference
+        flux_array = np.memmap(filename, dtype=dtype, mode='r', shape=shape, offset=offset)
+    _flux_array = flux_array
+
+def _write_flux_job(job):
+    flux_file, intervals, scale, precision = job
+    flux_array = _flux_array if intervals is None else _flux_array[intervals]
+    write_flux_file(flux_file, flux_array, scale, precision)
+    return flux_file
+
+def write_flux_files(flux_array, flux_files, intervals=None, scales=None,
+                     precision=FLUX_PRECISION, max_workers=None, chunksize=16):
+    '''
+    Write many ALARA flux files from one flux array on a pool of max_workers processes.
+    :param flux_array: array of shape # intervals x # groups, e.g. memory-mapped from disk
+    :param flux_files: list of paths (str) to the ALARA flux files
+    :param intervals: list of the intervals written to each file (an int, a slice or an
+        array of indices into flux_array), or None to write every interval to every file
+    :param scales: list of the scaling factor of each file (see write_flux_file()), or None
+    :param precision: (int) number of significant digits of each entry
+    :param max_workers: (int) number of worker processes, defaults to the number of CPUs.
+        With max_workers=1 the files are written serially in this process.
+    :param chunksize: (int) number of files sent to a worker at once
+    :return: list of the paths of the written flux files
+    '''
+    if intervals is None:
+        intervals = [None] * len(flux_files)
+    if scales is None:
+        scales = [1.0] * len(flux_files)
+    if not len(flux_files) == len(intervals) == len(scales):
+        raise Exception("Each flux file must have one entry of intervals and scales.")
+    jobs = [(flux_file, interval, scale, precision)
+            for flux_file, interval, scale in zip(flux_files, intervals, scales)]
+
+    if max_workers == 1:
+        _init_writer(flux_array)
+        try:
+            return list(map(_write_flux_job, jobs))
+        finally:
+            _init_writer(None)
+    memmap_reference = _memmap_reference(flux_array)
+    initargs = (flux_array, None) if memmap_reference is None else (None, memmap_reference)
+    with ProcessPoolExecutor(max_workers, initializer=_init_writer,
+                             initargs=initargs) as executor:
+        return list(executor.map(_write_flux_job, jobs, chunksize=chunksize))
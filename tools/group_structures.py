@@ -0,0 +1,82 @@
+'''
+Registry of energy group structures applied to ALARA flux files.
+
+Parsing a flux file only requires the number of groups in a group structure, which is
+known statically for the structures listed in NUM_GROUPS. The energy bin edges themselves
+are loaded from openmc.mgxs.GROUP_STRUCTURES only when they are first requested, and are
+memoized afterwards, so that openmc is neither required nor imported unless bin edges
+are needed. Bin edges for structures that openmc does not provide can be registered with
+register_group_structure().
+'''
+import numpy as np
+
+DEFAULT_GROUP_STRUCTURE = 'VITAMIN-J-175'
+
+# Lower energy bound of the fast neutron groups [eV]
+FAST_ENERGY = 1.0e5
+
+# Number of groups in group structures provided by openmc.mgxs.GROUP_STRUCTURES
+NUM_GROUPS = {
+    'VITAMIN-J-42': 42,
+    'VITAMIN-J-175': 175,
+    'XMAS-172': 172,
+    'TRIPOLI-315': 315,
+    'CCFE-709': 709,
+    'UKAEA-1102': 1102,
+}
+
+_energy_bins = {}
+
+def register_group_structure(name, energy_bins):
+    '''
+    Register the energy bin edges of a group structure, replacing any existing entry.
+    :param name: (str) name of the group structure
+    :param energy_bins: iterable of (float) bin edges in increasing order [eV]
+    '''
+    energy_bins = np.array(energy_bins, dtype=float)
+    if energy_bins.ndim != 1 or len(energy_bins) < 2:
+        raise Exception("A group structure requires at least two energy bin edges.")
+    if np.any(np.diff(energy_bins) <= 0):
+        raise Exception("Energy bin edges must be in increasing order.")
+    energy_bins.flags.writeable = False
+    _energy_bins[name] = energy_bins
+
+def get_energy_bins(name=DEFAULT_GROUP_STRUCTURE):
+    '''
+    Return the energy bin edges [eV] of a group structure, loading them from openmc on the
+    first request for a structure that has not been registered.
+    :param name: (str) name of the group structure
+    '''
+    if name not in _energy_bins:
+        try:
+            import openmc.mgxs
+        except ImportError:
+            raise Exception(f"The energy bins of group structure {name} have not been registered, "
+                            "and openmc is not available to provide them.")
+        if name not in openmc.mgxs.GROUP_STRUCTURES:
+            raise Exception(f"Unknown group structure {name}.")
+        register_group_structure(name, openmc.mgxs.GROUP_STRUCTURES[name])
+    return _energy_bins[name]
+
+def get_num_groups(name=DEFAULT_GROUP_STRUCTURE):
+    '''
+    Return the number of energy groups in a group structure.
+    :param name: (str) name of the group structure
+    '''
+    if name in _energy_bins:
+        return len(_energy_bins[name]) - 1
+    if name in NUM_GROUPS:
+        return NUM_GROUPS[name]
+    return len(get_energy_bins(name)) - 1
+
+def fast_group_mask(name=DEFAULT_GROUP_STRUCTURE, threshold=FAST_ENERGY, descending=True):
+    '''
+    Return a boolean mask of the fast groups of a group structure, whose lower bin edge is at
+    or above threshold.
+    :param name: (str) name of the group structure
+    :param threshold: (float) lower energy bound of the fast groups [eV]
+    :param descending: (bool) if True, the mask follows the group order of ALARA flux files,
+        from the highest energy group to the lowest; otherwise the order of the bin edges
+    '''
+    mask = get_energy_bins(name)[:-1] >= threshold
+    return mask[::-1].copy() if descending else mask
@@ -0,0 +1,165 @@
+'''
+Reduce the number of pulses of a pulse entry before it is written to an ALARA input file.
+All but a number of final pulses of the outermost level of its pulse history are replaced
+by a single flattened pulse, as in schedule_transforms.flatten_ph_exact_pulses(), and the
+final pulses are kept exact.
+
+The number of final pulses is chosen as the smallest for which the activity at the end of
+the pulse entry is within a relative tolerance of its exact value, for every decay constant
+in a given range. The activity is that of a single nuclide produced at a rate proportional
+to the flux, with no parents, normalized to its saturation activity. A pulse of length L
+leaves an activity of 1 - exp(-lambda L) (times the flux scale of a flattened pulse), and
+n identical blocks of activity a, each started a period T after the previous one, leave
+    a * (1 - exp(-lambda n T)) / (1 - exp(-lambda T)),
+evaluated with np.expm1 to keep its accuracy for small lambda T. Since all activities decay
+at the same rate after the pulse entry, the relative error at the end of the pulse entry
+holds for all later times.
+
+Decay constants must be given in the inverse of the time unit of the pulse entry.
+'''
+import numpy as np
+import schedule_transforms as st
+
+DEFAULT_NUM_DECAY_CONSTANTS = 50
+
+def decay_constant_grid(min_decay_constant, max_decay_constant,
+                        num_decay_constants=DEFAULT_NUM_DECAY_CONSTANTS):
+    '''
+    Return num_decay_constants logarithmically spaced decay constants over a range.
+    '''
+    return np.geomspace(min_decay_constant, max_decay_constant, num_decay_constants)
+
+def repeat_activity(decay_constants, activity, duration, pulse_history):
+    '''
+    Calculate the activity at the end of a block repeated according to a multi-level pulse
+    history, from the activity left by a single block.
+    :param decay_constants: array of decay constants
+    :param activity: array of the activity at the end of a single block
+    :param duration: the duration of a single block
+    :param pulse_history: (iterable of (int, float)) of # repetitions, dwell time
+    :return: (activity array, duration of the pulse history)
+    '''
+    for num_pulses, dwell_time in pulse_history:
+        period = duration + dwell_time
+        activity = activity * (np.expm1(-decay_constants * num_pulses * period) /
+                               np.expm1(-decay_constants * period))
+        duration = num_pulses * period - dwell_time
+    return activity, duration
+
+def pulse_history_activity(decay_constants, pulse_length, pulse_history):
+    '''
+    Calculate the exact activity at the end of the last pulse of a multi-level pulse history.
+    :param decay_constants: array of decay constants
+    :param pulse_length: (float) the duration of each pulse
+    :param pulse_history: (iterable of (int, float)) of # pulses, dwell time
+    :return: (activity array, duration of the pulse history)
+    '''
+    decay_constants = np.asarray(decay_constants, dtype=float)
+    return repeat_activity(decay_constants, -np.expm1(-decay_constants * pulse_length),
+                           pulse_length, pulse_history)
+
+def reduced_activity(decay_constants, pulse_length, pulse_history, num_final_pulses):
+    '''
+    Calculate the activity at the end of the last pulse of a multi-level pulse history, when
+    all but num_final_pulses pulses of its outermost level are flattened into a single pulse.
+    :param decay_constants: array of decay constants
+    :param pulse_length: (float) the duration of each pulse
+    :param pulse_history: (sequence of (int, float)) of # pulses, dwell time
+    :param num_final_pulses: (int) the number of exact final pulses of the outermost level
+    '''
+    decay_constants = np.asarray(decay_constants, dtype=float)
+    *inner_levels, (num_pulses, dwell_time) = pulse_history
+    block_activity, block_duration = pulse_history_activity(decay_constants, pulse_length,
+                                                            inner_levels)
+    period = block_duration + dwell_time
+    final_activity = block_activity * (np.expm1(-decay_constants * num_final_pulses * period) /
+                                       np.expm1(-decay_constants * period))
+    if num_final_pulses == num_pulses:
+        return final_activity
+
+    flat_dur, flat_fluence = st.flatten_ph_levels(
+        pulse_length, [*inner_levels, (num_pulses - num_final_pulses, dwell_time)])
+    flat_activity = -np.expm1(-decay_constants * flat_dur) * (flat_fluence / flat_dur)
+    return flat_activity * np.exp(-decay_constants * num_final_pulses * period) + final_activity
+
+def reduction_error(decay_constants, pulse_length, pulse_history, num_final_pulses):
+    '''
+    Return the maximum relative error of reduced_activity() over decay_constants.
+    '''
+    exact_activity, _ = pulse_history_activity(decay_constants, pulse_length, pulse_history)
+    activity = reduced_activity(decay_constants, pulse_length, pulse_history, num_final_pulses)
+    return np.max(np.abs(activity - exact_activity) / exact_activity)
+
+def select_num_final_pulses(pulse_length, pulse_history, decay_constants, tolerance):
+    '''
+    Find the smallest number of exact final pulses of the outermost level of a pulse history
+    for which reduction_error() is at most tolerance, by bisection over the number of final
+    pulses (the error decreases as more final pulses are kept exact, and is zero when all are).
+    :param pulse_length: (float) the duration of each pulse
+    :param pulse_history: (sequence of (int, float)) of # pulses, dwell time
+    :param decay_constants: array of decay constants
+    :param tolerance: (float) maximum relative error of the activity
+    :return: (num_final_pulses, error)
+    '''
+    num_pulses = pulse_history[-1][0]
+    low, high = 0, num_pulses
+    error = 0.0
+    while low < high:
+        mid = (low + high) // 2
+        mid_error = reduction_error(decay_constants, pulse_length, pulse_history, mid)
+        if mid_error <= tolerance:
+            high = mid
+            error = mid_error
+        else:
+            low = mid + 1
+    return high, error
+
+def reduce_pulse_entry(pulse_entry, decay_constants, tolerance, flat_flux_filepath):
+    '''
+    Replace a pulse entry of a child_dicts structure (as described in build_inp_blocks.py)
+    with a flattened pulse entry followed by the smallest number of exact final pulses
+    chosen by select_num_final_pulses(). The time units of the pulse length and all pulse
+    history levels of the pulse entry must be the same. The delay may be in any unit, since it
+    is only carried through, with its unit, to the last reduced pulse entry.
+
+    The flattened pulse entry uses flat_flux_filepath, which must hold the flux of the pulse
+    entry multiplied by the returned flux scale, so that the fluence is preserved.
+    :param pulse_entry: dictionary of a pulse entry
+    :param decay_constants: array of decay constants, in the inverse time unit of pulse_entry
+    :param tolerance: (float) maximum relative error of the activity
+    :param flat_flux_filepath: (str) path to the flux file of the flattened pulse entry
+    :return: (list of reduced pulse entries, flux scale of the flattened pulse entry, or None
+        if no pulses could be flattened)
+    '''
+    unit = pulse_entry['pulse_length_unit']
+    if any(level[2] != unit for level in pulse_entry['pulse_history']):
+        raise Exception("The pulse history levels of the pulse entry must have the same unit as its pulse length.")
+    pulse_history = [tuple(level) for level in pulse_entry['pulse_history']]
+    if not pulse_history or pulse_history[-1][0] <= 1:
+        return [dict(pulse_entry, pulse_history=pulse_history)], None
+
+    *inner_levels, (num_pulses, dwell_time, _) = pulse_history
+    time_history = [(level_pulses, level_dwell) for level_pulses, level_dwell, _ in pulse_history]
+    num_final_pulses, _ = select_num_final_pulses(pulse_entry['pulse_length'], time_history,
+                                                  decay_constants, tolerance)
+    if num_final_pulses == num_pulses:
+        return [dict(pulse_entry, pulse_history=pulse_history)], None
+
+    flat_dur, flat_fluence = st.flatten_ph_levels(
+        pulse_entry['pulse_length'], [*time_history[:-1], (num_pulses - num_final_pulses, dwell_time)])
+    flat_entry = {
+        'type': 'pulse_entry',
+        'pulse_length': flat_dur,
+        'pulse_length_unit': unit,
+        'flux_filepath': flat_flux_filepath,
+        'pulse_history': [(1, 0, unit)],
+        'delay_dur': pulse_entry['delay_dur'],
+        'delay_dur_unit': pulse_entry['delay_dur_unit'],
+    }
+    if num_final_pulses == 0:
+        return [flat_entry], flat_fluence / flat_dur
+
+    flat_entry['delay_dur'] = dwell_time
+    flat_entry['delay_dur_unit'] = unit
+    final_entry = dict(pulse_entry, pulse_history=[*inner_levels, (num_final_pulses, dwell_time, unit)])
+    return [flat_entry, final_entry], flat_fluence / flat_dur
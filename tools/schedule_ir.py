@@ -0,0 +1,124 @@
+'''
+Compact representation of a schedule, built once from the child_dicts structure
+described in build_inp_blocks.py and schedule_transforms.py.
+
+Each schedule entry and pulse entry becomes a Schedule or PulseEntry node with
+__slots__ attributes in place of dictionary keys, and each pulse history becomes a
+tuple of tuples, shared by all nodes with an identical pulse history. The ScheduleIR
+holding the top-level nodes also lists every node in pre-order and in post-order, so
+that the functions of build_inp_blocks.py and schedule_transforms.py iterate over a flat
+list instead of each traversing the nested child_dicts again.
+
+The same pass interns the unique pulse histories and flux file paths, assigning each a
+dense id in the order of its first appearance in pre-order.
+'''
+
+class PulseEntry:
+    __slots__ = ('pulse_length', 'pulse_length_unit', 'flux_filepath',
+                 'pulse_history', 'delay_dur', 'delay_dur_unit')
+    is_schedule = False
+
+    def __init__(self, pulse_length, pulse_length_unit, flux_filepath,
+                 pulse_history, delay_dur, delay_dur_unit):
+        self.pulse_length = pulse_length
+        self.pulse_length_unit = pulse_length_unit
+        self.flux_filepath = flux_filepath
+        self.pulse_history = pulse_history
+        self.delay_dur = delay_dur
+        self.delay_dur_unit = delay_dur_unit
+
+
+class Schedule:
+    __slots__ = ('children', 'pulse_history', 'delay_dur', 'delay_dur_unit')
+    is_schedule = True
+
+    def __init__(self, children, pulse_history, delay_dur, delay_dur_unit):
+        self.children = children
+        self.pulse_history = pulse_history
+        self.delay_dur = delay_dur
+        self.delay_dur_unit = delay_dur_unit
+
+
+class ScheduleIR:
+    '''
+    :param children: list of the top-level Schedule and PulseEntry nodes
+    :param preorder: list of all nodes, each listed before its children
+    :param postorder: list of all nodes, each listed after its children
+    :param pulse_histories: dictionary of each unique pulse history: dense id (int, from 0),
+        without the pulse histories holding unhashable values (e.g. NumPy arrays)
+    :param flux_filepaths: dictionary of each unique flux file path: dense id (int, from 0)
+    '''
+    __slots__ = ('children', 'preorder', 'postorder', 'pulse_histories', 'flux_filepaths')
+
+    def __init__(self, children, preorder, postorder, pulse_histories, flux_filepaths):
+        self.children = children
+        self.preorder = preorder
+        self.postorder = postorder
+        self.pulse_histories = pulse_histories
+        self.flux_filepaths = flux_filepaths
+
+
+def build_schedule_ir(child_dicts):
+    '''
+    Build a ScheduleIR from a child_dicts structure. Unit and flux entries that are absent
+    (as in the child_dicts of schedule_transforms.py) are set to None.
+    The structure is traversed with an explicit stack, so there is no limit on its depth.
+    :param child_dicts: iterable of dictionaries
+    '''
+    preorder = []
+    postorder = []
+    pulse_histories = {}
+    # the interned pulse history of each id, so that equal pulse histories share one tuple
+    interned_phs = []
+    flux_filepaths = {}
+    children = []
+    # each frame holds the remaining child_dicts of a schedule, the list of its child nodes,
+    # and the schedule node itself (None at the top level)
+    stack = [(iter(child_dicts), children, None)]
+    while stack:
+        remaining, nodes, parent = stack[-1]
+        child_dict = next(remaining, None)
+        if child_dict is None:
+            stack.pop()
+            if parent is not None:
+                postorder.append(parent)
+            continue
+
+        pulse_history = tuple(tuple(level) for level in child_dict['pulse_history'])
+        try:
+            ph_id = pulse_histories.setdefault(pulse_history, len(pulse_histories))
+        except TypeError:
+            # a level holding an unhashable value (e.g. a NumPy array) is not interned
+            ph_id = None
+        if ph_id == len(interned_phs):
+            interned_phs.append(pulse_history)
+        if ph_id is not None:
+            pulse_history = interned_phs[ph_id]
+
+        if child_dict['type'] == 'schedule':
+            node = Schedule([], pulse_history, child_dict['delay_dur'],
+                            child_dict.get('delay_dur_unit'))
+            stack.append((iter(child_dict['children']), node.children, node))
+        elif child_dict['type'] == 'pulse_entry':
+            node = PulseEntry(child_dict['pulse_length'], child_dict.get('pulse_length_unit'),
+                              child_dict.get('flux_filepath'), pulse_history,
+                              child_dict['delay_dur'], child_dict.get('delay_dur_unit'))
+            postorder.append(node)
+            if node.flux_filepath not in flux_filepaths:
+                flux_filepaths[node.flux_filepath] = len(flux_filepaths)
+        else:
+            raise Exception(f"Unknown schedule entry type {child_dict['type']}.")
+        preorder.append(node)
+        nodes.append(node)
+
+    return ScheduleIR(children, preorder, postorder, pulse_histories, flux_filepaths)
+
+
+def as_schedule_ir(child_dicts):
+    '''
+    Return child_dicts if it is already a ScheduleIR, and build one from it otherwise.
+    '''
+    if isinstance(child_dicts, ScheduleIR):
+        return child_dicts
+    return build_schedule_ir(child_dicts)
+
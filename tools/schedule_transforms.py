@@ -19,7 +19,13 @@ total duration and fluence.
     'delay_dur' : (float)
 }
 ]
+All times are assumed to be in the same unit. A child_dicts structure with units (as described
+in build_inp_blocks.py) can be converted to this form with
+time_units.normalize_schedule(child_dicts, unit, keep_units=False).
 '''
+import numpy as np
+import schedule_ir
+
 def flatten_pulse_history(pulse_length, pulse_history):
     """
     Apply the flux flattening approximation to a series of pulses.
@@ -72,53 +78,113 @@ def flatten_ph_exact_pulses(pulse_length, pulse_history,
     return sched_children_dur_flat_exact_pulses, fluence_flat_exact_pulses
 
 
+def _flatten_ph_totals(pulse_length, pulse_history):
+    '''
+    Return the flattened duration of a multi-level pulsing history, and the total number of
+    pulses (the product of the number of pulses of all levels). With n_k pulses separated by
+    dwell time w_k at level k (from the innermost level, k = 0, to the outermost, k = K-1),
+    the duration is
+        pulse_length * prod_k n_k + sum_k (n_k - 1) * w_k * prod_{j>k} n_j,
+    summed here from the outermost level inwards.
+    '''
+    tot_num_pulses = 1.0
+    tot_dwell_dur = 0.0
+    for num_pulses, dwell_time in reversed(pulse_history):
+        tot_dwell_dur = tot_dwell_dur + (num_pulses - 1) * dwell_time * tot_num_pulses
+        tot_num_pulses = tot_num_pulses * num_pulses
+    return pulse_length * tot_num_pulses + tot_dwell_dur, tot_num_pulses
+
+
+def _flatten_ph_level_arrays(pulse_length, num_pulses, dwell_times):
+    '''
+    The vectorized equivalent of the loop in _flatten_ph_totals(), which performs the same
+    floating point operations in the same order, so that both give identical results.
+    '''
+    num_pulses = np.asarray(num_pulses, dtype=float)[::-1]
+    dwell_times = np.asarray(dwell_times, dtype=float)[::-1]
+    if len(num_pulses) == 0:
+        return pulse_length * 1.0, 1.0
+    outer_num_pulses = np.empty_like(num_pulses)
+    outer_num_pulses[0] = 1.0
+    np.cumprod(num_pulses[:-1], axis=0, out=outer_num_pulses[1:])
+    tot_num_pulses = outer_num_pulses[-1] * num_pulses[-1]
+    tot_dwell_dur = np.cumsum((num_pulses - 1) * dwell_times * outer_num_pulses, axis=0)[-1]
+    return pulse_length * tot_num_pulses + tot_dwell_dur, tot_num_pulses
+
+
+def flatten_ph_level_arrays(pulse_length, num_pulses, dwell_times):
+    '''
+    Apply the flattening algorithm to all levels of a multi-level pulsing history given as
+    arrays, computing the products over levels with np.cumprod instead of a loop. This is
+    faster than flatten_ph_levels() for pulse histories of many levels, and evaluates many
+    pulse histories with the same number of levels at once.
+
+    :param pulse_length: active irradiation time from schedule block, broadcast against
+        the trailing axes of num_pulses and dwell_times
+    :param num_pulses: array_like of # pulses, with one row per level (innermost first)
+    :param dwell_times: array_like of dwell times, with the same shape as num_pulses
+    :return: (duration, fluence)
+    '''
+    tot_dur_flat, tot_num_pulses = _flatten_ph_level_arrays(pulse_length, num_pulses, dwell_times)
+    return tot_dur_flat, pulse_length * tot_num_pulses
+
+
 def flatten_ph_levels(pulse_length, pulse_history):
     '''
     Apply the flattening algorithm to all levels of a multi-level pulsing history
     with a single-level schedule block.  
-    
+    The duration and fluence are computed in closed form (see _flatten_ph_totals()), which
+    avoids the rounding error of dividing and multiplying by the duration of each level.
+
     :param pulse_length: active irradiation time from schedule block
-    :param pulse_history : (iterable of (int, float))
+    :param pulse_history : (sequence of (int, float))
     '''
-    tot_ff_flat = 1
-    tot_dur_flat = pulse_length
-    for lvl_hist in pulse_history:
-        tot_dur_flat, fluence_flat = flatten_pulse_history(tot_dur_flat,
-                                                   lvl_hist)
-        tot_ff_flat *= fluence_flat / tot_dur_flat
-    tot_fluence_flat = tot_dur_flat * tot_ff_flat   
-    return tot_dur_flat, tot_fluence_flat
+    tot_dur_flat, tot_num_pulses = _flatten_ph_totals(pulse_length, pulse_history)
+    return tot_dur_flat, pulse_length * tot_num_pulses
 
 
-def flatten_schedule(child_dicts, pulse_history=[(1, 0)]):
+def _flatten_children(children, pulse_history):
     '''
-    Calculate flattened irradiation time and fluence for a schedule containing an arbitrary number of pulse entries
-    and/or sub-schedules.
-    :param child_dicts: iterable of dictionaries
+    Combine the flattened (duration, fluence, delay_dur) of each child of a schedule into the
+    flattened duration and fluence of the schedule.
     '''
     sched_children_dur = 0
     tot_fluence = 0
-    for child_dict in child_dicts:
-        if child_dict['type'] == 'schedule':
-            child_dur, child_fluence = flatten_schedule(
-                child_dict['children'],
-                child_dict['pulse_history'])
-        if child_dict['type'] == 'pulse_entry':
-            child_dur, child_fluence = flatten_ph_levels(child_dict['pulse_length'],
-                                               child_dict['pulse_history'])
+    for child_dur, child_fluence, delay_dur in children:
         tot_fluence += child_fluence
-        sched_children_dur += child_dur + child_dict['delay_dur']
-    sched_children_dur -= child_dicts[-1]['delay_dur']
+        sched_children_dur += child_dur + delay_dur
+    sched_children_dur -= children[-1][2]
 
-    sched_dur, new_fluence = flatten_ph_levels(
+    sched_dur, tot_num_pulses = _flatten_ph_totals(
         sched_children_dur,
         pulse_history)
 
-    tot_fluence *= new_fluence / sched_children_dur
+    tot_fluence *= tot_num_pulses
 
     return sched_dur, tot_fluence
 
 
+def flatten_schedule(child_dicts, pulse_history=[(1, 0)]):
+    '''
+    Calculate flattened irradiation time and fluence for a schedule containing an arbitrary number of pulse entries
+    and/or sub-schedules.
+    :param child_dicts: iterable of dictionaries, or a schedule_ir.ScheduleIR
+    '''
+    sched = schedule_ir.as_schedule_ir(child_dicts)
+    stack = []
+    for node in sched.postorder:
+        if node.is_schedule:
+            children = stack[len(stack) - len(node.children):]
+            del stack[len(stack) - len(node.children):]
+            child_dur, child_fluence = _flatten_children(children, node.pulse_history)
+        else:
+            child_dur, child_fluence = flatten_ph_levels(node.pulse_length,
+                                                         node.pulse_history)
+        stack.append((child_dur, child_fluence, node.delay_dur))
+
+    return _flatten_children(stack, pulse_history)
+
+
 def compress_ph_levels(pulse_length, pulse_history):
     '''
     Apply the compression algorithm to all levels of a multi-level pulsing history
@@ -136,21 +202,158 @@ def compress_schedule(child_dicts, pulse_history=[(1, 0)]):
     '''
     Calculate compressed irradiation time for a schedule containing an arbitrary number of pulse entries
     and/or sub-schedules.
+    :param child_dicts: iterable of dictionaries, or a schedule_ir.ScheduleIR
+    '''
+    sched = schedule_ir.as_schedule_ir(child_dicts)
+    stack = []
+    for node in sched.postorder:
+        if node.is_schedule:
+            sched_children_dur = sum(stack[len(stack) - len(node.children):])
+            del stack[len(stack) - len(node.children):]
+            child_dur = compress_ph_levels(sched_children_dur, node.pulse_history)
+        else:
+            child_dur = compress_ph_levels(node.pulse_length, node.pulse_history)
+        stack.append(child_dur)
+
+    sched_dur = compress_ph_levels(
+        sum(stack),
+        pulse_history)
+
+    return sched_dur
+
+
+def _compile_ph_keys(prefix, pulse_history, params):
+    '''
+    Name the leaf parameters of each level of a pulse history, storing their values in params.
+    '''
+    ph_keys = []
+    for level, (num_pulses, dwell_time) in enumerate(pulse_history):
+        num_key = f'{prefix}pulse_history.{level}.num_pulses'
+        dwell_key = f'{prefix}pulse_history.{level}.dwell_time'
+        params[num_key] = num_pulses
+        params[dwell_key] = dwell_time
+        ph_keys.append((num_key, dwell_key))
+    return tuple(ph_keys)
+
+
+def compile_schedule(child_dicts, pulse_history=[(1, 0)]):
+    '''
+    Compile a schedule into a list of instructions, listed in the order in which
+    flatten_schedule() and compress_schedule() combine its entries, and a dictionary of
+    the values of its leaf parameters. The leaf parameters are named by the index of their
+    entry in a pre-order traversal of the schedule (counting from 0, with each schedule
+    before its children): e.g. with a first entry that is a schedule of two pulse entries,
+    'p1.pulse_length' is the pulse length of the first child of the first entry, 'p3.delay_dur'
+    is the delay of the second entry, and 'p3.pulse_history.0.num_pulses' and
+    'p3.pulse_history.0.dwell_time' make up the first level of its pulse history. The levels
+    of pulse_history itself are named 'pulse_history.<level>.num_pulses' and
+    'pulse_history.<level>.dwell_time'. Names have a bounded length, so compiling a schedule
+    is linear in its size at any depth.
+
     :param child_dicts: iterable of dictionaries
+    :param pulse_history: (iterable of (int, float)) pulse history of the whole schedule
+    :return: (instructions, params), to be passed to flatten_compiled() or compress_compiled()
     '''
-    sched_children_dur = 0
-    for child_dict in child_dicts:
+    instructions = []
+    params = {}
+    # each frame holds the remaining child_dicts of a schedule, and the instruction appended
+    # once all of its children are compiled
+    stack = [(iter(child_dicts), None)]
+    node_idx = 0
+    while stack:
+        remaining, sched_instruction = stack[-1]
+        child_dict = next(remaining, None)
+        if child_dict is None:
+            stack.pop()
+            if sched_instruction is not None:
+                instructions.append(sched_instruction)
+            continue
+
+        node_prefix = f'p{node_idx}.'
+        node_idx += 1
+        delay_key = f'{node_prefix}delay_dur'
+        params[delay_key] = child_dict['delay_dur']
+        ph_keys = _compile_ph_keys(node_prefix, child_dict['pulse_history'], params)
         if child_dict['type'] == 'schedule':
-            child_dur = compress_schedule(
-                child_dict['children'],
-                child_dict['pulse_history'])
+            stack.append((iter(child_dict['children']),
+                          ('schedule', len(child_dict['children']), ph_keys, delay_key)))
         if child_dict['type'] == 'pulse_entry':
-            child_dur = compress_ph_levels(child_dict['pulse_length'],
-                                            child_dict['pulse_history'])
-        sched_children_dur += child_dur
+            length_key = f'{node_prefix}pulse_length'
+            params[length_key] = child_dict['pulse_length']
+            instructions.append(('pulse_entry', length_key, ph_keys, delay_key))
 
-    sched_dur = compress_ph_levels(
-        sched_children_dur,
-        pulse_history)
+    root_ph_keys = _compile_ph_keys('', pulse_history, params)
+    instructions.append(('schedule', len(child_dicts), root_ph_keys, None))
+    return instructions, params
+
+
+def compiled_values(compiled, params=None):
+    '''
+    Return the values of the leaf parameters of a compiled schedule, with those in params
+    replaced by arrays.
+    :param compiled: output of compile_schedule()
+    :param params: dictionary of leaf parameter name: array of values, or None
+    :return: dictionary of every leaf parameter name: value
+    '''
+    _, values = compiled
+    values = dict(values)
+    if params:
+        unknown = set(params) - set(values)
+        if unknown:
+            raise Exception(f"Unknown schedule parameters: {', '.join(sorted(unknown))}")
+        values.update({key: np.asarray(value) for key, value in params.items()})
+    return values
+
+
+def flatten_compiled(compiled, params=None):
+    '''
+    Evaluate flatten_schedule() on a compiled schedule for arrays of leaf parameter values.
+    Each entry of params replaces the value of one leaf parameter with an array, and all
+    arrays are broadcast against each other. Every operation is applied in the same order
+    as in flatten_schedule(), so the results match it exactly for each element.
+
+    :param compiled: output of compile_schedule()
+    :param params: dictionary of leaf parameter name: array of values
+    :return: (duration, fluence) arrays
+    '''
+    values = compiled_values(compiled, params)
+    stack = []
+    for kind, arg, ph_keys, delay_key in compiled[0]:
+        pulse_history = [(values[num_key], values[dwell_key]) for num_key, dwell_key in ph_keys]
+        delay_dur = 0 if delay_key is None else values[delay_key]
+        if kind == 'pulse_entry':
+            child_dur, child_fluence = flatten_ph_levels(values[arg], pulse_history)
+            stack.append((child_dur, child_fluence, delay_dur))
+            continue
+
+        children = stack[len(stack) - arg:]
+        del stack[len(stack) - arg:]
+        sched_dur, tot_fluence = _flatten_children(children, pulse_history)
+        stack.append((sched_dur, tot_fluence, delay_dur))
+
+    sched_dur, tot_fluence, _ = stack.pop()
+    return np.asarray(sched_dur), np.asarray(tot_fluence)
+
+
+def compress_compiled(compiled, params=None):
+    '''
+    Evaluate compress_schedule() on a compiled schedule for arrays of leaf parameter values,
+    in the same way as flatten_compiled().
+
+    :param compiled: output of compile_schedule()
+    :param params: dictionary of leaf parameter name: array of values
+    :return: array of compressed durations
+    '''
+    values = compiled_values(compiled, params)
+    stack = []
+    for kind, arg, ph_keys, _ in compiled[0]:
+        pulse_history = [(values[num_key], values[dwell_key]) for num_key, dwell_key in ph_keys]
+        if kind == 'pulse_entry':
+            stack.append(compress_ph_levels(values[arg], pulse_history))
+            continue
+
+        sched_children_dur = sum(stack[len(stack) - arg:])
+        del stack[len(stack) - arg:]
+        stack.append(compress_ph_levels(sched_children_dur, pulse_history))
 
-    return sched_dur
\ No newline at end of file
+    return np.asarray(stack.pop())
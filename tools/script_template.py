@@ -1,7 +1,11 @@
 import argparse
 import yaml
 import numpy as np
-import openmc
+import flux_io
+import flux_cache
+import flux_clustering
+import group_structures
+import sweep_engine
 
 def calc_time_params(active_burn_time, duty_cycle_list, num_pulses):
     '''
@@ -25,22 +29,18 @@ def open_flux_file(flux_file):
         flux_lines = flux_data.readlines()
     return flux_lines
 
-def parse_flux_lines(flux_lines):
+def parse_flux_lines(flux_lines, group_structure=group_structures.DEFAULT_GROUP_STRUCTURE):
     '''
     Uses provided list of flux lines and group structure applied to the run to create an array of flux entries, with:
     # rows = # of intervals = total # flux entries / # group structure bins
     # columns = # group structure bins
     input : flux_lines (list of lines from ALARA flux file)
+            group_structure (str, name of group structure in group_structures.py)
     output : flux_array (numpy array of shape # intervals x number of energy groups)
     '''
-    energy_bins = openmc.mgxs.GROUP_STRUCTURES['VITAMIN-J-175']           
     all_entries = np.array(' '.join(flux_lines).split(), dtype=float)
-    if len(all_entries) == 0:
-        raise Exception("The chosen flux file is empty.")
-    num_groups = len(energy_bins) - 1
-    num_intervals = len(all_entries) // num_groups
-    if len(all_entries) % num_groups != 0:
-        raise Exception("The number of intervals must be an integer.")
+    num_groups = group_structures.get_num_groups(group_structure)
+    num_intervals = flux_io.calc_num_intervals(len(all_entries), num_groups)
     flux_array = all_entries.reshape(num_intervals, num_groups)
     return flux_array
 
@@ -64,17 +64,42 @@ def main():
     inputs = read_yaml(args.db_yaml)
 
     flux_file = inputs['flux_file'] 
-    flux_lines = open_flux_file(flux_file)
-    flux_array = parse_flux_lines(flux_lines)
+    group_structure = inputs.get('group_structure', group_structures.DEFAULT_GROUP_STRUCTURE)
+    if 'energy_bins' in inputs:
+        group_structures.register_group_structure(group_structure, inputs['energy_bins'])
+    num_groups = group_structures.get_num_groups(group_structure)
+    flux_array = flux_cache.load_flux_array(flux_file, num_groups,
+                                            inputs.get('flux_cache_dir'),
+                                            inputs.get('flux_cache_max_bytes', flux_cache.DEFAULT_MAX_BYTES))
 
     active_burn_time = np.asarray(inputs['active_burn_time'])
     duty_cycle_list = np.asarray(inputs['duty_cycles'])
     num_pulses = np.asarray(inputs['num_pulses'])
-    pulse_lengths, abs_dwell_times, t_irr_arr = calc_time_params(active_burn_time, duty_cycle_list, num_pulses)
+    # active_burn_time may be a single value or a list of values to sweep over
+    pulse_lengths, abs_dwell_times, t_irr_arr = sweep_engine.calc_time_grid(active_burn_time, duty_cycle_list, num_pulses)
 
-    total_flux = np.sum(flux_array, axis=1) # sum over the bin widths of flux array
-    # normalize flux spectrum by the total flux in each interval
-    norm_flux_arr =  flux_array / total_flux.reshape(len(total_flux), 1) # 2D array of shape num_intervals x num_groups
+    # normalize flux spectrum by the total flux in each interval, in blocks of intervals,
+    # into a 2D array of shape num_intervals x num_groups, memory-mapped from norm_flux_file if
+    # set, or else from a temporary file in the flux cache directory
+    norm_flux_file = inputs.get('norm_flux_file')
+    if norm_flux_file is None:
+        norm_flux_arr = flux_io.temporary_flux_memmap(
+            flux_array.shape, inputs.get('flux_cache_dir') or flux_cache.default_cache_dir(flux_file))
+    else:
+        norm_flux_arr = flux_io.open_flux_memmap(norm_flux_file, flux_array.shape)
+    fast_mask = None
+    if 'fast_energy' in inputs:
+        fast_mask = group_structures.fast_group_mask(group_structure, inputs['fast_energy'])
+    flux_stats = flux_io.normalize_flux(flux_array, norm_flux_arr, fast_mask,
+                                        inputs.get('collapse_indices'))
+    total_flux = flux_stats['total_flux'] # sum over the bin widths of flux array
+
+    # collapse intervals with similar spectra into one flux file per cluster
+    if 'cluster_dir' in inputs:
+        cluster_spectra, interval_clusters, _ = flux_clustering.cluster_flux(
+            norm_flux_arr, inputs['max_clusters'], inputs['cluster_tolerance'], total_flux)
+        flux_clustering.write_clusters(inputs['cluster_dir'], cluster_spectra, interval_clusters,
+                                       total_flux)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
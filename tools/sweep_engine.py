@@ -0,0 +1,97 @@
+'''
+Broadcasting evaluation of the time parameters of a database sweep over the full
+grid of active burn times x duty cycles x numbers of pulses x flux intervals.
+
+The grid is addressed by a flat cell index in C order over the shape
+(# burn times, # duty cycles, # pulse counts, # flux intervals), so that any contiguous
+range of cells can be evaluated independently. iter_sweep() evaluates the grid in
+chunks of a fixed number of cells, which bounds peak memory regardless of the grid size.
+'''
+import numpy as np
+
+SWEEP_DTYPE = np.dtype([
+    ('active_burn_time', np.float64),
+    ('duty_cycle', np.float64),
+    ('num_pulses', np.int64),
+    ('interval', np.int64),
+    ('pulse_length', np.float64),
+    ('dwell_time', np.float64),
+    ('t_irr', np.float64),
+    ('total_flux', np.float64),
+    ('fluence', np.float64),
+])
+
+DEFAULT_CHUNK_CELLS = 1 << 20
+
+def calc_time_grid(active_burn_times, duty_cycles, num_pulses):
+    '''
+    Generalization of script_template.calc_time_params() to an array of active burn times.
+    Returns arrays that broadcast to shape (# burn times, # duty cycles, # pulse counts).
+    inputs:
+        active_burn_times : iterable of total active irradiation times (float)
+        duty_cycles : iterable of duty cycles (float)
+        num_pulses : iterable of numbers of pulses (int)
+    outputs:
+        pulse_lengths : shape (# burn times, 1, # pulse counts)
+        abs_dwell_times : shape (# burn times, # duty cycles, # pulse counts)
+        t_irr_arr : shape (# burn times, # duty cycles, # pulse counts)
+    '''
+    active_burn_times = np.atleast_1d(active_burn_times).astype(float)[:, None, None]
+    duty_cycles = np.atleast_1d(duty_cycles).astype(float)[None, :, None]
+    num_pulses = np.atleast_1d(num_pulses)[None, None, :]
+
+    pulse_lengths = active_burn_times / num_pulses
+    rel_dwell_times = (1 - duty_cycles) / duty_cycles
+    abs_dwell_times = rel_dwell_times * pulse_lengths
+    t_irr_arr = active_burn_times + abs_dwell_times * (num_pulses - 1)
+    return pulse_lengths, abs_dwell_times, t_irr_arr
+
+def sweep_shape(active_burn_times, duty_cycles, num_pulses, total_flux):
+    return (len(np.atleast_1d(active_burn_times)), len(np.atleast_1d(duty_cycles)),
+            len(np.atleast_1d(num_pulses)), len(np.atleast_1d(total_flux)))
+
+def evaluate_sweep(active_burn_times, duty_cycles, num_pulses, total_flux, start=0, stop=None):
+    '''
+    Evaluate the cells [start, stop) of the flattened sweep grid.
+    inputs:
+        active_burn_times : iterable of total active irradiation times (float)
+        duty_cycles : iterable of duty cycles (float)
+        num_pulses : iterable of numbers of pulses (int)
+        total_flux : iterable of the total flux (float) in each flux interval
+        start, stop : (int) range of flat cell indices, defaults to the full grid
+    output : structured array of dtype SWEEP_DTYPE with one entry per cell
+    '''
+    active_burn_times = np.atleast_1d(active_burn_times).astype(float)
+    duty_cycles = np.atleast_1d(duty_cycles).astype(float)
+    num_pulses = np.atleast_1d(num_pulses)
+    total_flux = np.atleast_1d(total_flux).astype(float)
+    shape = sweep_shape(active_burn_times, duty_cycles, num_pulses, total_flux)
+    if stop is None:
+        stop = int(np.prod(shape))
+
+    burn_idx, duty_idx, pulse_idx, interval_idx = np.unravel_index(np.arange(start, stop), shape)
+    cells = np.empty(stop - start, dtype=SWEEP_DTYPE)
+    cells['active_burn_time'] = active_burn_times[burn_idx]
+    cells['duty_cycle'] = duty_cycles[duty_idx]
+    cells['num_pulses'] = num_pulses[pulse_idx]
+    cells['interval'] = interval_idx
+    cells['total_flux'] = total_flux[interval_idx]
+
+    # same operations, in the same order, as calc_time_params()
+    cells['pulse_length'] = cells['active_burn_time'] / cells['num_pulses']
+    rel_dwell_times = (1 - cells['duty_cycle']) / cells['duty_cycle']
+    cells['dwell_time'] = rel_dwell_times * cells['pulse_length']
+    cells['t_irr'] = cells['active_burn_time'] + cells['dwell_time'] * (cells['num_pulses'] - 1)
+    cells['fluence'] = cells['total_flux'] * cells['active_burn_time']
+    return cells
+
+def iter_sweep(active_burn_times, duty_cycles, num_pulses, total_flux,
+               chunk_cells=DEFAULT_CHUNK_CELLS):
+    '''
+    Evaluate the full sweep grid in chunks of at most chunk_cells cells.
+    Yields structured arrays of dtype SWEEP_DTYPE, in flat cell index order.
+    '''
+    num_cells = int(np.prod(sweep_shape(active_burn_times, duty_cycles, num_pulses, total_flux)))
+    for start in range(0, num_cells, chunk_cells):
+        yield evaluate_sweep(active_burn_times, duty_cycles, num_pulses, total_flux,
+                             start, min(start + chunk_cells, num_cells))
@@ -0,0 +1,71 @@
+import pytest
+import numpy as np
+import activation_surrogate as surrogate
+import ph_reduction
+import schedule_transforms as st
+
+decay_constants = ph_reduction.decay_constant_grid(1e-6, 1e-1, 12)
+
+child_dicts = [{
+    'type': 'schedule',
+    'pulse_history': [(2, 30)],
+    'delay_dur': 50,
+    'children': [
+        {'type': 'pulse_entry', 'pulse_length': 10, 'pulse_history': [(3, 5)], 'delay_dur': 20},
+        {'type': 'pulse_entry', 'pulse_length': 4, 'pulse_history': [(1, 0)], 'delay_dur': 7},
+    ]
+}, {
+    'type': 'pulse_entry', 'pulse_length': 8, 'pulse_history': [(2, 3)], 'delay_dur': 0
+}]
+
+def exp_pulses():
+    '''
+    (start, length) of each pulse of child_dicts, and its duration.
+    '''
+    block = [(0, 10), (15, 10), (30, 10), (60, 4)]
+    pulses = block + [(start + 64 + 30, length) for start, length in block]
+    pulses += [(158 + 50, 8), (158 + 50 + 11, 8)]
+    return pulses, 158 + 50 + 19
+
+def brute_force_activity(pulses, end):
+    activity = np.zeros_like(decay_constants)
+    for start, length in pulses:
+        activity += -np.expm1(-decay_constants * length) * \
+            np.exp(-decay_constants * (end - start - length))
+    return activity
+
+def test_schedule_activity():
+    pulses, end = exp_pulses()
+    assert st.flatten_schedule(child_dicts)[0] == end
+
+    obs_activity = surrogate.schedule_activity(child_dicts, decay_constants)
+    assert obs_activity == pytest.approx(brute_force_activity(pulses, end), rel=1e-10)
+
+def test_compare_approximations():
+    compiled = st.compile_schedule(child_dicts, [(1, 0)])
+    comparison = surrogate.compare_approximations(compiled, decay_constants)
+    fluence = sum(length for _, length in exp_pulses()[0])
+
+    # long-lived nuclides only see the fluence, and short-lived ones the end of the schedule
+    assert comparison['flatten_error'][0] == pytest.approx(0, abs=1e-4)
+    assert comparison['compress_error'][0] == pytest.approx(0, abs=1e-4)
+    assert comparison['compress'][0] == pytest.approx(fluence * decay_constants[0], rel=1e-4)
+    assert abs(comparison['flatten_error'][-1]) > 0.1
+    assert np.array_equal(comparison['flatten_error'],
+                          comparison['flatten'] / comparison['exact'] - 1)
+
+def test_compiled_activity_arrays():
+    compiled = st.compile_schedule(child_dicts, [(1, 0)])
+    pulse_lengths = np.array([1.0, 10.0, 100.0])
+    delays = np.array([[0.0], [20.0]])
+    params = {'p1.pulse_length': pulse_lengths, 'p1.delay_dur': delays}
+    obs_activity = surrogate.compiled_activity(compiled, decay_constants, params)
+    comparison = surrogate.compare_approximations(compiled, decay_constants, params)
+
+    assert obs_activity.shape == comparison['flatten_error'].shape == (2, 3, len(decay_constants))
+    for i, delay in enumerate(delays[:, 0]):
+        for j, pulse_length in enumerate(pulse_lengths):
+            variant = [dict(child_dicts[0], children=[
+                dict(child_dicts[0]['children'][0], pulse_length=pulse_length, delay_dur=delay),
+                child_dicts[0]['children'][1]])] + child_dicts[1:]
+            assert np.array_equal(obs_activity[i, j], surrogate.schedule_activity(variant, decay_constants))
@@ -60,3 +60,77 @@ def test_populate_table(cur, data_dict):
     rows = cur.execute("SELECT * from alara_simulations").fetchall()
     assert len(rows) == len(data_dict["id"])
     cur.connection.close()
+
+def make_rows(num_rows, start=0):
+    for i in range(start, start + num_rows):
+        yield {"git_hash": "gh_1", "flux_file": f"f_{i % 3}", "output_file": f"out_{i}",
+               "input_file": f"inp_{i}", "id": str(i)}
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "activation_results.db")
+    ab.create_sqlite_table(conn.cursor())
+    conn.commit()
+    yield conn
+    conn.close()
+
+def test_configure_connection(conn):
+    ab.configure_connection(conn)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+
+@pytest.mark.parametrize("batch_size", [1, 3, 100])
+def test_bulk_insert(conn, batch_size):
+    messages = []
+    stats = ab.bulk_insert(conn, make_rows(10), batch_size, report=messages.append)
+
+    assert stats["rows"] == 10
+    assert len(messages) == -(-10 // batch_size)
+    assert not conn.in_transaction
+    rows = conn.execute("SELECT id, input_file, flux_file FROM alara_simulations ORDER BY input_file").fetchall()
+    assert rows[0] == ("0", "inp_0", "f_0")
+    assert len(rows) == 10
+
+@pytest.mark.parametrize("on_conflict, exp_num_rows, exp_flux_file", [
+    ("ignore", 6, "f_0"),
+    ("replace", 6, "replaced"),
+])
+def test_bulk_insert_conflict(conn, on_conflict, exp_num_rows, exp_flux_file):
+    ab.bulk_insert(conn, make_rows(5))
+    conflicting = [(str(i + 100), f"inp_{i}", f"out_{i}", "replaced", "gh_2") for i in (0, 5)]
+    ab.bulk_insert(conn, conflicting, on_conflict=on_conflict)
+
+    assert conn.execute("SELECT COUNT(*) FROM alara_simulations").fetchone()[0] == exp_num_rows
+    assert conn.execute("SELECT flux_file FROM alara_simulations WHERE input_file = 'inp_0'"
+                        ).fetchone()[0] == exp_flux_file
+
+def test_bulk_insert_fail(conn):
+    ab.bulk_insert(conn, make_rows(5))
+    with pytest.raises(sqlite3.IntegrityError):
+        ab.bulk_insert(conn, make_rows(4, start=3), batch_size=2)
+
+    # the first batch (inp_3, inp_4) conflicts and is rolled back
+    assert conn.execute("SELECT COUNT(*) FROM alara_simulations").fetchone()[0] == 5
+    assert not conn.in_transaction
+
+def test_completed_runs(conn):
+    ab.bulk_insert(conn, make_rows(3))
+    ab.bulk_insert(conn, [("9", "inp_0", "out_9", "f_0", "gh_2")])
+
+    assert ab.completed_runs(conn.cursor()) == {("inp_0", "gh_1"), ("inp_1", "gh_1"),
+                                                ("inp_2", "gh_1"), ("inp_0", "gh_2")}
+    assert ab.completed_runs(conn.cursor(), "gh_2") == {("inp_0", "gh_2")}
+    assert ab.completed_runs(conn.cursor(), "gh_3") == set()
+
+def test_bulk_insert_open_transaction(conn):
+    conn.execute("BEGIN")
+    conn.execute("INSERT INTO alara_simulations VALUES ('caller', 'inp_c', 'out_c', 'f_c', 'gh_1')")
+    ab.bulk_insert(conn, make_rows(3), batch_size=2)
+    with pytest.raises(sqlite3.IntegrityError):
+        ab.bulk_insert(conn, make_rows(2, start=2))
+
+    # the failed batch is rolled back, and the caller's transaction is still open
+    assert conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM alara_simulations").fetchone()[0] == 4
+    conn.rollback()
+    assert conn.execute("SELECT COUNT(*) FROM alara_simulations").fetchone()[0] == 0
@@ -0,0 +1,41 @@
+import sqlite3
+import pytest
+import alara_bookkeeping as ab
+import alara_queries as aq
+
+@pytest.fixture
+def cur():
+    conn = sqlite3.connect(":memory:")
+    cur = conn.cursor()
+    ab.create_sqlite_table(cur)
+    ab.bulk_insert(conn, ((str(i), f"inp_{i}", f"out_{i}", f"f_{i % 3}", f"gh_{i % 2}")
+                          for i in range(12)))
+    aq.create_indexes(cur)
+    yield cur
+    conn.close()
+
+@pytest.mark.parametrize("query, args, exp_ids", [
+    (aq.runs_for_flux, ("f_1",), {"1", "4", "7", "10"}),
+    (aq.runs_for_git_hash, ("gh_0",), {"0", "2", "4", "6", "8", "10"}),
+    (aq.runs_for_flux_at_commit, ("f_1", "gh_0"), {"4", "10"}),
+    (aq.runs_for_flux_at_commit, ("f_1", "gh_9"), set())
+])
+def test_queries(cur, query, args, exp_ids):
+    records = list(query(cur, *args))
+
+    assert {record.id for record in records} == exp_ids
+    assert all(record.input_file == f"inp_{record.id}" for record in records)
+
+@pytest.mark.parametrize("statement, params", [
+    (aq.RUNS_FOR_FLUX, ("f_1",)),
+    (aq.RUNS_FOR_GIT_HASH, ("gh_0",)),
+    (aq.RUNS_FOR_FLUX_AT_COMMIT, ("f_1", "gh_0"))
+])
+def test_query_plan(cur, statement, params):
+    plan = " ".join(aq.query_plan(cur, statement, params))
+    assert "COVERING INDEX" in plan
+
+def test_drop_indexes(cur):
+    aq.drop_indexes(cur)
+    names = {row[0] for row in cur.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert names.isdisjoint(aq.INDEXES)
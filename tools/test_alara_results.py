@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import pytest
+import numpy as np
+import alara_bookkeeping as ab
+import alara_results as ar
+
+output_text = """
+***** Zone #1: zone_1 *****
+\tRelative Volume: 1
+\tMixture: mix_h:1
+
+Number Density [atoms/cm3]
+
+isotope\t shutdown  \t  1 y  \t
+=========\t===========\t===========
+h-1\t1.0000e+00\t1.0000e+00
+h-3\t2.5000e-01\t2.0000e-01
+=========\t===========\t===========
+total\t1.2500e+00\t1.2000e+00
+
+Specific Activity [Bq/cm3]
+
+isotope\t shutdown  \t  1 y  \t
+=========\t===========\t===========
+h-3\t4.5000e+03\t4.0000e+03
+=========\t===========\t===========
+total\t4.5000e+03\t4.0000e+03
+
+Total Decay Heat [W/cm3]
+
+isotope\t shutdown  \t  1 y  \t
+h-3\t1.0000e-02\t9.0000e-03
+"""
+
+def test_parse_output_tables():
+    tables = ar.parse_output_tables(output_text.splitlines(keepends=True))
+
+    assert [table["response"] for table in tables] == ["number_density", "specific_activity"]
+    number_density = tables[0]
+    assert number_density["decay_times"] == ["shutdown", "1 y"]
+    assert number_density["isotopes"] == ["h-1", "h-3", "total"]
+    assert np.array_equal(number_density["values"], [[1.0, 1.0], [0.25, 0.2], [1.25, 1.2]])
+    assert tables[1]["values"].shape == (2, 2)
+
+def test_tables_to_columns():
+    tables = ar.parse_output_tables(output_text.splitlines())
+    columns = ar.tables_to_columns("run_1", tables)
+
+    assert len(columns["value"]) == 3 * 2 + 2 * 2
+    assert list(columns["isotope"][:4]) == ["h-1", "h-1", "h-3", "h-3"]
+    assert list(columns["decay_time"][:2]) == ["shutdown", "1 y"]
+    assert set(columns["sim_id"]) == {"run_1"}
+
+def test_ingest_outputs(tmp_path):
+    conn = sqlite3.connect(":memory:")
+    cur = conn.cursor()
+    ab.create_sqlite_table(cur)
+    rows = []
+    for i in range(3):
+        output_file = tmp_path / f"out_{i}"
+        output_file.write_text(output_text.replace("4.5000e+03", f"{i}.0"))
+        rows.append((f"id_{i}", f"inp_{i}", str(output_file), "flux", "gh"))
+    ab.bulk_insert(conn, rows[:2])
+    store_dir = tmp_path / "store"
+
+    assert ar.ingest_outputs(cur, store_dir, chunk_rows=1) == ["id_0", "id_1"]
+    ab.bulk_insert(conn, rows[2:])
+    assert ar.ingest_outputs(cur, store_dir) == ["id_2"]
+    assert len(ar.list_chunks(store_dir)) == 3
+
+    activity = ar.read_columns(store_dir, ["sim_id", "value"], response="specific_activity")
+    h3_shutdown = activity["value"][::4]
+    assert list(activity["sim_id"][::4]) == ["id_0", "id_1", "id_2"]
+    assert list(h3_shutdown) == [0.0, 1.0, 2.0]
+
+    selected = ar.read_columns(store_dir, ["isotope"], sim_ids=["id_1"], response="number_density")
+    assert list(selected["isotope"]) == ["h-1", "h-1", "h-3", "h-3", "total", "total"]
+
+def test_write_chunk_concurrent(tmp_path, monkeypatch):
+    # another writer creates its chunk between the listing and the write
+    monkeypatch.setattr(ar, "list_chunks", lambda store_dir: [])
+    columns = {"value": np.arange(3.0)}
+    first = ar.write_chunk(tmp_path, columns)
+    second = ar.write_chunk(tmp_path, {"value": np.ones(2)})
+
+    assert [os.path.basename(first), os.path.basename(second)] == ["part_00000.npz", "part_00001.npz"]
+    assert sorted(os.listdir(tmp_path)) == ["part_00000.npz", "part_00001.npz"]
+    with np.load(first) as chunk:
+        assert np.array_equal(chunk["value"], np.arange(3.0))
+
+def test_ingest_outputs_missing(tmp_path):
+    conn = sqlite3.connect(":memory:")
+    ab.create_sqlite_table(conn.cursor())
+    output_file = tmp_path / "out_0"
+    output_file.write_text(output_text)
+    ab.bulk_insert(conn, [("id_0", "inp_0", str(output_file), "flux", "gh"),
+                          ("id_1", "inp_1", str(tmp_path / "missing"), "flux", "gh")])
+    messages = []
+
+    assert ar.ingest_outputs(conn.cursor(), tmp_path / "store", report=messages.append) == ["id_0"]
+    assert messages == [f"Output file {tmp_path / 'missing'} of run id_1 is missing, skipped."]
+    assert set(ar.read_columns(tmp_path / "store", ["sim_id"])["sim_id"]) == {"id_0"}
+
+def test_ingest_outputs_empty(tmp_path):
+    conn = sqlite3.connect(":memory:")
+    ab.create_sqlite_table(conn.cursor())
+    output_file = tmp_path / "out_0"
+    output_file.write_text(output_text)
+    empty_file = tmp_path / "out_1"
+    empty_file.write_text("no tables\n")
+    ab.bulk_insert(conn, [("id_0", "inp_0", str(output_file), "flux", "gh"),
+                          ("id_1", "inp_1", str(empty_file), "flux", "gh")])
+    messages = []
+
+    assert ar.ingest_outputs(conn.cursor(), tmp_path / "store", report=messages.append) == ["id_0", "id_1"]
+    assert messages == [f"Output file {empty_file} of run id_1 holds no tables."]
+    assert ar.stored_sim_ids(tmp_path / "store") == {"id_0", "id_1"}
+    assert set(ar.read_columns(tmp_path / "store", ["sim_id"])["sim_id"]) == {"id_0"}
+
+    # the empty run is not parsed again, also when it is the only new run
+    assert ar.ingest_outputs(conn.cursor(), tmp_path / "store", report=messages.append) == []
+    ab.bulk_insert(conn, [("id_2", "inp_2", str(empty_file), "flux", "gh")])
+    assert ar.ingest_outputs(conn.cursor(), tmp_path / "store", report=print) == ["id_2"]
+    assert ar.ingest_outputs(conn.cursor(), tmp_path / "store", report=print) == []
+    assert len(messages) == 1
@@ -0,0 +1,196 @@
+import sqlite3
+import sys
+import pytest
+import alara_bookkeeping
+import alara_runner
+import deck_store
+
+# stands in for ALARA: echoes the input file, or fails or hangs as requested by the input file
+STUB = '''
+import os, sys, time
+input_file = sys.argv[1]
+with open(input_file) as deck:
+    text = deck.read()
+if "hang" in text:
+    time.sleep(60)
+if "fail_once" in text and not os.path.exists(input_file + ".failed"):
+    open(input_file + ".failed", "w").close()
+    sys.exit("first attempt fails")
+if "fail" in text and "fail_once" not in text:
+    sys.exit("always fails")
+print("output of", text)
+'''
+
+def write_decks(tmp_path, decks):
+    deck_dir = tmp_path / "decks"
+    (deck_dir / "sub").mkdir(parents=True)
+    for name, text in decks.items():
+        (deck_dir / name).write_text(text)
+    stub = tmp_path / "stub_alara.py"
+    stub.write_text(STUB)
+    return deck_dir, [sys.executable, str(stub)]
+
+def test_find_decks(tmp_path, monkeypatch):
+    deck_dir, _ = write_decks(tmp_path, {"b.inp": "", "sub/a.inp": "", "c.out": ""})
+    assert alara_runner.find_decks(deck_dir) == [str(deck_dir / "b.inp"), str(deck_dir / "sub/a.inp")]
+    assert alara_runner.find_decks([deck_dir / "b.inp"]) == [str(deck_dir / "b.inp")]
+
+    # relative paths are made absolute
+    monkeypatch.chdir(deck_dir)
+    assert alara_runner.find_decks("sub") == [str(deck_dir / "sub/a.inp")]
+    assert alara_runner.find_decks(["b.inp"]) == [str(deck_dir / "b.inp")]
+
+def test_deck_flux_files(tmp_path):
+    deck = tmp_path / "deck.inp"
+    deck.write_text("geometry point\nflux flux_1 a.flux 0 default\nflux flux_2 b.flux 0 default\n"
+                    "flux flux_3 a.flux 0 default\n\nschedule\n")
+    assert alara_runner.deck_flux_files(deck) == "a.flux,b.flux"
+
+def test_run_decks(tmp_path):
+    deck_dir, stub = write_decks(tmp_path, {
+        "ok.inp": "flux flux_1 ok.flux 0 default\n",
+        "sub/retry.inp": "fail_once\nflux flux_1 retry.flux 0 default\n",
+        "bad.inp": "fail\n",
+        "slow.inp": "hang\n",
+    })
+    conn = sqlite3.connect(":memory:")
+    messages = []
+    stats = alara_runner.run_decks(conn, deck_dir, "abc123", stub, tmp_path / "out",
+                                   timeout=1.5, retries=1, max_workers=4, batch_size=1,
+                                   report=messages.append)
+
+    assert stats['completed'] == 2
+    assert sorted(stats['failed']) == [(str(deck_dir / "bad.inp"), "exit status 1: always fails"),
+                                       (str(deck_dir / "slow.inp"), "timed out after 1.5 s")]
+    rows = conn.execute("SELECT input_file, output_file, flux_file, git_hash FROM alara_simulations "
+                        "ORDER BY input_file").fetchall()
+    assert rows == [
+        (str(deck_dir / "ok.inp"), str(tmp_path / "out" / "ok.abc123.out"), "ok.flux", "abc123"),
+        (str(deck_dir / "sub/retry.inp"), str(tmp_path / "out" / "sub" / "retry.abc123.out"),
+         "retry.flux", "abc123"),
+    ]
+    assert (tmp_path / "out" / "sub" / "retry.abc123.out").read_text().startswith("output of fail_once")
+    assert sorted(path.name for path in (tmp_path / "out").iterdir()) == ["ok.abc123.out", "sub"]
+    assert "2 of 4 runs completed" in messages[-1]
+
+def test_output_paths(tmp_path):
+    deck_dir, _ = write_decks(tmp_path, {"a.inp": "", "sub/a.inp": ""})
+    input_files = alara_runner.find_decks(deck_dir)
+    out_dir = tmp_path / "out"
+
+    # input files of the same name in different directories keep distinct output files
+    root = alara_runner.deck_root(deck_dir, input_files)
+    assert alara_runner.output_paths(input_files, "abc123", out_dir, root) == [
+        str(out_dir / "a.abc123.out"), str(out_dir / "sub" / "a.abc123.out")]
+    assert alara_runner.deck_root(input_files, input_files) == str(deck_dir)
+    assert (out_dir / "sub").is_dir()
+    with pytest.raises(Exception, match="same output file"):
+        alara_runner.output_paths(input_files, "abc123", out_dir)
+
+@pytest.mark.parametrize("retries, exp_error", [(0, "exit status 1"), (1, None)])
+def test_run_deck_retries(tmp_path, retries, exp_error):
+    deck_dir, stub = write_decks(tmp_path, {"retry.inp": "fail_once\n"})
+    attempts, error = alara_runner.run_deck(str(deck_dir / "retry.inp"), stub,
+                                            str(tmp_path / "retry.out"), retries=retries)
+
+    assert attempts == retries + 1
+    assert (error is None) == (exp_error is None)
+    if exp_error is not None:
+        assert error.startswith(exp_error)
+    assert (tmp_path / "retry.out").exists() == (exp_error is None)
+
+def test_run_decks_resume(tmp_path, monkeypatch):
+    deck_dir, stub = write_decks(tmp_path, {"a.inp": "", "b.inp": "", "c.inp": "fail\n"})
+    conn = sqlite3.connect(":memory:")
+    first = alara_runner.run_decks(conn, deck_dir, "abc123", stub, max_workers=2, report=print)
+    assert (first['completed'], first['skipped'], len(first['failed'])) == (2, 0, 1)
+
+    # only the failed input file and the new one are run again, without conflicting rows,
+    # also when the input file directory is given by a relative path
+    (deck_dir / "c.inp").write_text("")
+    (deck_dir / "d.inp").write_text("")
+    monkeypatch.chdir(tmp_path)
+    messages = []
+    second = alara_runner.run_decks(conn, "decks", "abc123", stub, max_workers=2,
+                                    checkpoint_every=0, report=messages.append)
+    assert (second['completed'], second['skipped'], second['failed']) == (2, 2, [])
+    assert messages[0] == "2 input files already run at abc123 are skipped"
+    assert sum("runs recorded" in message for message in messages) == 2
+
+    # a new git hash runs every input file, next to the output files of the earlier runs
+    third = alara_runner.run_decks(conn, deck_dir, "def456", stub, report=print)
+    assert (third['completed'], third['skipped']) == (4, 0)
+    assert conn.execute("SELECT COUNT(*) FROM alara_simulations").fetchone()[0] == 8
+    assert (deck_dir / "a.abc123.out").exists() and (deck_dir / "a.def456.out").exists()
+
+def test_run_decks_deck_store(tmp_path, monkeypatch):
+    _, stub = write_decks(tmp_path, {})
+    conn = sqlite3.connect(":memory:")
+    alara_bookkeeping.create_digest_table(conn.cursor())
+    # a store written from a relative path records absolute stored input file paths
+    monkeypatch.chdir(tmp_path)
+    records = []
+    for store_dir, text in [("store_1", "deck 1\n"), ("store_2", "deck 1\n"), ("store_2", "deck 2\n")]:
+        digest, deck_file, _ = deck_store.store_deck(store_dir, text)
+        records.append((f"{store_dir}_{text.split()[1]}.inp", digest, deck_file))
+    alara_bookkeeping.record_digests(conn, records)
+    assert records[0][2] == str(tmp_path / "store_1" / records[0][1][:2] / f"{records[0][1]}.inp")
+
+    alara_runner.run_decks(conn, "store_1", "abc123", stub, report=print)
+    # the copy of deck 1 in the second store already has a run at abc123, but not at def456
+    second = alara_runner.run_decks(conn, "store_2", "abc123", stub, report=print)
+    assert (second['completed'], second['skipped']) == (1, 1)
+    third = alara_runner.run_decks(conn, "store_2", "def456", stub, report=print)
+    assert (third['completed'], third['skipped']) == (2, 0)
+
+def test_run_decks_restart(tmp_path):
+    deck_dir, stub = write_decks(tmp_path, {"a.inp": "", "b.inp": ""})
+    conn = sqlite3.connect(":memory:")
+    alara_runner.run_decks(conn, deck_dir, "abc123", stub, report=print)
+    first_ids = conn.execute("SELECT id FROM alara_simulations").fetchall()
+
+    # the rows of the rerun input files conflict with the earlier ones, and are kept for a retry
+    messages = []
+    with pytest.raises(sqlite3.IntegrityError):
+        alara_runner.run_decks(conn, deck_dir, "abc123", stub, resume=False, report=messages.append)
+    assert not any("runs recorded" in message for message in messages)
+
+    restart = alara_runner.run_decks(conn, deck_dir, "abc123", stub, resume=False,
+                                     on_conflict="replace", report=print)
+    assert (restart['completed'], restart['skipped']) == (2, 0)
+    rows = conn.execute("SELECT id, input_file FROM alara_simulations ORDER BY input_file").fetchall()
+    assert [input_file for _, input_file in rows] == [str(deck_dir / "a.inp"), str(deck_dir / "b.inp")]
+    assert not {(sim_id,) for sim_id, _ in rows} & set(first_ids)
+
+def test_run_decks_failed_insert(tmp_path, monkeypatch):
+    deck_dir, stub = write_decks(tmp_path, {"a.inp": "", "b.inp": ""})
+    conn = sqlite3.connect(":memory:")
+    bulk_insert = alara_runner.alara_bookkeeping.bulk_insert
+    calls = []
+
+    def locked_once(*args):
+        calls.append(len(args[1]))
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return bulk_insert(*args)
+
+    monkeypatch.setattr(alara_runner.alara_bookkeeping, "bulk_insert", locked_once)
+    with pytest.raises(sqlite3.OperationalError):
+        alara_runner.run_decks(conn, deck_dir, "abc123", stub, max_workers=1, checkpoint_every=0,
+                               report=print)
+    # the row of the failed insertion is inserted by the final checkpoint
+    assert calls == [1, 1]
+    assert conn.execute("SELECT COUNT(*) FROM alara_simulations").fetchone()[0] == 1
+
+def test_run_decks_interrupted(tmp_path):
+    deck_dir, stub = write_decks(tmp_path, {"a.inp": "", "b.inp": "fail\n", "c.inp": ""})
+    conn = sqlite3.connect(":memory:")
+
+    def report(message):
+        if "failed" in message:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        alara_runner.run_decks(conn, deck_dir, "abc123", stub, retries=0, max_workers=1, report=report)
+    # the run completed before the interruption is recorded
+    assert conn.execute("SELECT input_file FROM alara_simulations").fetchall() == [(str(deck_dir / "a.inp"),)]
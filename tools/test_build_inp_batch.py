@@ -0,0 +1,137 @@
+import pytest
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+import build_inp_batch
+import build_inp_blocks
+
+child_dicts = [{
+    'type': 'schedule',
+    'children': [
+        {
+            'type': 'pulse_entry',
+            'pulse_length': 7.6,
+            'pulse_length_unit': 'm',
+            'flux_filepath': './ex_flux',
+            'pulse_history': [[3, 7.9, 'm'], [2, 5.5, 's']],
+            'delay_dur': 5.1,
+            'delay_dur_unit': 's'
+        }
+    ],
+    'pulse_history': [[7, 9.5, 'd']],
+    'delay_dur': 6.3,
+    'delay_dur_unit': 'm'
+}, {
+    'type': 'pulse_entry',
+    'pulse_length': 7.4,
+    'pulse_length_unit': 'd',
+    'flux_filepath': './iter_flux',
+    'pulse_history': [[3, 7.9, 'm'], [2, 5.5, 's']],
+    'delay_dur': 5.33,
+    'delay_dur_unit': 'c'
+}]
+
+nuclib_lines = ['h       0.100790E+01   1      0.899000E-04   2\n',
+                'h:1   1.00783E+00   1   8.98933E-05 1\n',
+                '1 100\n',
+                'h:2   2.01410E+00   1   1.79649E-04 1\n']
+
+def test_prepare_schedule():
+    prepared = build_inp_batch.prepare_schedule(child_dicts, 'new_flux')
+
+    assert prepared[0]['children'][0]['flux_filepath'] == 'new_flux'
+    assert prepared[1]['flux_filepath'] == 'new_flux'
+    assert prepared[1]['pulse_history'] == [(3, 7.9, 'm'), (2, 5.5, 's')]
+    assert child_dicts[1]['flux_filepath'] == './iter_flux'
+
+@pytest.mark.parametrize("max_workers, volume, exp_num_decks", [
+    (1, 1, 4),
+    (2, 1, 4),
+    (2, [1, 0.5], 8)
+])
+def test_generate_sweep(tmp_path, max_workers, volume, exp_num_decks):
+    nuclib = tmp_path / "nuclib.std"
+    nuclib.write_text("".join(nuclib_lines))
+    sweep = {
+        'nuclib': str(nuclib),
+        'volume': volume,
+        'schedules': {'iter': child_dicts},
+        'flux_files': ['flux_a', 'flux_b'],
+        'trunc_tolerances': [1e-5, 1e-7],
+        'output_dir': str(tmp_path / "decks"),
+    }
+    messages = []
+    input_filenames, stats = build_inp_batch.generate_sweep(sweep, max_workers, messages.append)
+
+    assert stats['num_decks'] == exp_num_decks
+    assert len(messages) == 1
+    assert sorted(input_filenames) == sorted(str(path) for path in (tmp_path / "decks").iterdir())
+
+    for input_filename, prepared, trunc_tolerance, deck_volume in build_inp_batch.make_deck_specs(sweep):
+        vol_lines, load_lines, mix_lines = build_inp_blocks.make_volume_block(nuclib_lines, deck_volume)
+        ph_dict = build_inp_blocks.make_ph_dict(prepared)
+        flux_dict = build_inp_blocks.make_flux_dict(prepared)
+        exp_lines = build_inp_blocks.make_input_lines(
+            vol_lines, load_lines, mix_lines,
+            build_inp_blocks.make_flux_block(flux_dict),
+            build_inp_blocks.make_pulse_history_block(ph_dict),
+            build_inp_blocks.make_schedule_block(prepared, ph_dict, flux_dict),
+            trunc_tolerance, nuclib_lines)
+        with open(input_filename, 'r') as inp:
+            assert inp.read() == exp_lines
+
+def test_make_deck_specs_time_unit(tmp_path):
+    sweep = {
+        'nuclib': 'nuclib.std',
+        'volume': 1,
+        'schedules': {'iter': child_dicts},
+        'trunc_tolerances': [1e-5],
+        'output_dir': str(tmp_path),
+        'time_unit': 's',
+    }
+    (_, prepared, _, _), = build_inp_batch.make_deck_specs(sweep)
+
+    assert prepared[0]['delay_dur'] == pytest.approx(378)
+    assert prepared[0]['children'][0]['pulse_history'] == [(3, 474, 's'), (2, 5.5, 's')]
+    assert prepared[1]['delay_dur_unit'] == 's'
+
+def test_generate_sweep_deck_store(tmp_path):
+    nuclib = tmp_path / "nuclib.std"
+    nuclib.write_text("".join(nuclib_lines))
+    database = tmp_path / "decks.db"
+    sweep = {
+        'nuclib': str(nuclib),
+        'volume': 1,
+        'schedules': {'iter': child_dicts, 'iter_copy': child_dicts},
+        'flux_files': ['flux_a', 'flux_b'],
+        'trunc_tolerances': [1e-5],
+        'output_dir': str(tmp_path / "decks"),
+        'deck_store': str(tmp_path / "store"),
+        'database': str(database),
+    }
+    messages = []
+    records, stats = build_inp_batch.generate_sweep(sweep, 1, messages.append)
+
+    assert stats['num_decks'] == 4
+    assert stats['num_unique'] == 2
+    assert len(list((tmp_path / "store").glob("*/*.inp"))) == 2
+    assert not (tmp_path / "decks").exists()
+    assert {record[0] for record in records} == {spec[0] for spec in build_inp_batch.make_deck_specs(sweep)}
+
+    conn = sqlite3.connect(database)
+    assert sorted(conn.execute("SELECT input_file, digest, deck_file FROM deck_digests")) == sorted(records)
+    conn.close()
+
+def test_map_bounded(monkeypatch):
+    monkeypatch.setattr(build_inp_batch, "write_decks", lambda chunk: [2 * spec for spec in chunk])
+    consumed = []
+    def deck_specs():
+        for spec in range(100):
+            consumed.append(spec)
+            yield spec
+
+    with ThreadPoolExecutor(2) as executor:
+        results = build_inp_batch._map_bounded(executor, deck_specs(), 3, 4)
+        assert next(results) == 0
+        # only max_pending chunks of chunksize deck specs are read ahead
+        assert len(consumed) <= 3 * 4
+        assert [0] + list(results) == [2 * spec for spec in range(100)]
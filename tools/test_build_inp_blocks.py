@@ -1,3 +1,4 @@
+import os
 import build_inp_blocks
 import pytest
 
@@ -44,7 +45,7 @@ def normalize_lines(lines):
     None, 
     {
         ((7, 9.5, 'd'), (3, 2.3, 'y')) : 'pulse_history_1',
-        ((3, 7.9, 'm'), (2, 5.5, 's'), (9, 1.2, 'c')): 'pulse_history_4',
+        ((3, 7.9, 'm'), (2, 5.5, 's'), (9, 1.2, 'c')): 'pulse_history_2',
         ((1, 8.0, 'm'), (2, 3, 's'), (9, 1.1, 'c')) : 'pulse_history_3'
     })
 ])
@@ -90,7 +91,7 @@ def test_make_ph_dict(child_dicts, ph_counter, exp_ph_dict):
     None,
     {
         './ex_flux' : 'flux_1',
-        '../flux_file' : 'flux_3'
+        '../flux_file' : 'flux_2'
     })
     ])
 
@@ -303,3 +304,55 @@ def test_make_input_lines(flux_lines, all_ph_lines, all_sched_lines,
         nuclib_lines)
     assert normalize_lines(obs_assembled_lines) == normalize_lines(
         exp_assembled_lines)
+
+def test_make_schedule_block_nested():
+    def sched(children):
+        return {'type': 'schedule', 'children': children, 'pulse_history': [(1, 0, 's')],
+                'delay_dur': 0, 'delay_dur_unit': 's'}
+    pulse = {'type': 'pulse_entry', 'pulse_length': 1, 'pulse_length_unit': 's',
+             'flux_filepath': 'flux', 'pulse_history': [(1, 0, 's')],
+             'delay_dur': 0, 'delay_dur_unit': 's'}
+    child_dicts = [sched([sched([pulse])]), sched([pulse])]
+    ph_dict = {((1, 0, 's'),): 'ph'}
+    flux_dict = {'flux': 'f'}
+
+    obs_sched_block = build_inp_blocks.make_schedule_block(child_dicts, ph_dict, flux_dict)
+    obs_sched_names = [line.split()[1] for line in obs_sched_block.splitlines()
+                       if line.startswith('schedule')]
+    assert obs_sched_names == ['top', 'sched_1', 'sched_2', 'sched_3']
+    assert "sched_1\tph\t0\ts\nsched_3\tph\t0\ts\n" in obs_sched_block
+
+def test_load_nuclides(tmp_path):
+    nuclib = tmp_path / "nuclib.std"
+    nuclib.write_text("h 0.1 1 0.8 2\nh:1 1.0 1 8.9 1\n\n1 100\nh:2 2.0 1 1.7 1\n")
+    obs_nuclides = build_inp_blocks.load_nuclides(nuclib)
+
+    assert obs_nuclides == ('h:1', 'h:2')
+    assert build_inp_blocks.load_nuclides(nuclib) is obs_nuclides
+
+    nuclib.write_text("he:3 3.0 1 1.0 1\n")
+    os.utime(nuclib, ns=(0, 0))
+    assert build_inp_blocks.load_nuclides(nuclib) == ('he:3',)
+
+@pytest.mark.parametrize("nuclides, volume", [
+    (('h:1', 'h:2', 'he:3'), 0.25),
+    ((), 1)
+])
+def test_render_volume_block(nuclides, volume):
+    nuclib_lines = [f"{nuc} 1.0 1 1.0 1\n" for nuc in nuclides]
+    templates = build_inp_blocks.make_volume_templates(nuclides)
+
+    vol_lines, load_lines, mix_lines = build_inp_blocks.render_volume_block(templates, volume)
+    assert vol_lines == "volume\n" + "".join(f"\t {volume}\t{nuc}\n" for nuc in nuclides) + "end\n"
+    assert (load_lines, mix_lines) == build_inp_blocks.make_volume_block(nuclib_lines, volume)[1:]
+
+def test_intern_schedule():
+    child_dicts = [{'type': 'pulse_entry', 'pulse_length': 1, 'pulse_length_unit': 's',
+                    'flux_filepath': f'flux_{i % 3}', 'pulse_history': [(i % 4, 1.0, 's')],
+                    'delay_dur': 0, 'delay_dur_unit': 's'} for i in range(1000)]
+    sched, ph_dict, flux_dict = build_inp_blocks.intern_schedule(child_dicts)
+
+    assert list(ph_dict.values()) == [f'pulse_history_{i}' for i in range(1, 5)]
+    assert list(ph_dict) == [((i, 1.0, 's'),) for i in range(4)]
+    assert flux_dict == {'flux_0': 'flux_1', 'flux_1': 'flux_2', 'flux_2': 'flux_3'}
+    assert build_inp_blocks.make_schedule_block(sched, ph_dict, flux_dict).count('\n') == 1003
@@ -0,0 +1,50 @@
+import sqlite3
+import pytest
+import alara_bookkeeping as ab
+import deck_store
+
+def test_store_deck(tmp_path):
+    digest, path, written = deck_store.store_deck(str(tmp_path), "geometry rectangular\n")
+
+    assert written
+    assert digest == deck_store.deck_digest("geometry rectangular\n")
+    assert path == str(tmp_path / digest[:2] / f"{digest}.inp")
+    with open(path, 'r') as deck:
+        assert deck.read() == "geometry rectangular\n"
+
+    assert deck_store.store_deck(str(tmp_path), "geometry rectangular\n") == (digest, path, False)
+    assert deck_store.store_deck(str(tmp_path), "geometry point\n")[0] != digest
+    assert not list(tmp_path.glob("*/*.tmp"))
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    ab.create_sqlite_table(conn.cursor())
+    ab.create_digest_table(conn.cursor())
+    yield conn
+    conn.close()
+
+def test_pending_deck_files(conn, tmp_path):
+    records = [
+        ("a_trunc_1e-05.inp", "d1", "store/d1.inp"),
+        ("b_trunc_1e-05.inp", "d1", "store/d1.inp"),
+        ("a_trunc_1e-07.inp", "d2", "store/d2.inp"),
+        ("c_trunc_1e-07.inp", "d3", "store/d3.inp"),
+    ]
+    assert ab.record_digests(conn, records, batch_size=3) == 4
+    assert deck_store.pending_deck_files(conn.cursor(), records) == \
+        ["store/d1.inp", "store/d2.inp", "store/d3.inp"]
+
+    ab.bulk_insert(conn, [("1", "store/d2.inp", "out_d2", "flux", "gh_1")])
+    assert ab.digests_with_output(conn.cursor()) == {"d2"}
+    assert deck_store.pending_deck_files(conn.cursor(), records) == ["store/d1.inp", "store/d3.inp"]
+    # a run of another ALARA build does not count
+    assert ab.digests_with_output(conn.cursor(), "gh_2") == set()
+    assert deck_store.pending_deck_files(conn.cursor(), records, "gh_2") == \
+        ["store/d1.inp", "store/d2.inp", "store/d3.inp"]
+    assert deck_store.pending_deck_files(conn.cursor(), records, "gh_1") == ["store/d1.inp", "store/d3.inp"]
+    assert ab.deck_records(conn.cursor(), ["store/d3.inp"]) == [("c_trunc_1e-07.inp", "d3", "store/d3.inp")]
+
+    # regenerating an input file records its new digest
+    ab.record_digests(conn, [("a_trunc_1e-07.inp", "d3", "store/d3.inp")])
+    assert conn.execute("SELECT COUNT(*) FROM deck_digests").fetchone() == (4,)
@@ -0,0 +1,106 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+import numpy as np
+import flux_cache
+import flux_io
+
+@pytest.fixture
+def count_parses(monkeypatch):
+    calls = []
+    read_flux_file = flux_io.read_flux_file
+    def counting_read(*args, **kwargs):
+        calls.append(args)
+        return read_flux_file(*args, **kwargs)
+    monkeypatch.setattr(flux_io, "read_flux_file", counting_read)
+    return calls
+
+def test_load_flux_array_hit(tmp_path, count_parses):
+    flux_file = tmp_path / "flux"
+    flux_file.write_text("1 2 3\n4 5 6\n")
+    cache_dir = tmp_path / "cache"
+
+    first = flux_cache.load_flux_array(flux_file, 3, cache_dir)
+    second = flux_cache.load_flux_array(flux_file, 3, cache_dir)
+
+    assert len(count_parses) == 1
+    assert isinstance(first, np.memmap) and isinstance(second, np.memmap)
+    assert np.array_equal(first, second)
+
+def test_load_flux_array_changed_file(tmp_path, count_parses):
+    flux_file = tmp_path / "flux"
+    flux_file.write_text("1 2 3\n4 5 6\n")
+    flux_cache.load_flux_array(flux_file, 3)
+    flux_file.write_text("1 2 3\n4 5 7\n")
+    os.utime(flux_file, ns=(0, 0))
+    obs_flux_array = flux_cache.load_flux_array(flux_file, 3)
+
+    assert len(count_parses) == 2
+    assert obs_flux_array[1, 2] == 7
+    assert os.path.isdir(flux_cache.default_cache_dir(flux_file))
+
+def test_load_flux_array_num_groups(tmp_path, count_parses):
+    flux_file = tmp_path / "flux"
+    flux_file.write_text("1 2 3 4 5 6\n")
+    assert flux_cache.load_flux_array(flux_file, 3).shape == (2, 3)
+    assert flux_cache.load_flux_array(flux_file, 2).shape == (3, 2)
+    assert len(count_parses) == 2
+
+def test_evict(tmp_path):
+    cache_dir = tmp_path / "cache"
+    flux_files = []
+    for i in range(3):
+        flux_file = tmp_path / f"flux_{i}"
+        flux_file.write_text(" ".join(str(i) for _ in range(100)))
+        flux_files.append(flux_file)
+
+    flux_cache.load_flux_array(flux_files[0], 10, cache_dir)
+    entry_bytes = os.path.getsize(next(cache_dir.glob("*.npy")))
+    for flux_file in flux_files[1:]:
+        flux_cache.load_flux_array(flux_file, 10, cache_dir, max_bytes=2 * entry_bytes)
+
+    index = flux_cache.read_index(cache_dir)
+    assert len(index["entries"]) == 2
+    assert len(list(cache_dir.glob("*.npy"))) == 2
+    assert str(flux_files[0]) not in index["sources"]
+
+def test_load_flux_array_evicted(tmp_path, monkeypatch):
+    flux_file = tmp_path / "flux"
+    flux_file.write_text("1 2 3\n4 5 6\n")
+    cache_dir = tmp_path / "cache"
+    flux_cache.load_flux_array(flux_file, 3, cache_dir)
+    npy_path = next(cache_dir.glob("*.npy"))
+    entry_bytes = os.path.getsize(npy_path)
+    load = np.load
+
+    def load_then_evict(path, **kwargs):
+        # another process evicts the entry right after it is loaded
+        flux_array = load(path, **kwargs)
+        os.remove(path)
+        return flux_array
+
+    monkeypatch.setattr(np, "load", load_then_evict)
+    flux_array = flux_cache.load_flux_array(flux_file, 3, cache_dir)
+
+    assert np.array_equal(flux_array, [[1, 2, 3], [4, 5, 6]])
+    assert [entry["nbytes"] for entry in flux_cache.read_index(cache_dir)["entries"].values()] == [entry_bytes]
+
+def load_in_worker(args):
+    flux_file, cache_dir = args
+    return flux_cache.load_flux_array(flux_file, 10, cache_dir).shape
+
+def test_load_flux_array_concurrent(tmp_path):
+    cache_dir = tmp_path / "cache"
+    flux_files = []
+    for i in range(8):
+        flux_file = tmp_path / f"flux_{i}"
+        flux_file.write_text(" ".join(str(i) for _ in range(100)))
+        flux_files.append(str(flux_file))
+
+    with ProcessPoolExecutor(4) as executor:
+        shapes = list(executor.map(load_in_worker, [(flux_file, str(cache_dir)) for flux_file in flux_files]))
+
+    assert shapes == [(10, 10)] * 8
+    index = flux_cache.read_index(cache_dir)
+    assert len(index["entries"]) == 8
+    assert sorted(index["sources"]) == sorted(flux_files)
@@ -0,0 +1,97 @@
+import pytest
+import numpy as np
+import flux_clustering
+import flux_io
+
+def make_spectra(num_per_family=20, num_groups=8, noise=0.01, seed=0):
+    '''
+    Normalized spectra of three families of distinct shape, with small random perturbations,
+    and the family of each spectrum.
+    '''
+    rng = np.random.default_rng(seed)
+    groups = np.arange(num_groups)
+    families = np.array([np.exp(-groups), np.exp(-(groups - num_groups / 2) ** 2), np.ones(num_groups)])
+    family = np.repeat(np.arange(3), num_per_family)
+    spectra = families[family] * 10 ** rng.normal(0, noise, (len(family), num_groups))
+    return spectra / spectra.sum(axis=1, keepdims=True), family
+
+def same_partition(labels, exp_labels):
+    pairs = set(zip(labels.tolist(), exp_labels.tolist()))
+    return len(pairs) == len(set(labels.tolist())) == len(set(exp_labels.tolist()))
+
+def test_kmeans():
+    spectra, family = make_spectra()
+    centroids, labels, distances = flux_clustering.kmeans(flux_clustering.log_spectra(spectra), 3)
+
+    assert centroids.shape == (3, spectra.shape[1])
+    assert same_partition(labels, family)
+    assert distances.max() < 0.05
+
+    # fewer distinct points than clusters
+    _, labels, distances = flux_clustering.kmeans(np.ones((5, 2)), 3)
+    assert np.array_equal(labels, np.zeros(5)) and np.array_equal(distances, np.zeros(5))
+
+@pytest.mark.parametrize("max_clusters, tolerance, exp_num_clusters", [
+    (10, 0.05, 3),
+    (2, 0.05, 2),
+    (10, 10.0, 1),
+    (100, 0.0, 60),
+])
+def test_bisecting_kmeans(max_clusters, tolerance, exp_num_clusters):
+    spectra, family = make_spectra()
+    points = flux_clustering.log_spectra(spectra)
+    centroids, labels, distances = flux_clustering.bisecting_kmeans(points, max_clusters, tolerance)
+
+    assert len(centroids) == labels.max() + 1 == exp_num_clusters
+    assert np.allclose(distances, np.sqrt(((points - centroids[labels]) ** 2).mean(axis=1)), atol=1e-6)
+    if exp_num_clusters == 3:
+        assert same_partition(labels, family)
+        assert distances.max() <= tolerance
+
+def test_cluster_flux(tmp_path):
+    spectra, family = make_spectra()
+    # a zero-flux interval forms a cluster of its own
+    spectra = np.vstack([spectra, np.zeros(spectra.shape[1])])
+    total_flux = np.arange(1.0, len(spectra) + 1)
+    total_flux[-1] = 0
+    cluster_spectra, labels, _ = flux_clustering.cluster_flux(spectra, 10, 0.05, total_flux)
+
+    assert len(cluster_spectra) == 4
+    assert same_partition(labels[:-1], family)
+    assert np.array_equal(cluster_spectra[labels[-1]], np.zeros(spectra.shape[1]))
+    members = labels == labels[0]
+    exp_spectrum = (spectra[members] * total_flux[members, None]).sum(axis=0)
+    assert np.allclose(cluster_spectra[labels[0]], exp_spectrum / exp_spectrum.sum())
+
+    flux_files, mapping_file = flux_clustering.write_clusters(tmp_path / "clusters", cluster_spectra,
+                                                              labels, total_flux / 3)
+    assert len(flux_files) == 4
+    for flux_file, spectrum in zip(flux_files, cluster_spectra):
+        assert np.array_equal(flux_io.read_flux_file(flux_file, spectra.shape[1]), spectrum[None, :])
+    mapping = np.loadtxt(mapping_file)
+    assert np.array_equal(mapping[:, 0], labels)
+    assert np.array_equal(mapping[:, 1], total_flux / 3)
+
+def test_cluster_flux_memmap(tmp_path):
+    spectra, family = make_spectra()
+    norm_flux = flux_io.open_flux_memmap(tmp_path / "norm_flux.npy", spectra.shape)
+    norm_flux[:] = spectra
+    cluster_spectra, labels, _ = flux_clustering.cluster_flux(norm_flux, 10, 0.05)
+
+    assert len(cluster_spectra) == 3
+    assert same_partition(labels, family)
+
+def test_log_spectra_blocks():
+    spectra, _ = make_spectra()
+    spectra[0, 0] = 0
+    points = flux_clustering.log_spectra(spectra, block_intervals=7)
+
+    assert points.dtype == flux_clustering.LOG_DTYPE
+    assert points[0, 0] == np.log10(flux_clustering.LOG_FLOOR).astype(np.float32)
+    assert np.allclose(points, np.log10(np.maximum(spectra, flux_clustering.LOG_FLOOR)), atol=1e-5)
+
+def test_representative_spectra_blocks():
+    spectra, _ = make_spectra()
+    labels = np.arange(len(spectra)) % 4
+    assert np.allclose(flux_clustering.representative_spectra(spectra, labels, 4, block_intervals=7),
+                       flux_clustering.representative_spectra(spectra, labels, 4))
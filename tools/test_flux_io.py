@@ -0,0 +1,143 @@
+import pytest
+import numpy as np
+import flux_io
+
+@pytest.mark.parametrize("flux_text, num_groups, chunk_bytes, exp_flux_array", [
+    ("1.0 2.0 3.0\n4.0 5.0 6.0\n", 3, flux_io.CHUNK_BYTES,
+     np.array([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])),
+    ("1.0E+01  2.5E-01\n\t3.0e2\n4\n", 2, 4,
+     np.array([[10.0, 0.25], [300.0, 4.0]])),
+    ("1 2 3 4 5 6 7 8", 4, 1,
+     np.array([[1, 2, 3, 4], [5, 6, 7, 8]], dtype=float))
+])
+def test_read_flux_file(tmp_path, flux_text, num_groups, chunk_bytes, exp_flux_array):
+    flux_file = tmp_path / "flux"
+    flux_file.write_text(flux_text)
+    obs_flux_array = flux_io.read_flux_file(flux_file, num_groups, chunk_bytes)
+
+    assert obs_flux_array.dtype == np.float64
+    assert np.array_equal(obs_flux_array, exp_flux_array)
+
+def test_read_flux_file_out_path(tmp_path):
+    flux_file = tmp_path / "flux"
+    flux_file.write_text("1 2 3 4 5 6 7 8")
+    obs_flux_array = flux_io.read_flux_file(flux_file, 4, 1, out_path=tmp_path / "flux.npy")
+
+    assert isinstance(obs_flux_array, np.memmap)
+    assert np.array_equal(np.load(tmp_path / "flux.npy"), [[1, 2, 3, 4], [5, 6, 7, 8]])
+
+def test_temporary_flux_memmap(tmp_path):
+    out = flux_io.temporary_flux_memmap(flux_array.shape, tmp_path)
+    flux_io.normalize_flux(flux_array, out, block_intervals=2)
+
+    assert isinstance(out, np.memmap)
+    assert np.array_equal(out[2], [0.25] * 4)
+    # the backing file is unnamed
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.parametrize("flux_text, num_groups, exp_msg", [
+    ("", 3, "empty"),
+    (" \n\n ", 3, "empty"),
+    ("1 2 3 4", 3, "integer")
+])
+def test_read_flux_file_errors(tmp_path, flux_text, num_groups, exp_msg):
+    flux_file = tmp_path / "flux"
+    flux_file.write_text(flux_text)
+    with pytest.raises(Exception, match=exp_msg):
+        flux_io.read_flux_file(flux_file, num_groups)
+
+flux_array = np.array([[1.0, 3.0, 4.0, 0.0],
+                       [0.0, 0.0, 0.0, 0.0],
+                       [2.0, 2.0, 2.0, 2.0]])
+
+@pytest.mark.parametrize("block_intervals", [1, 2, flux_io.BLOCK_INTERVALS])
+def test_normalize_flux(block_intervals):
+    out = np.full(flux_array.shape, np.nan)
+    stats = flux_io.normalize_flux(flux_array, out, np.array([True, True, False, False]),
+                                   [0, 2], block_intervals)
+
+    assert np.array_equal(stats["total_flux"], [8.0, 0.0, 8.0])
+    assert np.array_equal(stats["zero_flux"], [False, True, False])
+    assert np.array_equal(stats["hardness"], [0.5, 0.0, 0.5])
+    assert np.array_equal(stats["collapsed"], [[4.0, 4.0], [0.0, 0.0], [4.0, 4.0]])
+    assert np.array_equal(out, [[0.125, 0.375, 0.5, 0.0], [0.0] * 4, [0.25] * 4])
+
+def test_normalize_flux_memmap(tmp_path):
+    source = flux_io.open_flux_memmap(tmp_path / "flux.npy", flux_array.shape)
+    source[:] = flux_array
+    source.flush()
+    flux_map = np.load(tmp_path / "flux.npy", mmap_mode='r')
+    out = flux_io.open_flux_memmap(tmp_path / "norm_flux.npy", flux_array.shape)
+    stats = flux_io.normalize_flux(flux_map, out, block_intervals=2)
+
+    assert stats["hardness"] is None and stats["collapsed"] is None
+    assert np.array_equal(np.load(tmp_path / "norm_flux.npy")[2], [0.25] * 4)
+
+    in_place = flux_array.copy()
+    flux_io.normalize_flux(in_place, in_place, block_intervals=2)
+    assert np.array_equal(in_place, np.load(tmp_path / "norm_flux.npy"))
+
+def random_flux(num_intervals, num_groups, seed=0):
+    rng = np.random.default_rng(seed)
+    flux = rng.random((num_intervals, num_groups)) * 10.0 ** rng.integers(-300, 300, (num_intervals, num_groups))
+    flux[0, :3] = [0.0, np.nextafter(0, 1), np.finfo(float).max]
+    return flux
+
+@pytest.mark.parametrize("scale, block_intervals", [
+    (1.0, flux_io.BLOCK_INTERVALS),
+    (1.0, 3),
+    (np.arange(1.0, 11.0), 4),
+])
+def test_write_flux_file(tmp_path, scale, block_intervals):
+    import script_template
+    flux = random_flux(10, 175)
+    flux_io.write_flux_file(tmp_path / "flux", flux, scale, block_intervals=block_intervals)
+    exp_flux_array = flux * np.reshape(scale, (-1, 1))
+
+    with open(tmp_path / "flux") as flux_data:
+        flux_lines = flux_data.readlines()
+    assert len(flux_lines) == 10
+    assert np.array_equal(script_template.parse_flux_lines(flux_lines), exp_flux_array)
+    assert np.array_equal(flux_io.read_flux_file(tmp_path / "flux", 175), exp_flux_array)
+
+def test_write_flux_file_precision(tmp_path):
+    flux_io.write_flux_file(tmp_path / "flux", [1.0 / 3, 2.0e14], precision=3)
+    assert (tmp_path / "flux").read_text() == "3.33E-01 2.00E+14\n"
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_write_flux_files(tmp_path, max_workers):
+    flux = random_flux(6, 4)
+    flux_files = [str(tmp_path / f"flux_{i}") for i in range(4)]
+    intervals = [None, 2, slice(1, 4), [5, 0]]
+    scales = [0.5, 1.0, [1.0, 0.5, 0.25], 1.0]
+    written = flux_io.write_flux_files(flux, flux_files, intervals, scales, max_workers=max_workers)
+
+    assert written == flux_files
+    exp_flux_arrays = [flux * 0.5, flux[[2]], flux[1:4] * [[1.0], [0.5], [0.25]], flux[[5, 0]]]
+    for flux_file, exp_flux_array in zip(flux_files, exp_flux_arrays):
+        assert np.array_equal(flux_io.read_flux_file(flux_file, 4), exp_flux_array)
+
+    with pytest.raises(Exception, match="one entry"):
+        flux_io.write_flux_files(flux, flux_files, intervals[:2])
+
+def test_write_flux_files_memmap(tmp_path):
+    flux = random_flux(6, 4)
+    source = flux_io.open_flux_memmap(tmp_path / "flux.npy", flux.shape)
+    source[:] = flux
+    source.flush()
+    flux_map = np.load(tmp_path / "flux.npy", mmap_mode='r')
+
+    # a memmap of a whole file is sent to the worker processes by reference, not by value
+    filename, dtype, shape, offset = flux_io._memmap_reference(flux_map)
+    assert (str(filename), dtype, shape) == (str(tmp_path / "flux.npy"), np.float64, flux.shape)
+    assert flux_io._memmap_reference(flux_map[1:]) is None
+    assert flux_io._memmap_reference(flux) is None
+    flux_io._init_writer(None, (filename, dtype, shape, offset))
+    assert np.array_equal(flux_io._flux_array, flux)
+
+    flux_files = [str(tmp_path / f"flux_{i}") for i in range(3)]
+    for max_workers in [1, 2]:
+        flux_io.write_flux_files(flux_map, flux_files, [None, 2, [5, 0]], max_workers=max_workers)
+        assert np.array_equal(flux_io.read_flux_file(flux_files[2], 4), flux[[5, 0]])
+    # the serial path does not keep the flux array alive
+    assert flux_io._flux_array is None
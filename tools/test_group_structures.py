@@ -0,0 +1,49 @@
+import sys
+import pytest
+import numpy as np
+import group_structures as gs
+
+@pytest.fixture
+def no_openmc(monkeypatch):
+    # a None entry in sys.modules makes any import of openmc raise ImportError
+    monkeypatch.setitem(sys.modules, "openmc", None)
+    monkeypatch.setitem(sys.modules, "openmc.mgxs", None)
+    monkeypatch.setattr(gs, "_energy_bins", {})
+
+@pytest.mark.parametrize("name, exp_num_groups", [
+    ('VITAMIN-J-175', 175),
+    ('CCFE-709', 709)
+])
+def test_get_num_groups_static(no_openmc, name, exp_num_groups):
+    assert gs.get_num_groups(name) == exp_num_groups
+
+def test_register_group_structure(no_openmc):
+    gs.register_group_structure('test-3', [1e-5, 1.0, 1e3, 2e7])
+    obs_energy_bins = gs.get_energy_bins('test-3')
+
+    assert gs.get_num_groups('test-3') == 3
+    assert np.array_equal(obs_energy_bins, [1e-5, 1.0, 1e3, 2e7])
+    assert gs.get_energy_bins('test-3') is obs_energy_bins
+    assert not obs_energy_bins.flags.writeable
+
+@pytest.mark.parametrize("energy_bins", [
+    [1.0],
+    [1.0, 1e3, 10.0],
+    [[1.0, 2.0], [3.0, 4.0]]
+])
+def test_register_group_structure_invalid(no_openmc, energy_bins):
+    with pytest.raises(Exception):
+        gs.register_group_structure('invalid', energy_bins)
+
+def test_get_energy_bins_without_openmc(no_openmc):
+    with pytest.raises(Exception, match="openmc"):
+        gs.get_energy_bins('VITAMIN-J-175')
+
+@pytest.mark.parametrize("threshold, descending, exp_mask", [
+    (1.0e5, True, [True, True, False]),
+    (1.0e5, False, [False, True, True]),
+    (1.0e7, True, [False, False, False]),
+])
+def test_fast_group_mask(no_openmc, threshold, descending, exp_mask):
+    gs.register_group_structure('TEST-3', [1.0, 1.0e5, 1.0e6, 2.0e7])
+    assert gs.fast_group_mask('TEST-3', threshold, descending).tolist() == exp_mask
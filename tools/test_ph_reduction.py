@@ -0,0 +1,109 @@
+import pytest
+import numpy as np
+import build_inp_blocks
+import ph_reduction as pr
+import schedule_transforms as st
+
+decay_constants = pr.decay_constant_grid(1e-8, 1e-1, 20)
+
+def brute_force_activity(decay_constants, pulse_starts, pulse_lengths, flux_scales, end):
+    activity = np.zeros_like(decay_constants)
+    for start, length, scale in zip(pulse_starts, pulse_lengths, flux_scales):
+        activity += scale * -np.expm1(-decay_constants * length) * \
+            np.exp(-decay_constants * (end - start - length))
+    return activity
+
+def pulse_starts(pulse_length, pulse_history):
+    starts = [0.0]
+    duration = pulse_length
+    for num_pulses, dwell_time in pulse_history:
+        period = duration + dwell_time
+        starts = [start + i * period for i in range(num_pulses) for start in starts]
+        duration = num_pulses * period - dwell_time
+    return sorted(starts), duration
+
+@pytest.mark.parametrize("pulse_length, pulse_history", [
+    (10.0, []),
+    (10.0, [(5, 20.0)]),
+    (400.0, [(3, 60.0), (4, 3600.0)]),
+])
+def test_pulse_history_activity(pulse_length, pulse_history):
+    starts, exp_duration = pulse_starts(pulse_length, pulse_history)
+    exp_activity = brute_force_activity(decay_constants, starts, [pulse_length] * len(starts),
+                                        [1] * len(starts), exp_duration)
+    obs_activity, obs_duration = pr.pulse_history_activity(decay_constants, pulse_length, pulse_history)
+
+    assert obs_duration == pytest.approx(exp_duration)
+    assert obs_activity == pytest.approx(exp_activity, rel=1e-10)
+
+@pytest.mark.parametrize("num_final_pulses", [0, 1, 4])
+def test_reduced_activity(num_final_pulses):
+    pulse_length = 400.0
+    pulse_history = [(3, 60.0), (6, 3600.0)]
+    inner_starts, block_duration = pulse_starts(pulse_length, pulse_history[:1])
+    flat_dur, flat_fluence = st.flatten_ph_levels(pulse_length, [(3, 60.0), (6 - num_final_pulses, 3600.0)])
+    starts = [0.0] + [flat_dur + 3600.0 + i * (block_duration + 3600.0) + start
+                      for i in range(num_final_pulses) for start in inner_starts]
+    lengths = [flat_dur] + [pulse_length] * (len(starts) - 1)
+    scales = [flat_fluence / flat_dur] + [1] * (len(starts) - 1)
+    end = starts[-1] + lengths[-1]
+
+    exp_activity = brute_force_activity(decay_constants, starts, lengths, scales, end)
+    obs_activity = pr.reduced_activity(decay_constants, pulse_length, pulse_history, num_final_pulses)
+
+    assert obs_activity == pytest.approx(exp_activity, rel=1e-10)
+
+def test_select_num_final_pulses():
+    pulse_length = 400.0
+    pulse_history = [(3, 60.0), (200, 1800.0)]
+    errors = [pr.reduction_error(decay_constants, pulse_length, pulse_history, num_final_pulses)
+              for num_final_pulses in range(201)]
+    num_final_pulses, error = pr.select_num_final_pulses(pulse_length, pulse_history,
+                                                         decay_constants, 1e-3)
+
+    assert errors[-1] == 0
+    assert np.all(np.diff(errors) <= 0)
+    assert 0 < num_final_pulses < 200
+    assert error == errors[num_final_pulses] <= 1e-3 < errors[num_final_pulses - 1]
+
+pulse_entry = {
+    'type': 'pulse_entry',
+    'pulse_length': 400.0,
+    'pulse_length_unit': 's',
+    'flux_filepath': './ex_flux',
+    'pulse_history': [[3, 60.0, 's'], [200, 1800.0, 's']],
+    'delay_dur': 5.0,
+    'delay_dur_unit': 'd'
+}
+
+@pytest.mark.parametrize("tolerance, exp_num_entries", [
+    (1e-3, 2),
+    (1.0, 1),
+    (0, 1),
+])
+def test_reduce_pulse_entry(tolerance, exp_num_entries):
+    reduced, flux_scale = pr.reduce_pulse_entry(pulse_entry, decay_constants, tolerance, './flat_flux')
+
+    assert len(reduced) == exp_num_entries
+    assert reduced[-1]['delay_dur'] == 5.0
+    assert reduced[-1]['delay_dur_unit'] == 'd'
+    if tolerance == 0:
+        assert flux_scale is None
+        assert reduced[0]['pulse_history'] == [(3, 60.0, 's'), (200, 1800.0, 's')]
+        return
+
+    num_final_pulses = reduced[-1]['pulse_history'][-1][0] if exp_num_entries == 2 else 0
+    exp_fluence = 400.0 * 3 * 200
+    obs_fluence = reduced[0]['pulse_length'] * flux_scale + 400.0 * 3 * num_final_pulses
+    assert reduced[0]['flux_filepath'] == './flat_flux'
+    assert obs_fluence == pytest.approx(exp_fluence)
+
+    ph_dict = build_inp_blocks.make_ph_dict(reduced)
+    flux_dict = build_inp_blocks.make_flux_dict(reduced)
+    schedule_block = build_inp_blocks.make_schedule_block(reduced, ph_dict, flux_dict)
+    assert schedule_block.count('\n') == exp_num_entries + 3
+
+def test_reduce_pulse_entry_mixed_units():
+    with pytest.raises(Exception, match="same unit"):
+        pr.reduce_pulse_entry(dict(pulse_entry, pulse_history=[[3, 1.0, 'm']]), decay_constants,
+                              1e-3, './flat_flux')
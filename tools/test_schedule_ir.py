@@ -0,0 +1,130 @@
+import pytest
+import sys
+import numpy as np
+import build_inp_blocks
+import schedule_ir
+import schedule_transforms as st
+
+child_dicts = [{
+    'type': 'schedule',
+    'children': [
+        {
+            'type': 'pulse_entry',
+            'pulse_length': 7.6,
+            'pulse_length_unit': 'm',
+            'flux_filepath': './ex_flux',
+            'pulse_history': [(3, 7.9, 'm'), (2, 5.5, 's')],
+            'delay_dur': 5.1,
+            'delay_dur_unit': 's'
+        }, {
+            'type': 'schedule',
+            'children': [{
+                'type': 'pulse_entry',
+                'pulse_length': 1.0,
+                'pulse_length_unit': 's',
+                'flux_filepath': '../flux_file',
+                'pulse_history': [[1, 8.0, 'm']],
+                'delay_dur': 5.8,
+                'delay_dur_unit': 'm'
+            }],
+            'pulse_history': [(7, 9.5, 'd')],
+            'delay_dur': 2.0,
+            'delay_dur_unit': 'h'
+        }
+    ],
+    'pulse_history': [(7, 9.5, 'd')],
+    'delay_dur': 6.3,
+    'delay_dur_unit': 'm'
+}, {
+    'type': 'pulse_entry',
+    'pulse_length': 7.4,
+    'pulse_length_unit': 'd',
+    'flux_filepath': './iter_flux',
+    'pulse_history': [(3, 7.9, 'm'), (2, 5.5, 's')],
+    'delay_dur': 5.33,
+    'delay_dur_unit': 'c'
+}]
+
+def test_build_schedule_ir():
+    sched = schedule_ir.build_schedule_ir(child_dicts)
+    outer, pulse = sched.children
+    inner_pulse, inner = outer.children
+
+    assert sched.preorder == [outer, inner_pulse, inner, inner.children[0], pulse]
+    assert sched.postorder == [inner_pulse, inner.children[0], inner, outer, pulse]
+    assert inner.children[0].pulse_history == ((1, 8.0, 'm'),)
+    assert inner_pulse.pulse_history is pulse.pulse_history
+    assert outer.pulse_history is inner.pulse_history
+    assert not hasattr(pulse, '__dict__')
+    assert list(sched.pulse_histories.items()) == [(((7, 9.5, 'd'),), 0),
+                                                   (((3, 7.9, 'm'), (2, 5.5, 's')), 1),
+                                                   (((1, 8.0, 'm'),), 2)]
+    assert sched.flux_filepaths == {'./ex_flux': 0, '../flux_file': 1, './iter_flux': 2}
+    assert schedule_ir.as_schedule_ir(sched) is sched
+
+def test_build_schedule_ir_unknown_type():
+    with pytest.raises(Exception, match="Unknown"):
+        schedule_ir.build_schedule_ir([{'type': 'pulse', 'pulse_history': [], 'delay_dur': 0}])
+
+def test_build_schedule_ir_array_levels():
+    dwell_times = np.array([1.0, 2.0])
+    array_dicts = [{'type': 'pulse_entry', 'pulse_length': 2, 'pulse_history': [(3, dwell_times)],
+                    'delay_dur': 4}] * 2
+    sched = schedule_ir.build_schedule_ir(array_dicts)
+
+    # pulse histories holding arrays are not interned
+    assert sched.pulse_histories == {}
+    dur, fluence = st.flatten_schedule(array_dicts)
+    compressed = st.compress_schedule(array_dicts)
+    for idx, dwell_time in enumerate(dwell_times):
+        scalar_dicts = [dict(array_dicts[0], pulse_history=[(3, dwell_time)])] * 2
+        # neither the fluence nor the compressed duration depend on the dwell times
+        assert st.flatten_schedule(scalar_dicts) == (dur[idx], fluence)
+        assert st.compress_schedule(scalar_dicts) == compressed
+
+def test_functions_on_ir():
+    sched = schedule_ir.build_schedule_ir(child_dicts)
+    transform_dicts = [{'type': 'pulse_entry', 'pulse_length': 2, 'pulse_history': [(3, 1)],
+                        'delay_dur': 4}] * 3
+    transform_sched = schedule_ir.build_schedule_ir(transform_dicts)
+
+    ph_dict = build_inp_blocks.make_ph_dict(sched)
+    flux_dict = build_inp_blocks.make_flux_dict(sched)
+    assert flux_dict == build_inp_blocks.make_flux_dict(child_dicts)
+    assert build_inp_blocks.make_schedule_block(sched, ph_dict, flux_dict) == \
+        build_inp_blocks.make_schedule_block(child_dicts, ph_dict, flux_dict)
+    assert st.flatten_schedule(transform_sched, [(2, 1)]) == st.flatten_schedule(transform_dicts, [(2, 1)])
+    assert st.compress_schedule(transform_sched, [(2, 1)]) == st.compress_schedule(transform_dicts, [(2, 1)])
+
+def test_deep_schedule():
+    depth = 5 * sys.getrecursionlimit()
+    pulse = {'type': 'pulse_entry', 'pulse_length': 2, 'pulse_length_unit': 's',
+             'flux_filepath': 'flux', 'pulse_history': [(1, 0, 's')],
+             'delay_dur': 0, 'delay_dur_unit': 's'}
+    deep_dicts = [pulse]
+    for _ in range(depth):
+        deep_dicts = [{'type': 'schedule', 'children': deep_dicts, 'pulse_history': [(1, 0, 's')],
+                       'delay_dur': 0, 'delay_dur_unit': 's'}]
+    transform_dicts = [{'type': 'pulse_entry', 'pulse_length': 2, 'pulse_history': [(1, 0)],
+                        'delay_dur': 0}]
+    for _ in range(depth):
+        transform_dicts = [{'type': 'schedule', 'children': transform_dicts,
+                            'pulse_history': [(1, 0)], 'delay_dur': 0}]
+
+    sched = schedule_ir.build_schedule_ir(deep_dicts)
+    assert len(sched.preorder) == len(sched.postorder) == depth + 1
+    assert sched.preorder[-1] is sched.postorder[0]
+    assert sched.postorder[-1] is sched.children[0]
+
+    ph_dict = build_inp_blocks.make_ph_dict(sched)
+    flux_dict = build_inp_blocks.make_flux_dict(sched)
+    assert build_inp_blocks.make_schedule_block(sched, ph_dict, flux_dict).count("schedule ") == depth + 1
+
+    assert st.flatten_schedule(transform_dicts) == (2, 2)
+    assert st.compress_schedule(transform_dicts) == 2
+    compiled = st.compile_schedule(transform_dicts, [(1, 0)])
+    assert len(compiled[0]) == depth + 2
+    assert f'p{depth}.pulse_length' in compiled[1]
+    assert max(len(key) for key in compiled[1]) < 40
+    assert st.flatten_compiled(compiled) == (2, 2)
+    assert st.compress_compiled(compiled) == 2
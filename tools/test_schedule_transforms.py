@@ -1,4 +1,7 @@
+import copy
+from fractions import Fraction
 import pytest
+import numpy as np
 import schedule_transforms as st
 
 @pytest.mark.parametrize( "pulse_length,pulse_history,exp_dur,exp_fluence",
@@ -48,6 +51,47 @@ def test_flatten_ph_levels(pulse_length, pulse_history, exp_tot_dur, exp_tot_flu
     assert obs_tot_dur == exp_tot_dur
     assert obs_tot_fluence == exp_tot_fluence
 
+def legacy_flatten_ph_levels(pulse_length, pulse_history):
+    tot_ff_flat = 1
+    tot_dur_flat = pulse_length
+    for lvl_hist in pulse_history:
+        tot_dur_flat, fluence_flat = st.flatten_pulse_history(tot_dur_flat, lvl_hist)
+        tot_ff_flat *= fluence_flat / tot_dur_flat
+    return tot_dur_flat, tot_dur_flat * tot_ff_flat
+
+def exact_flatten_ph_levels(pulse_length, pulse_history):
+    tot_dur = Fraction(pulse_length)
+    tot_fluence = Fraction(pulse_length)
+    for num_pulses, dwell_time in pulse_history:
+        tot_dur = num_pulses * tot_dur + (num_pulses - 1) * Fraction(dwell_time)
+        tot_fluence *= num_pulses
+    return tot_dur, tot_fluence
+
+@pytest.mark.parametrize("num_levels", [3, 20, 200])
+def test_flatten_ph_levels_accuracy(num_levels):
+    rng = np.random.default_rng(num_levels)
+    pulse_length = 0.1
+    pulse_history = [(int(num_pulses), float(dwell_time)) for num_pulses, dwell_time in
+                     zip(rng.integers(1, 4, num_levels), rng.uniform(0, 10, num_levels))]
+    exp_dur, exp_fluence = exact_flatten_ph_levels(pulse_length, pulse_history)
+    obs_dur, obs_fluence = st.flatten_ph_levels(pulse_length, pulse_history)
+    legacy_dur, legacy_fluence = legacy_flatten_ph_levels(pulse_length, pulse_history)
+
+    assert abs(obs_fluence - exp_fluence) <= num_levels * np.spacing(obs_fluence)
+    assert abs(obs_dur - exp_dur) <= abs(legacy_dur - exp_dur) + 2 * np.spacing(obs_dur)
+    assert abs(obs_fluence - exp_fluence) <= abs(legacy_fluence - exp_fluence)
+
+def test_flatten_ph_level_arrays():
+    rng = np.random.default_rng(0)
+    num_pulses = rng.integers(1, 10, (6, 5))
+    dwell_times = rng.uniform(0, 10, (6, 5))
+    pulse_lengths = rng.uniform(0, 10, 5)
+    obs_dur, obs_fluence = st.flatten_ph_level_arrays(pulse_lengths, num_pulses, dwell_times)
+
+    for i, pulse_length in enumerate(pulse_lengths):
+        pulse_history = list(zip(num_pulses[:, i].tolist(), dwell_times[:, i].tolist()))
+        assert (obs_dur[i], obs_fluence[i]) == st.flatten_ph_levels(pulse_length, pulse_history)
+
 @pytest.mark.parametrize( "pulse_length,pulse_history,exp_tot_dur",
                           [
                             (1, [(1,1), (1,1)], 1),
@@ -207,4 +251,80 @@ class Test_Flattened_Compressed:
                            exp_fluence):
         obs_dur = st.compress_schedule(child_dicts, pulse_history)
 
-        assert obs_dur == pytest.approx(exp_fluence)
\ No newline at end of file
+        assert obs_dur == pytest.approx(exp_fluence)
+
+    @pytest.mark.parametrize(*common_args)
+    def test_compiled_scalar(self, child_dicts, pulse_history, exp_fluence):
+        compiled = st.compile_schedule(child_dicts, pulse_history)
+        obs_dur, obs_fluence = st.flatten_compiled(compiled)
+        exp_dur, exp_flat_fluence = st.flatten_schedule(child_dicts, pulse_history)
+
+        assert obs_dur == exp_dur
+        assert obs_fluence == exp_flat_fluence
+        assert st.compress_compiled(compiled) == st.compress_schedule(child_dicts, pulse_history)
+
+    @pytest.mark.parametrize(*common_args)
+    def test_compiled_arrays(self, child_dicts, pulse_history, exp_fluence):
+        compiled = st.compile_schedule(child_dicts, pulse_history)
+        rng = np.random.default_rng(0)
+        params = {}
+        for key in compiled[1]:
+            if key.endswith('num_pulses'):
+                params[key] = rng.integers(1, 10, 20)
+            else:
+                params[key] = rng.random(20) * 10
+        obs_dur, obs_fluence = st.flatten_compiled(compiled, params)
+        obs_comp_dur = st.compress_compiled(compiled, params)
+
+        for i in range(20):
+            sample = copy.deepcopy(child_dicts)
+            sample_ph = [list(level) for level in pulse_history]
+            for key, values in params.items():
+                set_param(sample, sample_ph, key, values[i].item())
+            exp_dur, exp_flat_fluence = st.flatten_schedule(sample, sample_ph)
+            assert obs_dur[i] == exp_dur
+            assert obs_fluence[i] == exp_flat_fluence
+            assert obs_comp_dur[i] == st.compress_schedule(sample, sample_ph)
+
+def set_param(child_dicts, pulse_history, key, value):
+    '''
+    Set the leaf parameter named key (see compile_schedule()) of a child_dicts structure.
+    '''
+    path = key.split('.')
+    node = None
+    if path[0] != 'pulse_history':
+        node_idx = int(path.pop(0)[1:])
+        stack = list(reversed(child_dicts))
+        for _ in range(node_idx + 1):
+            node = stack.pop()
+            stack.extend(reversed(node.get('children', [])))
+    if path[0] == 'pulse_history':
+        levels = pulse_history if node is None else node['pulse_history']
+        level = int(path[1])
+        num_pulses, dwell_time = levels[level]
+        if path[2] == 'num_pulses':
+            levels[level] = (value, dwell_time)
+        else:
+            levels[level] = (num_pulses, value)
+    else:
+        node[path[0]] = value
+
+def test_compile_schedule_unknown_param():
+    compiled = st.compile_schedule([{'type': 'pulse_entry', 'pulse_length': 1,
+                                     'pulse_history': [(1, 1)], 'delay_dur': 1}])
+    assert set(compiled[1]) == {'p0.pulse_length', 'p0.delay_dur', 'p0.pulse_history.0.num_pulses',
+                                'p0.pulse_history.0.dwell_time', 'pulse_history.0.num_pulses',
+                                'pulse_history.0.dwell_time'}
+    with pytest.raises(Exception, match="Unknown"):
+        st.flatten_compiled(compiled, {'p0.pulse_lenght': [1, 2]})
+
+def test_compiled_values():
+    compiled = st.compile_schedule([{'type': 'pulse_entry', 'pulse_length': 1,
+                                     'pulse_history': [(2, 3)], 'delay_dur': 4}])
+    values = st.compiled_values(compiled, {'p0.pulse_length': [5, 6]})
+
+    assert np.array_equal(values['p0.pulse_length'], [5, 6])
+    assert values['p0.pulse_history.0.dwell_time'] == 3
+    assert compiled[1]['p0.pulse_length'] == 1
+    with pytest.raises(Exception, match="Unknown"):
+        st.compiled_values(compiled, {'p1.pulse_length': 1})
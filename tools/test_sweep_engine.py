@@ -0,0 +1,40 @@
+import pytest
+import numpy as np
+import script_template
+import sweep_engine
+
+@pytest.mark.parametrize("active_burn_times, duty_cycles, num_pulses", [
+    ([4], [1, 0.9, 0.5, 0.25], [2, 4, 8, 32, 64]),
+    ([1.5, 4, 10], [0.9, 0.25], [1, 3, 7])
+])
+def test_calc_time_grid(active_burn_times, duty_cycles, num_pulses):
+    obs_pulse_lengths, obs_dwell_times, obs_t_irr = sweep_engine.calc_time_grid(
+        active_burn_times, duty_cycles, num_pulses)
+
+    for i, active_burn_time in enumerate(active_burn_times):
+        exp_pulse_lengths, exp_dwell_times, exp_t_irr = script_template.calc_time_params(
+            active_burn_time, np.asarray(duty_cycles), np.asarray(num_pulses))
+        assert np.array_equal(obs_pulse_lengths[i, 0], exp_pulse_lengths)
+        assert np.array_equal(obs_dwell_times[i], exp_dwell_times)
+        assert np.array_equal(obs_t_irr[i], exp_t_irr)
+
+@pytest.mark.parametrize("chunk_cells", [1, 7, 1000])
+def test_iter_sweep(chunk_cells):
+    active_burn_times = [1.5, 4]
+    duty_cycles = [1, 0.5, 0.25]
+    num_pulses = [2, 8]
+    total_flux = [1e14, 2e13, 0.0, 5e10]
+    chunks = list(sweep_engine.iter_sweep(active_burn_times, duty_cycles, num_pulses,
+                                          total_flux, chunk_cells))
+    cells = np.concatenate(chunks)
+    _, exp_dwell_times, exp_t_irr = sweep_engine.calc_time_grid(
+        active_burn_times, duty_cycles, num_pulses)
+
+    assert all(len(chunk) <= chunk_cells for chunk in chunks)
+    assert len(cells) == 2 * 3 * 2 * 4
+    assert cells.dtype == sweep_engine.SWEEP_DTYPE
+    grid = cells.reshape(2, 3, 2, 4)
+    assert np.array_equal(grid['t_irr'], np.broadcast_to(exp_t_irr[..., None], grid.shape))
+    assert np.array_equal(grid['dwell_time'], np.broadcast_to(exp_dwell_times[..., None], grid.shape))
+    assert np.array_equal(grid['interval'][0, 0, 0], np.arange(4))
+    assert np.array_equal(grid['fluence'][1, 2, 1], np.array(total_flux) * 4)
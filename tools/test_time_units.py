@@ -0,0 +1,82 @@
+import pytest
+import numpy as np
+import build_inp_blocks
+import schedule_transforms as st
+import time_units
+
+child_dicts = [{
+    'type': 'schedule',
+    'children': [
+        {
+            'type': 'pulse_entry',
+            'pulse_length': 2,
+            'pulse_length_unit': 'm',
+            'flux_filepath': './ex_flux',
+            'pulse_history': [(3, 30, 's'), (2, 1, 'h')],
+            'delay_dur': 0.5,
+            'delay_dur_unit': 'd'
+        }
+    ],
+    'pulse_history': [(2, 1, 'w')],
+    'delay_dur': 1,
+    'delay_dur_unit': 'y'
+}, {
+    'type': 'pulse_entry',
+    'pulse_length': 120,
+    'pulse_length_unit': 's',
+    'flux_filepath': './iter_flux',
+    'pulse_history': [(3, 0.5, 'm'), (2, 3600, 's')],
+    'delay_dur': 0.01,
+    'delay_dur_unit': 'c'
+}]
+
+@pytest.mark.parametrize("values, units, to_unit, exp_values", [
+    ([1, 2, 3], ['m', 'h', 'd'], 's', [60, 7200, 259200]),
+    ([[1, 1], [1, 1]], ['w', 'y', 'c', 's'], 'd', [[7, 365.25], [36525, 1 / 86400]]),
+    ([120, 240], 's', 'm', [2, 4]),
+])
+def test_convert(values, units, to_unit, exp_values):
+    assert time_units.convert(values, units, to_unit) == pytest.approx(np.array(exp_values), rel=1e-15)
+
+@pytest.mark.parametrize("units, to_unit", [
+    (['s', 'x'], 's'),
+    (['s', 's'], 'sec'),
+])
+def test_convert_unknown_unit(units, to_unit):
+    with pytest.raises(Exception, match="Unknown time unit"):
+        time_units.convert([1, 2], units, to_unit)
+
+def test_conversion_factors():
+    for idx, unit in enumerate(time_units.UNIT_CODES):
+        assert time_units.CONVERSION_FACTORS[idx, time_units.UNIT_INDEX['s']] == \
+            time_units.SECONDS_PER_UNIT[unit]
+    assert np.allclose(time_units.CONVERSION_FACTORS * time_units.CONVERSION_FACTORS.T, 1)
+
+def test_normalize_schedule():
+    normalized = time_units.normalize_schedule(child_dicts)
+
+    assert normalized[0]['delay_dur'] == 31557600
+    assert normalized[0]['pulse_history'] == [(2, 604800, 's')]
+    assert normalized[0]['children'][0] == {
+        'type': 'pulse_entry',
+        'pulse_length': 120,
+        'pulse_length_unit': 's',
+        'flux_filepath': './ex_flux',
+        'pulse_history': [(3, 30, 's'), (2, 3600, 's')],
+        'delay_dur': 43200,
+        'delay_dur_unit': 's'
+    }
+    # the pulse histories of both pulse entries are equal in seconds
+    ph_dict = build_inp_blocks.make_ph_dict(normalized)
+    assert len(ph_dict) == 2
+    assert build_inp_blocks.make_schedule_block(normalized, ph_dict, build_inp_blocks.make_flux_dict(normalized))
+
+def test_normalize_schedule_transforms():
+    normalized = time_units.normalize_schedule(child_dicts, 'h', keep_units=False)
+    exp_dur, exp_fluence = st.flatten_schedule(time_units.normalize_schedule(child_dicts, keep_units=False))
+    obs_dur, obs_fluence = st.flatten_schedule(normalized)
+
+    assert 'delay_dur_unit' not in normalized[1]
+    assert normalized[1]['pulse_history'] == [(3, 0.5 / 60), (2, 1)]
+    assert obs_dur == pytest.approx(exp_dur / 3600)
+    assert obs_fluence == pytest.approx(exp_fluence / 3600)
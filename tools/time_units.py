@@ -0,0 +1,110 @@
+'''
+Conversion between the time units of ALARA input files:
+    s (seconds), m (minutes), h (hours), d (days), w (weeks), y (years), c (centuries),
+with years of 365.25 days.
+
+The factors between every pair of units are precomputed in CONVERSION_FACTORS, so that an
+array of times in mixed units is converted with a single lookup and multiplication.
+normalize_schedule() converts every time of a child_dicts structure at once, either for
+build_inp_blocks.py (with every unit replaced) or for schedule_transforms.py (without units).
+'''
+import numpy as np
+import schedule_ir
+
+SECONDS_PER_UNIT = {
+    's': 1.0,
+    'm': 60.0,
+    'h': 3600.0,
+    'd': 86400.0,
+    'w': 604800.0,
+    'y': 31557600.0,
+    'c': 3155760000.0,
+}
+
+UNIT_CODES = tuple(SECONDS_PER_UNIT)
+
+UNIT_INDEX = {unit: idx for idx, unit in enumerate(UNIT_CODES)}
+
+_seconds = np.array(list(SECONDS_PER_UNIT.values()))
+
+# CONVERSION_FACTORS[i, j] converts a time in UNIT_CODES[i] to UNIT_CODES[j]
+CONVERSION_FACTORS = _seconds[:, None] / _seconds[None, :]
+CONVERSION_FACTORS.flags.writeable = False
+
+def unit_indices(units):
+    '''
+    Map an iterable of unit codes (str) to their indices in UNIT_CODES, looking up each
+    distinct unit code once.
+    :return: array of int
+    '''
+    codes, inverse = np.unique(np.asarray(units, dtype=str), return_inverse=True)
+    for code in codes:
+        if code not in UNIT_INDEX:
+            raise Exception(f"Unknown time unit {code}.")
+    return np.array([UNIT_INDEX[code] for code in codes], dtype=np.intp)[inverse.reshape(-1)]
+
+def convert(values, units, to_unit='s'):
+    '''
+    Convert times in mixed units to a single unit.
+    :param values: array_like of times
+    :param units: iterable of the unit code (str) of each time, or a single unit code
+    :param to_unit: (str) unit code of the converted times
+    :return: array of converted times
+    '''
+    if to_unit not in UNIT_INDEX:
+        raise Exception(f"Unknown time unit {to_unit}.")
+    values = np.asarray(values, dtype=float)
+    if isinstance(units, str):
+        return values * CONVERSION_FACTORS[unit_indices([units])[0], UNIT_INDEX[to_unit]]
+    return values * CONVERSION_FACTORS[unit_indices(units), UNIT_INDEX[to_unit]].reshape(values.shape)
+
+def normalize_schedule(child_dicts, unit='s', keep_units=True):
+    '''
+    Convert every pulse length, delay and pulse history dwell time of a child_dicts
+    structure (as described in build_inp_blocks.py) to a single unit, in one conversion.
+    :param child_dicts: iterable of dictionaries, or a schedule_ir.ScheduleIR
+    :param unit: (str) unit code of the converted times
+    :param keep_units: (bool) if True, return a child_dicts structure for build_inp_blocks.py,
+        with every unit set to unit; if False, return one for schedule_transforms.py, without
+        units and with pulse history levels of (# pulses, dwell time)
+    :return: new child_dicts structure (list of dictionaries)
+    '''
+    sched = schedule_ir.as_schedule_ir(child_dicts)
+    times = []
+    units = []
+    for node in sched.preorder:
+        if not node.is_schedule:
+            times.append(node.pulse_length)
+            units.append(node.pulse_length_unit)
+        for _, dwell_time, dwell_unit in node.pulse_history:
+            times.append(dwell_time)
+            units.append(dwell_unit)
+        times.append(node.delay_dur)
+        units.append(node.delay_dur_unit)
+    converted = iter(convert(times, units, unit).tolist())
+
+    node_dicts = {}
+    for node in sched.preorder:
+        node_dict = {'type': 'schedule' if node.is_schedule else 'pulse_entry'}
+        if node.is_schedule:
+            node_dict['children'] = []
+        else:
+            node_dict['pulse_length'] = next(converted)
+            if keep_units:
+                node_dict['pulse_length_unit'] = unit
+            node_dict['flux_filepath'] = node.flux_filepath
+        if keep_units:
+            node_dict['pulse_history'] = [(num_pulses, next(converted), unit)
+                                          for num_pulses, _, _ in node.pulse_history]
+        else:
+            node_dict['pulse_history'] = [(num_pulses, next(converted))
+                                          for num_pulses, _, _ in node.pulse_history]
+        node_dict['delay_dur'] = next(converted)
+        if keep_units:
+            node_dict['delay_dur_unit'] = unit
+        node_dicts[id(node)] = node_dict
+
+    for node in sched.preorder:
+        if node.is_schedule:
+            node_dicts[id(node)]['children'] = [node_dicts[id(child)] for child in node.children]
+    return [node_dicts[id(node)] for node in sched.children]